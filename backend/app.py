@@ -4,10 +4,14 @@ from flask_cors import CORS
 from flask_session import Session
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
+import time
 from datetime import datetime
 import openai
 import dotenv
 
+from question_bank import question_bank
+from quiz_attempts import quiz_attempts
+
 # 加载环境变量
 dotenv.load_dotenv()
 
@@ -88,9 +92,10 @@ class UserCityExploration(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
-# 创建数据库表
+# 创建数据库表，绑定题库（题目表随之创建，题目文件有变化时导入）
 with app.app_context():
     db.create_all()
+    question_bank.bind(db.engine)
 
 # API 路由
 @app.route('/api/register', methods=['POST'])
@@ -377,81 +382,16 @@ def ai_chat():
             'response': '抱歉，我现在有点小问题，请稍后再试试吧！😅'
         }), 500
 
-# 题目相关API
+# 题目相关API（题目来自内存题库，见 question_bank.py）
 @app.route('/api/questions/<city_name>', methods=['GET'])
 def get_questions(city_name):
-    """获取指定城市的题目"""
+    """获取指定城市的全部题目（不含正确答案，答题请使用 /api/quiz/attempts）"""
     try:
-        # 城市名称映射
-        city_mapping = {
-            '福州市': 'fuzhou',
-            '泉州市': 'quanzhou',
-            '南平市': 'nanping',
-            '龙岩市': 'longyan',
-            '莆田市': 'putian',
-            # 新增文化名称映射
-            '福州候官文化': 'fuzhou',
-            '泉州海丝文化': 'quanzhou',
-            '南平朱子文化': 'nanping',
-            '龙岩红色文化': 'longyan',
-            '莆田妈祖文化': 'putian'
-        }
-
-        # 获取对应的文件名
-        city_key = city_mapping.get(city_name, city_name)
-        question_file = os.path.join(os.path.dirname(__file__), '..', 'frontend', f'{city_key}-question.txt')
-
-        if not os.path.exists(question_file):
+        questions = question_bank.questions(city_name)
+        if questions is None:
             return jsonify({'error': '题目文件不存在'}), 404
 
-        # 解析题目文件
-        questions = []
-        with open(question_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        # 按题目分割
-        question_blocks = content.strip().split('\n\n')
-
-        for i, block in enumerate(question_blocks, 1):
-            if not block.strip():
-                continue
-
-            lines = block.strip().split('\n')
-            if len(lines) < 6:  # 题目 + 4个选项 + 答案
-                continue
-
-            # 解析题目
-            question_text = lines[0].strip()
-            if not question_text:
-                continue
-
-            # 解析选项
-            options = {}
-            for j in range(1, 5):
-                if j < len(lines):
-                    line = lines[j].strip()
-                    if line and len(line) > 2:
-                        key = line[0]  # A, B, C, D
-                        value = line[2:].strip()  # 选项内容
-                        options[key] = value
-
-            # 解析答案
-            correct_answer = ''
-            for line in lines:
-                if line.startswith('答案：'):
-                    correct_answer = line.replace('答案：', '').strip()
-                    break
-
-            if options and correct_answer:
-                questions.append({
-                    'id': i,
-                    'city_name': city_name,
-                    'question_text': question_text,
-                    'options': options,
-                    'correct_answer': correct_answer
-                })
-
-        return jsonify({'questions': questions}), 200
+        return jsonify({'questions': [question.to_dict(city_name) for question in questions]}), 200
 
     except Exception as e:
         print(f"获取题目失败: {str(e)}")
@@ -459,7 +399,7 @@ def get_questions(city_name):
 
 @app.route('/api/questions/<city_name>/<int:question_id>/verify', methods=['POST'])
 def verify_answer(city_name, question_id):
-    """验证单题答案"""
+    """验证单题答案（只对用户已提交的答题中的题目判分，否则逐个选项试答即可得到答案）"""
     try:
         user_id = session.get('user_id')
         if not user_id:
@@ -471,49 +411,20 @@ def verify_answer(city_name, question_id):
 
         user_answer = data['answer']
 
-        # 获取题目文件中的正确答案
-        city_mapping = {
-            '福州市': 'fuzhou',
-            '泉州市': 'quanzhou',
-            '南平市': 'nanping',
-            '龙岩市': 'longyan',
-            '莆田市': 'putian',
-            # 新增文化名称映射
-            '福州候官文化': 'fuzhou',
-            '泉州海丝文化': 'quanzhou',
-            '南平朱子文化': 'nanping',
-            '龙岩红色文化': 'longyan',
-            '莆田妈祖文化': 'putian'
-        }
-
-        city_key = city_mapping.get(city_name, city_name)
-        question_file = os.path.join(os.path.dirname(__file__), '..', 'frontend', f'{city_key}-question.txt')
-
-        if not os.path.exists(question_file):
+        if question_bank.city(city_name) is None:
             return jsonify({'error': '题目文件不存在'}), 404
 
-        # 解析题目文件获取指定题目的正确答案
-        correct_answer = ''
-        with open(question_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        question_blocks = content.strip().split('\n\n')
-        if question_id <= len(question_blocks):
-            block = question_blocks[question_id - 1]
-            lines = block.strip().split('\n')
-            for line in lines:
-                if line.startswith('答案：'):
-                    correct_answer = line.replace('答案：', '').strip()
-                    break
-
-        if not correct_answer:
+        question = question_bank.get(city_name, question_id)
+        if question is None:
             return jsonify({'error': '题目不存在'}), 404
 
-        is_correct = user_answer == correct_answer
+        # 判分结果和正确答案只对已提交过含该题答题的用户返回
+        if question_id not in quiz_attempts.revealed_question_ids(user_id, city_name):
+            return jsonify({'error': '提交答题后才能查看'}), 403
 
         return jsonify({
-            'is_correct': is_correct,
-            'correct_answer': correct_answer,
+            'is_correct': user_answer == question.correct_answer,
+            'correct_answer': question.correct_answer,
             'user_answer': user_answer
         }), 200
 
@@ -521,96 +432,192 @@ def verify_answer(city_name, question_id):
         print(f"验证答案失败: {str(e)}")
         return jsonify({'error': '验证失败'}), 500
 
+@app.route('/api/questions/<city_name>/verify-batch', methods=['POST'])
+def verify_answers_batch(city_name):
+    """一次验证整套题的答案 - answers 为 [{questionId, answer}]，返回逐题结果和总分；
+    只对用户已提交的答题中的题目判分，其余题目不计入总分"""
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': '未登录'}), 401
+
+        data = request.get_json(silent=True)
+        items = data.get('answers') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': '缺少答案'}), 400
+        max_items = int(os.getenv('QUIZ_VERIFY_MAX_ITEMS', '100'))
+        if len(items) > max_items:
+            return jsonify({'error': f'单次最多验证{max_items}道题'}), 413
+        if not all(isinstance(item, dict) for item in items):
+            return jsonify({'error': '答案格式错误'}), 400
+
+        city = question_bank.city(city_name)
+        if city is None:
+            return jsonify({'error': '题目文件不存在'}), 404
+
+        # 判分结果和正确答案只对已提交过含该题答题的用户返回
+        revealed = quiz_attempts.revealed_question_ids(user_id, city_name)
+        results = city.grade([(item.get('questionId'), item.get('answer')) for item in items], revealed)
+        graded = [result for result in results if result['is_correct'] is not None]
+        score = sum(1 for result in graded if result['is_correct'])
+        total = len(graded)
+
+        return jsonify({
+            'results': results,
+            'score': score,
+            'total': total,
+            'percentage': round((score / total) * 100, 1) if total else 0.0,
+            'passed': total > 0 and (score / total) * 100 >= 60
+        }), 200
+
+    except Exception as e:
+        print(f"批量验证答案失败: {str(e)}")
+        return jsonify({'error': '验证失败'}), 500
+
 @app.route('/api/quiz/submit', methods=['POST'])
 def submit_quiz():
-    """提交答题结果"""
+    """提交答题结果（旧接口）- answers 与 questionIds 一一对应，必须带 attemptId，
+    只按该次答题抽到的题判分，等同于 /api/quiz/attempts/<attempt_id>/submit"""
     try:
         user_id = session.get('user_id')
         if not user_id:
             return jsonify({'error': '未登录'}), 401
 
-        data = request.get_json()
-        if not data:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
             return jsonify({'error': '缺少数据'}), 400
 
-        city_name = data.get('cityName')
+        attempt_id = data.get('attemptId')
         answers = data.get('answers', [])
         question_ids = data.get('questionIds', [])
 
-        if not city_name or not answers or not question_ids:
+        if not attempt_id or not answers or not question_ids:
             return jsonify({'error': '缺少必要字段'}), 400
+        if not isinstance(attempt_id, str) or not isinstance(answers, list) or not isinstance(question_ids, list):
+            return jsonify({'error': '答案格式错误'}), 400
+        # 题号只接受整数或数字字符串，其他类型（列表、字典等）无法作为题号查找
+        if not all(isinstance(question_id, (int, str)) and not isinstance(question_id, bool)
+                   for question_id in question_ids):
+            return jsonify({'error': '题号格式错误'}), 400
+        question_ids = [int(question_id) if isinstance(question_id, str) and question_id.isdigit()
+                        else question_id for question_id in question_ids]
+
+        attempt = quiz_attempts.take(attempt_id, user_id)
+        if attempt is None:
+            return jsonify({'error': '答题不存在或已过期'}), 404
+
+        results = quiz_attempts.grade(attempt, dict(zip(question_ids, answers)))
+        if results is None:
+            return jsonify({'error': '题目文件不存在'}), 404
 
-        # 获取题目文件中的正确答案
-        city_mapping = {
-            '福州市': 'fuzhou',
-            '泉州市': 'quanzhou',
-            '南平市': 'nanping',
-            '龙岩市': 'longyan',
-            '莆田市': 'putian',
-            # 新增文化名称映射
-            '福州候官文化': 'fuzhou',
-            '泉州海丝文化': 'quanzhou',
-            '南平朱子文化': 'nanping',
-            '龙岩红色文化': 'longyan',
-            '莆田妈祖文化': 'putian'
-        }
+        score = sum(1 for result in results if result['is_correct'])
+        total = len(results)
+        passed = total > 0 and (score / total) * 100 >= 60
+        if passed:
+            _unlock_city_exploration(user_id, attempt.city_name)
 
-        city_key = city_mapping.get(city_name, city_name)
-        question_file = os.path.join(os.path.dirname(__file__), '..', 'frontend', f'{city_key}-question.txt')
+        return jsonify({
+            'score': score,
+            'total': total,
+            'percentage': round((score / total) * 100, 1) if total else 0.0,
+            'passed': passed
+        }), 200
+
+    except Exception as e:
+        print(f"提交答题失败: {str(e)}")
+        return jsonify({'error': '提交失败'}), 500
+
+def _unlock_city_exploration(user_id, city_name):
+    """答题及格后解锁城市探索权限"""
+    exploration = UserCityExploration.query.filter_by(
+        user_id=user_id,
+        city_name=city_name
+    ).first()
+
+    if not exploration:
+        exploration = UserCityExploration(
+            user_id=user_id,
+            city_name=city_name,
+            is_explored=False
+        )
+        db.session.add(exploration)
+
+    if not exploration.is_explored:
+        exploration.is_explored = True
+        exploration.explored_at = datetime.utcnow()
+        db.session.commit()
+
+@app.route('/api/quiz/attempts', methods=['POST'])
+def create_quiz_attempt():
+    """开始一次答题 - 服务端抽题，只返回题干和选项，提交时凭 attempt_id 判分"""
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': '未登录'}), 401
 
-        if not os.path.exists(question_file):
+        data = request.get_json(silent=True) or {}
+        city_name = data.get('cityName')
+        if not city_name:
+            return jsonify({'error': '缺少城市名称'}), 400
+
+        max_count = int(os.getenv('QUIZ_ATTEMPT_MAX_QUESTIONS', '50'))
+        try:
+            count = int(data.get('count', 5))
+        except (TypeError, ValueError):
+            return jsonify({'error': '题目数量无效'}), 400
+        if not 1 <= count <= max_count:
+            return jsonify({'error': f'题目数量应为1到{max_count}'}), 400
+
+        created = quiz_attempts.create(user_id, city_name, count)
+        if created is None:
             return jsonify({'error': '题目文件不存在'}), 404
 
-        # 解析题目文件获取正确答案
-        correct_answers = []
-        with open(question_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        attempt, questions = created
+        return jsonify({
+            'attempt_id': attempt.attempt_id,
+            'city_name': city_name,
+            'questions': questions,
+            'expires_in': quiz_attempts.ttl
+        }), 201
+
+    except Exception as e:
+        print(f"创建答题失败: {str(e)}")
+        return jsonify({'error': '获取题目失败'}), 500
+
+@app.route('/api/quiz/attempts/<attempt_id>/submit', methods=['POST'])
+def submit_quiz_attempt(attempt_id):
+    """提交一次答题 - answers 为 [{questionId, answer}]，只按本次抽到的题判分，每次答题只能提交一次"""
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': '未登录'}), 401
 
-        question_blocks = content.strip().split('\n\n')
-        for block in question_blocks:
-            if not block.strip():
-                continue
-
-            lines = block.strip().split('\n')
-            for line in lines:
-                if line.startswith('答案：'):
-                    correct_answers.append(line.replace('答案：', '').strip())
-                    break
-
-        # 计算得分
-        score = 0
-        total = len(answers)
-
-        for i, answer in enumerate(answers):
-            if answer and i < len(correct_answers):
-                if answer == correct_answers[i]:
-                    score += 1
-
-        # 如果得分达到60分，解锁城市探索权限
-        if (score / total) * 100 >= 60:
-            exploration = UserCityExploration.query.filter_by(
-                user_id=user_id,
-                city_name=city_name
-            ).first()
-
-            if not exploration:
-                exploration = UserCityExploration(
-                    user_id=user_id,
-                    city_name=city_name,
-                    is_explored=False
-                )
-                db.session.add(exploration)
-
-            if not exploration.is_explored:
-                exploration.is_explored = True
-                exploration.explored_at = datetime.utcnow()
-                db.session.commit()
+        data = request.get_json(silent=True) or {}
+        items = data.get('answers')
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return jsonify({'error': '答案格式错误'}), 400
+
+        attempt = quiz_attempts.take(attempt_id, user_id)
+        if attempt is None:
+            return jsonify({'error': '答题不存在或已过期'}), 404
+
+        answers = {item.get('questionId'): item.get('answer') for item in items}
+        results = quiz_attempts.grade(attempt, answers)
+        if results is None:
+            return jsonify({'error': '题目文件不存在'}), 404
+
+        score = sum(1 for result in results if result['is_correct'])
+        total = len(results)
+        passed = total > 0 and (score / total) * 100 >= 60
+        if passed:
+            _unlock_city_exploration(user_id, attempt.city_name)
 
         return jsonify({
+            'results': results,
             'score': score,
             'total': total,
-            'percentage': round((score / total) * 100, 1),
-            'passed': (score / total) * 100 >= 60
+            'percentage': round((score / total) * 100, 1) if total else 0.0,
+            'passed': passed
         }), 200
 
     except Exception as e:
@@ -734,6 +741,7 @@ def get_expert_files(city_name):
 @app.route('/api/game/ai-decision', methods=['POST'])
 def game_ai_decision():
     """游戏AI决策接口"""
+    request_start = time.time()
     try:
         user_id = session.get('user_id')
         if not user_id:
@@ -745,23 +753,33 @@ def game_ai_decision():
 
         game_state = data.get('gameState')
         difficulty = data.get('difficulty', 'medium')
+        compact = bool(data.get('compact', False))  # 紧凑格式：卡牌以1-75的整数ID收发
 
         if not game_state:
             return jsonify({'error': '缺少游戏状态'}), 400
 
         # 导入AI服务
-        from game_ai_service import make_ai_decision
+        from game_ai_service import make_ai_decision, ai_metrics, AI_DIFFICULTIES
+
+        if difficulty not in AI_DIFFICULTIES:
+            return jsonify({'error': '未知的难度'}), 400
 
         # 调用AI决策
-        result = make_ai_decision(game_state, difficulty)
+        result = make_ai_decision(game_state, difficulty, compact)
 
         if result['success']:
-            return jsonify({
+            response = {
                 'success': True,
                 'card': result['card'],
                 'decision_time': result['decision_time'],
+                'tt_hit_rate': result['tt_hit_rate'],
+                'cached': result['cached'],
                 'difficulty': result['difficulty']
-            }), 200
+            }
+            if data.get('includeStats'):
+                response['search_stats'] = result['search_stats']
+            ai_metrics.record_request(difficulty, time.time() - request_start)
+            return jsonify(response), 200
         else:
             return jsonify({
                 'success': False,
@@ -774,6 +792,217 @@ def game_ai_decision():
         traceback.print_exc()
         return jsonify({'error': 'AI服务暂时不可用'}), 500
 
+@app.route('/api/game/ai-decisions/batch', methods=['POST'])
+def game_ai_decisions_batch():
+    """批量AI决策 - 一次请求提交多个游戏状态（各自带难度），按顺序返回决策和逐项耗时"""
+    request_start = time.time()
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': '未登录'}), 401
+
+        data = request.get_json(silent=True)
+        items = data.get('items') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': '缺少游戏状态列表'}), 400
+
+        max_items = int(os.getenv('GAME_AI_BATCH_MAX_ITEMS', '20'))
+        if len(items) > max_items:
+            return jsonify({'error': f'单次最多提交{max_items}个游戏状态'}), 413
+
+        from game_ai_service import make_ai_decisions_batch, ai_metrics
+
+        compact = bool(data.get('compact', False))
+        include_stats = bool(data.get('includeStats'))
+        results = []
+        for result in make_ai_decisions_batch(items, compact):
+            if result['success']:
+                item = {
+                    'success': True,
+                    'card': result['card'],
+                    'decision_time': result['decision_time'],
+                    'item_time': result['item_time'],
+                    'tt_hit_rate': result['tt_hit_rate'],
+                    'cached': result['cached'],
+                    'difficulty': result['difficulty']
+                }
+                if include_stats:
+                    item['search_stats'] = result['search_stats']
+                ai_metrics.record_request(result['difficulty'], result['item_time'])
+            else:
+                item = {
+                    'success': False,
+                    'error': result.get('error', 'AI决策失败'),
+                    'item_time': result['item_time'],
+                    'difficulty': result['difficulty']
+                }
+            results.append(item)
+
+        return jsonify({
+            'success': True,
+            'results': results,
+            'batch_time': time.time() - request_start
+        }), 200
+
+    except Exception as e:
+        print(f"批量AI决策API错误: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': 'AI服务暂时不可用'}), 500
+
+@app.route('/api/game/sessions', methods=['POST'])
+def create_game_session():
+    """创建游戏会话 - 上传一次完整状态，之后只发送增量事件"""
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': '未登录'}), 401
+
+        data = request.get_json()
+        if not data or not data.get('gameState'):
+            return jsonify({'error': '缺少游戏状态'}), 400
+
+        from game_session_service import get_session_store
+        from game_ai_service import AI_DIFFICULTIES
+
+        if data.get('difficulty', 'medium') not in AI_DIFFICULTIES:
+            return jsonify({'error': '未知的难度'}), 400
+
+        game_session = get_session_store().create(
+            user_id, data.get('difficulty', 'medium'), data['gameState']
+        )
+        return jsonify({
+            'success': True,
+            'session_id': game_session.session_id,
+            'version': game_session.version
+        }), 201
+
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'游戏状态无效: {str(e)}'}), 400
+    except Exception as e:
+        print(f"创建游戏会话错误: {str(e)}")
+        return jsonify({'error': '创建游戏会话失败'}), 500
+
+@app.route('/api/game/sessions/<session_id>/ai-decision', methods=['POST'])
+def game_session_ai_decision(session_id):
+    """基于服务端会话的AI决策 - 请求只携带上次决策以来的增量事件"""
+    request_start = time.time()
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': '未登录'}), 401
+
+        from game_session_service import get_session_store, SessionEventError
+        from game_ai_service import make_ai_decision_for_state, ai_metrics, ai_ponderer
+
+        store = get_session_store()
+        game_session = store.get(session_id)
+        if game_session is None or game_session.user_id != user_id:
+            return jsonify({'error': '游戏会话不存在', 'resync': True}), 404
+
+        data = request.get_json() or {}
+        if not isinstance(data.get('version'), int):
+            return jsonify({'error': '游戏会话版本不一致', 'resync': True}), 409
+
+        # 同一会话的并发请求串行执行：版本比较和应用事件是原子的，AI按应用后的局面决策并记入出牌
+        with game_session.lock:
+            try:
+                store.apply_events(game_session, data.get('events', []), expected_version=data['version'])
+            except SessionEventError as e:
+                return jsonify({'error': str(e), 'resync': True}), 409
+
+            game_session.state.current_player = 'ai'
+            # 人类的实际着法与后台预读一致时，预读结果已在决策缓存中
+            pondered = ai_ponderer.resolve(session_id, game_session.state, game_session.difficulty)
+            result = make_ai_decision_for_state(
+                game_session.state, game_session.difficulty, bool(data.get('compact', False))
+            )
+            if not result['success']:
+                return jsonify({
+                    'success': False,
+                    'error': result.get('error', 'AI决策失败')
+                }), 500
+
+            # AI的出牌由服务端直接记入会话，客户端无需回传
+            card = result['card']
+            if card:
+                store.apply_events(game_session, [{
+                    'type': 'play', 'player': 'ai', 'card_id': card['id'] if isinstance(card, dict) else card
+                }])
+                # 趁人类思考时预读其可能的应对
+                if game_session.state.ai_hand:
+                    ai_ponderer.ponder(session_id, game_session.state, game_session.difficulty)
+            version = game_session.version
+
+        response = {
+            'success': True,
+            'card': result['card'],
+            'decision_time': result['decision_time'],
+            'tt_hit_rate': result['tt_hit_rate'],
+            'cached': result['cached'],
+            'pondered': pondered,
+            'difficulty': result['difficulty'],
+            'version': version
+        }
+        if data.get('includeStats'):
+            response['search_stats'] = result['search_stats']
+        ai_metrics.record_request(game_session.difficulty, time.time() - request_start)
+        return jsonify(response), 200
+
+    except Exception as e:
+        print(f"会话AI决策API错误: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': 'AI服务暂时不可用'}), 500
+
+@app.route('/api/game/sessions/<session_id>', methods=['DELETE'])
+def delete_game_session(session_id):
+    """结束游戏会话 - 请求体可携带最后一批增量事件（含 finish），会话删除前应用，回放日志据此记录完整对局"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({'error': '未登录'}), 401
+
+    from game_session_service import get_session_store, SessionEventError, SessionVersionError
+    from game_ai_service import ai_ponderer
+
+    store = get_session_store()
+    game_session = store.get(session_id)
+    if game_session is not None and game_session.user_id == user_id:
+        ai_ponderer.cancel(session_id)
+        data = request.get_json(silent=True) or {}
+        events = data.get('events')
+        with game_session.lock:
+            if events and isinstance(data.get('version'), int):
+                try:
+                    store.apply_events(game_session, events, expected_version=data.get('version'))
+                except SessionVersionError:
+                    # 版本不一致时不应用最后一批事件，按已有着法记录
+                    pass
+                except SessionEventError:
+                    # 会话已作废，回放不记录
+                    return jsonify({'success': True}), 200
+            store.remove(session_id)
+    return jsonify({'success': True}), 200
+
+@app.route('/api/game/ai-metrics', methods=['GET'])
+def game_ai_metrics():
+    """按难度汇总的AI搜索指标，对比 decision_time 与 request_time 可区分搜索耗时和Flask层耗时；
+    scheduler 为当前的并发搜索数和各难度的时间预算，replay_log 为回放日志的写入统计"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({'error': '未登录'}), 401
+
+    from game_ai_service import ai_metrics, decision_cache, ai_ponderer, search_scheduler
+    from game_replay_log import replay_log
+
+    return jsonify({
+        'metrics': ai_metrics.snapshot(),
+        'decision_cache': decision_cache.stats(),
+        'ponder': ai_ponderer.stats(),
+        'scheduler': search_scheduler.stats(),
+        'replay_log': replay_log.stats() if replay_log is not None else None
+    }), 200
+
 # 静态文件路由
 @app.route('/static/<path:filename>')
 def static_files(filename):
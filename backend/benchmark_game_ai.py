@@ -0,0 +1,316 @@
+"""
+游戏AI自对弈基准测试
+用固定种子发牌，让各难度的AI引擎按前端 gameEngine.ts 的规则互相对局（无牌可出罚两张、
+牌堆空时洗弃牌堆、剩一张牌叫闽派），统计每个引擎的决策速度、搜索速度、延迟分位数和胜率，
+结果输出为JSON，便于在不同提交之间对比。
+
+用法: python benchmark_game_ai.py [--games 20] [--seed 2024] [--matchups easy:medium,medium:hard] [--nodes] [--output bench.json]
+默认搜索引擎带时间限制，节点数和着法会随机器负载略有变化；加 --nodes 按节点预算搜索，
+同一种子的结果完全可复现，适合做A/B对比。胜率需要足够的对局数才有参考意义。
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from game_ai_service import (
+    AlphaBetaPruning, Card, EasyAI, GameState, HardAI, MediumAI,
+    CARD_REGISTRY, DEFAULT_NODE_BUDGETS, _parse_difficulty_values, get_playable_cards
+)
+
+INITIAL_HAND_SIZE = 12  # 与前端 GameConfig.initialHandSize 一致
+PENALTY_CARDS = 2
+DEFAULT_MATCHUPS = "easy:medium,easy:hard,medium:hard"
+
+
+class AlphaBetaEngine:
+    """直接使用 AlphaBetaPruning 固定深度搜索（不经过启发式预剪枝），作为搜索本身的基准"""
+
+    def __init__(self, depth: int = 4, node_limit: Optional[int] = None):
+        self.name = f"α-β搜索(深度{depth})"
+        self.depth = depth
+        self.alpha_beta = AlphaBetaPruning(max_depth=depth, node_limit=node_limit)
+
+    def decide(self, game_state: GameState) -> Tuple[Optional[Card], Dict[str, Any]]:
+        candidates = get_playable_cards(game_state.ai_hand, game_state.current_card)
+        if not candidates:
+            return None, {}
+        result = self.alpha_beta.search_iterative(game_state, self.depth)
+        return result.get("best_move"), {"nodes_evaluated": result["nodes_evaluated"],
+                                         "depth_completed": result["depth_completed"]}
+
+
+def create_engine(name: str, node_budgets: Optional[Dict[str, int]] = None):
+    """按名称创建引擎，困难AI固定单进程搜索以保证结果可比；给出 node_budgets 时按节点预算搜索"""
+    node_budgets = node_budgets or {}
+    if name == 'easy':
+        return EasyAI()
+    if name == 'medium':
+        return MediumAI(node_limit=node_budgets.get('medium'))
+    if name == 'hard':
+        return HardAI(parallel_workers=0, node_limit=node_budgets.get('hard'))
+    if name == 'expecti':
+        return HardAI(parallel_workers=0, node_limit=node_budgets.get('hard'), chance_nodes=True)
+    if name == 'alphabeta':
+        return AlphaBetaEngine(node_limit=node_budgets.get('hard'))
+    raise ValueError(f"未知的引擎: {name}")
+
+
+class EngineStats:
+    """单个引擎的累计统计"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.nodes = 0
+        self.depths: List[int] = []
+        self.penalties = 0
+        self.minpai_calls = 0
+
+    def record(self, latency: float, search_stats: Dict[str, Any]) -> None:
+        self.latencies.append(latency)
+        self.nodes += search_stats.get("nodes_evaluated", 0)
+        if search_stats.get("depth_completed"):
+            self.depths.append(search_stats["depth_completed"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        total_time = sum(self.latencies)
+        latencies = sorted(self.latencies)
+        return {
+            "decisions": len(latencies),
+            "total_decision_time": round(total_time, 4),
+            "decisions_per_sec": round(len(latencies) / total_time, 2) if total_time > 0 else None,
+            "nodes": self.nodes,
+            "nodes_per_sec": round(self.nodes / total_time, 1) if total_time > 0 else None,
+            "latency_ms": {
+                "mean": _round_ms(total_time / len(latencies)) if latencies else None,
+                "p50": _round_ms(_percentile(latencies, 50)),
+                "p90": _round_ms(_percentile(latencies, 90)),
+                "p99": _round_ms(_percentile(latencies, 99)),
+                "max": _round_ms(latencies[-1]) if latencies else None
+            },
+            "mean_depth": round(sum(self.depths) / len(self.depths), 2) if self.depths else None,
+            "penalties": self.penalties,
+            "minpai_calls": self.minpai_calls
+        }
+
+
+def _percentile(sorted_values: List[float], percent: float) -> Optional[float]:
+    """最近秩法分位数"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def _round_ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+class SelfPlayGame:
+    """一局无界面对局，座位 'human' 先手，规则与前端一致"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        deck = list(CARD_REGISTRY)
+        rng.shuffle(deck)
+        self.hands = {
+            'human': deck[:INITIAL_HAND_SIZE],
+            'ai': deck[INITIAL_HAND_SIZE:INITIAL_HAND_SIZE * 2]
+        }
+        remaining = deck[INITIAL_HAND_SIZE * 2:]
+        self.current_card: Card = remaining[0]
+        self.deck: List[Card] = remaining[1:]
+        self.discard: List[Card] = []  # 被压在当前牌下面的牌
+        self.penalties = {'human': 0, 'ai': 0}
+        self.called_minpai = {'human': False, 'ai': False}
+        self.round_count = 1
+        self.start_time = time.time()
+
+    def view_for(self, seat: str) -> GameState:
+        """从某一方的视角构造局面：引擎总是把自己当作 'ai'"""
+        opponent = 'ai' if seat == 'human' else 'human'
+        return GameState(
+            game_phase='playing',
+            current_player='ai',
+            current_card=self.current_card,
+            deck=list(self.deck),
+            player_hand=list(self.hands[opponent]),
+            ai_hand=list(self.hands[seat]),
+            player_called_minpai=self.called_minpai[opponent],
+            ai_called_minpai=self.called_minpai[seat],
+            penalties={'player': self.penalties[opponent], 'ai': self.penalties[seat]},
+            round_count=self.round_count,
+            game_start_time=self.start_time,
+            winner=None,
+            game_end_time=None
+        )
+
+    def play(self, seat: str, card: Card) -> None:
+        """出牌（对应 executeMove）"""
+        self.hands[seat].remove(card)
+        self.discard.append(self.current_card)
+        self.current_card = card
+        self.called_minpai[seat] = False
+        self.round_count += 1
+
+    def penalize(self, seat: str) -> bool:
+        """罚牌（对应 applyPenalty）：摸两张，牌堆空时把弃牌堆洗回牌堆"""
+        drawn = 0
+        for _ in range(PENALTY_CARDS):
+            if not self.deck:
+                if len(self.discard) < 2:
+                    break
+                self.rng.shuffle(self.discard)
+                self.deck, self.discard = self.discard, []
+            self.hands[seat].append(self.deck.pop(0))
+            drawn += 1
+
+        if drawn:
+            self.penalties[seat] += 1
+        return drawn > 0
+
+
+def play_game(engines: Dict[str, Any], stats: Dict[str, EngineStats],
+              rng: random.Random, max_turns: int) -> Tuple[Optional[str], int]:
+    """进行一局对局，返回胜方座位（超过回合上限为 None）和总回合数"""
+    game = SelfPlayGame(rng)
+    seat = 'human'
+
+    for turn in range(max_turns):
+        engine_stats = stats[seat]
+
+        # 只剩一张牌时叫闽派（前端在倒计时内未叫会被罚牌，AI总是叫）
+        if len(game.hands[seat]) == 1 and not game.called_minpai[seat]:
+            game.called_minpai[seat] = True
+            engine_stats.minpai_calls += 1
+
+        if get_playable_cards(game.hands[seat], game.current_card):
+            engine = engines[seat]
+            started = time.perf_counter()
+            card, search_stats = engine.decide(game.view_for(seat))
+            engine_stats.record(time.perf_counter() - started, search_stats)
+            if card is None or card not in game.hands[seat]:
+                raise RuntimeError(f"{seat} 返回了无效的着法: {card}")
+
+            game.play(seat, card)
+            if not game.hands[seat]:
+                return seat, turn + 1
+        elif game.penalize(seat):
+            engine_stats.penalties += 1
+
+        seat = 'ai' if seat == 'human' else 'human'
+
+    return None, max_turns
+
+
+def run_matchup(first: str, second: str, games: int, seed: int, max_turns: int,
+                engine_stats: Dict[str, EngineStats],
+                node_budgets: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """两个引擎对战若干局，每局交换先后手"""
+    wins = {first: 0, second: 0}
+    draws = 0
+    total_turns = 0
+
+    for game_index in range(games):
+        game_seed = seed + game_index
+        # 简单AI使用全局随机数，这里一并设定种子
+        random.seed(game_seed)
+        seats = (first, second) if game_index % 2 == 0 else (second, first)
+        engines = {'human': create_engine(seats[0], node_budgets), 'ai': create_engine(seats[1], node_budgets)}
+        stats = {'human': engine_stats[seats[0]], 'ai': engine_stats[seats[1]]}
+
+        winner_seat, turns = play_game(engines, stats, random.Random(game_seed), max_turns)
+        total_turns += turns
+        if winner_seat is None:
+            draws += 1
+        else:
+            wins[seats[0] if winner_seat == 'human' else seats[1]] += 1
+        print(f"🎲 {first} vs {second} 第{game_index + 1}局: "
+              f"{'平局' if winner_seat is None else seats[0 if winner_seat == 'human' else 1] + ' 胜'} ({turns}回合)",
+              file=sys.stderr)
+
+    return {
+        "engines": [first, second],
+        "games": games,
+        "wins": wins,
+        "draws": draws,
+        "win_rate": {name: round(count / games, 4) for name, count in wins.items()},
+        "mean_turns": round(total_turns / games, 2)
+    }
+
+
+def _git_commit() -> Optional[str]:
+    """当前提交号，便于对比不同版本的结果"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(matchups: List[Tuple[str, str]], games: int, seed: int, max_turns: int,
+                  node_budgets: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """运行全部对战并汇总结果"""
+    names = sorted({name for pair in matchups for name in pair})
+    engine_stats = {name: EngineStats() for name in names}
+    started = time.time()
+
+    results = [run_matchup(first, second, games, seed, max_turns, engine_stats, node_budgets)
+               for first, second in matchups]
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "seed": seed,
+            "games_per_matchup": games,
+            "max_turns": max_turns,
+            "node_budgets": node_budgets,
+            "wall_time": round(time.time() - started, 2)
+        },
+        "engines": {name: stats.to_dict() for name, stats in engine_stats.items()},
+        "matchups": results
+    }
+
+
+def _parse_matchups(text: str) -> List[Tuple[str, str]]:
+    pairs = []
+    for item in text.split(','):
+        first, _, second = item.strip().partition(':')
+        if not first or not second:
+            raise argparse.ArgumentTypeError(f"对战格式应为 引擎:引擎，实际为 {item}")
+        create_engine(first), create_engine(second)
+        pairs.append((first, second))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="游戏AI自对弈基准测试")
+    parser.add_argument('--games', type=int, default=20, help="每组对战的局数")
+    parser.add_argument('--seed', type=int, default=2024, help="发牌种子")
+    parser.add_argument('--matchups', type=_parse_matchups, default=_parse_matchups(DEFAULT_MATCHUPS),
+                        help="逗号分隔的对战列表，引擎可选 easy/medium/hard/expecti/alphabeta")
+    parser.add_argument('--max-turns', type=int, default=400, help="单局回合上限，超过记为平局")
+    parser.add_argument('--nodes', nargs='?', const=DEFAULT_NODE_BUDGETS, metavar='medium:N,hard:N',
+                        help=f"按节点预算搜索，结果可复现；不给配额时使用默认值 {DEFAULT_NODE_BUDGETS}")
+    parser.add_argument('--output', help="结果JSON的输出路径，默认打印到标准输出")
+    args = parser.parse_args()
+
+    node_budgets = _parse_difficulty_values(args.nodes, int) if args.nodes else None
+    report = run_benchmark(args.matchups, args.games, args.seed, args.max_turns, node_budgets)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f"✅ 结果已写入 {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+残局库生成脚本
+枚举每方不超过N张手牌的全部残局，求出精确的极小极大值并写入二进制文件，
+game_ai_service 启动时以内存映射方式加载。
+无牌可出的局面使用静态评估，残局库因此与评估权重绑定：更换权重文件后需要重新生成。
+
+用法: python build_endgame_tablebase.py [--max-cards 2] [--output data/endgame_tablebase.bin]
+每方3张牌时约2100万个条目（约85MB），纯Python生成需要较长时间。
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+from array import array
+from typing import Dict, Tuple
+
+from game_ai_service import (
+    AlphaBetaPruning, BitboardState, EndgameTablebase, enumerate_class_hands,
+    CARDS_PER_CLASS, CLASS_COUNT, DEFAULT_TABLEBASE_PATH, EVAL_WEIGHTS, TABLEBASE_HEADER,
+    TABLEBASE_MAGIC, TABLEBASE_VERSION, WIN_SCORE, WIN_THRESHOLD
+)
+
+# 不依赖已有残局库的评估器
+_evaluator = AlphaBetaPruning()
+_evaluator.tablebase = None
+
+
+def _is_compatible(card_class: int, current_class: int) -> bool:
+    """同文化或同类型的牌可以接"""
+    if current_class < 0:
+        return True
+    return card_class // 3 == current_class // 3 or card_class % 3 == current_class % 3
+
+
+def _build_board(ai_hand: Tuple[int, ...], player_hand: Tuple[int, ...], current_class: int) -> BitboardState:
+    """按类别计数构造一个具体局面：每个类别的5个序号依次分给AI、玩家和当前牌"""
+    ai_mask = player_mask = 0
+    current = -1
+    for card_class in range(CLASS_COUNT):
+        slot = card_class * CARDS_PER_CLASS
+        for _ in range(ai_hand[card_class]):
+            ai_mask |= 1 << slot
+            slot += 1
+        for _ in range(player_hand[card_class]):
+            player_mask |= 1 << slot
+            slot += 1
+        if card_class == current_class:
+            current = slot
+    return BitboardState(ai_mask, player_mask, 0, current, 0)
+
+
+def _is_valid(ai_hand: Tuple[int, ...], player_hand: Tuple[int, ...], current_class: int) -> bool:
+    """每个类别只有5张牌"""
+    for card_class in range(CLASS_COUNT):
+        used = ai_hand[card_class] + player_hand[card_class] + (card_class == current_class)
+        if used > CARDS_PER_CLASS:
+            return False
+    return True
+
+
+def solve(ai_hand: Tuple[int, ...], player_hand: Tuple[int, ...], current_class: int, ai_to_move: bool,
+          memo: Dict[tuple, float]) -> float:
+    """求局面的精确值（以该局面计的胜负分数，或无牌可出时的静态评估）"""
+    key = (ai_hand, player_hand, current_class, ai_to_move)
+    cached = memo.get(key)
+    if cached is not None:
+        return cached
+
+    if sum(ai_hand) == 0:
+        value = WIN_SCORE
+    elif sum(player_hand) == 0:
+        value = -WIN_SCORE
+    else:
+        mover = ai_hand if ai_to_move else player_hand
+        children = []
+        for card_class in range(CLASS_COUNT):
+            if mover[card_class] and _is_compatible(card_class, current_class):
+                hand = list(mover)
+                hand[card_class] -= 1
+                if ai_to_move:
+                    child = solve(tuple(hand), player_hand, card_class, False, memo)
+                else:
+                    child = solve(ai_hand, tuple(hand), card_class, True, memo)
+                # 子局面的胜负再远一步
+                if child > WIN_THRESHOLD:
+                    child -= 1
+                elif child < -WIN_THRESHOLD:
+                    child += 1
+                children.append(child)
+
+        if not children:
+            # 无牌可出：与搜索一致，使用静态评估（罚牌项在查询时加上）
+            value = _evaluator._evaluate_position(_build_board(ai_hand, player_hand, current_class))
+        else:
+            value = max(children) if ai_to_move else min(children)
+
+    memo[key] = value
+    return value
+
+
+def build_tablebase(max_cards: int, output: str) -> None:
+    """生成残局库文件"""
+    hands = enumerate_class_hands(max_cards)
+    hand_count = len(hands)
+    entry_count = hand_count * hand_count * (CLASS_COUNT + 1) * 2
+    print(f"开始生成残局库: 每方不超过{max_cards}张牌, {hand_count}种手牌, {entry_count}个条目")
+
+    start_time = time.time()
+    values = array('f', [math.nan]) * entry_count
+    memo: Dict[tuple, float] = {}
+
+    for ai_rank, ai_hand in enumerate(hands):
+        for player_rank, player_hand in enumerate(hands):
+            for current_class in range(-1, CLASS_COUNT):
+                if not _is_valid(ai_hand, player_hand, current_class):
+                    continue
+                for ai_to_move in (False, True):
+                    index = EndgameTablebase.entry_index(ai_rank, player_rank, current_class, ai_to_move, hand_count)
+                    values[index] = solve(ai_hand, player_hand, current_class, ai_to_move, memo)
+        if (ai_rank + 1) % 100 == 0:
+            print(f"  已完成 {ai_rank + 1}/{hand_count} 种AI手牌")
+
+    if sys.byteorder != 'little':
+        values.byteswap()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    temp_path = output + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(TABLEBASE_HEADER.pack(TABLEBASE_MAGIC, TABLEBASE_VERSION, max_cards, entry_count,
+                                      EVAL_WEIGHTS.signature()))
+        values.tofile(f)
+    os.replace(temp_path, output)
+
+    print(f"残局库已写入 {output} ({os.path.getsize(output)} 字节), 耗时 {time.time() - start_time:.1f}秒")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='生成残局库')
+    parser.add_argument('--max-cards', type=int, default=2, help='每方最大手牌数')
+    parser.add_argument('--output', default=DEFAULT_TABLEBASE_PATH, help='输出文件路径')
+    args = parser.parse_args()
+    build_tablebase(args.max_cards, args.output)
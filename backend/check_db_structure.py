@@ -1,7 +1,10 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, select
 import os
 
+from question_bank import question_metadata, question_table
+
 app = Flask(__name__)
 
 # 配置
@@ -28,20 +31,18 @@ def check_database_structure():
 
         print("\n=== 题目数据统计 ===")
 
-        # 检查各城市的题目数量
-        city_models = {
-            '福州市': FuzhouQuestion,
-            '泉州市': QuanzhouQuestion,
-            '南平市': NanpingQuestion,
-            '龙岩市': LongyanQuestion,
-            '莆田市': PutianQuestion
-        }
+        # 检查各城市的题目数量（统一题目表，按城市分组计数）
+        question_metadata.create_all(db.engine)
+        with db.engine.connect() as conn:
+            city_counts = conn.execute(
+                select(question_table.c.city_key, func.count())
+                .group_by(question_table.c.city_key)
+            ).all()
 
         total_questions = 0
-        for city_name, model in city_models.items():
-            count = model.query.count()
+        for city_key, count in city_counts:
             total_questions += count
-            print(f"🏛️ {city_name}: {count} 道题目")
+            print(f"🏛️ {city_key}: {count} 道题目")
 
         print(f"\n📊 总计: {total_questions} 道题目")
 
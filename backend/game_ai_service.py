@@ -3,9 +3,22 @@
 使用α-β剪枝算法提供智能决策
 """
 
+import os
+import json
+import hashlib
+import sqlite3
+import math
+import mmap
+import struct
 import time
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+import random
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass, replace
 from enum import Enum
 
 class CultureType(str, Enum):
@@ -20,8 +33,9 @@ class CardType(str, Enum):
     LOCATION = "location"
     QUOTE = "quote"
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Card:
+    """卡牌 - 不可变，全部75张在导入时建好并复用（见 CARD_REGISTRY）"""
     id: str
     name: str
     culture: CultureType
@@ -44,165 +58,735 @@ class GameState:
     winner: Optional[str]
     game_end_time: Optional[float]
 
-class AlphaBetaPruning:
-    """α-β剪枝算法实现"""
+# ==================== 位棋盘表示 ====================
+# 全部75张牌按 文化(5) x 类型(3) x 序号(5) 编号，与前端 cardData.ts 的
+# card_1 ~ card_75 顺序一致：index = 文化序号*15 + 类型序号*5 + 同类序号
+
+CULTURE_ORDER: List[CultureType] = list(CultureType)
+TYPE_ORDER: List[CardType] = list(CardType)
+CARDS_PER_CLASS = 5
+CARD_COUNT = len(CULTURE_ORDER) * len(TYPE_ORDER) * CARDS_PER_CLASS
+
+# 每张牌所属的文化/类型序号
+CARD_CULTURE_INDEX: List[int] = [i // (len(TYPE_ORDER) * CARDS_PER_CLASS) for i in range(CARD_COUNT)]
+CARD_TYPE_INDEX: List[int] = [(i // CARDS_PER_CLASS) % len(TYPE_ORDER) for i in range(CARD_COUNT)]
+
+# 文化掩码 / 类型掩码
+CULTURE_MASKS: List[int] = [
+    sum(1 << i for i in range(CARD_COUNT) if CARD_CULTURE_INDEX[i] == c)
+    for c in range(len(CULTURE_ORDER))
+]
+TYPE_MASKS: List[int] = [
+    sum(1 << i for i in range(CARD_COUNT) if CARD_TYPE_INDEX[i] == t)
+    for t in range(len(TYPE_ORDER))
+]
+
+# 文化x类型 分组掩码：同组的5张牌编号连续，下标 = 文化序号*3 + 类型序号 = 牌序号 // 5
+CLASS_MASKS: List[int] = [((1 << CARDS_PER_CLASS) - 1) << (k * CARDS_PER_CLASS)
+                          for k in range(len(CULTURE_ORDER) * len(TYPE_ORDER))]
+
+# 类型序号对应的战略加成（人物 > 地点 > 语录）
+TYPE_STRATEGIC_BONUS: List[float] = [1.5, 1.2, 1.0]
+
+PENALTY_DRAW_COUNT = 2  # 罚牌摸牌数，与前端 applyPenalty 一致
+
+# ==================== 卡牌注册表 ====================
+# 导入时一次性建好：75张卡牌对象、卡牌ID -> 序号，以及每张牌之后可接的牌（75x75兼容矩阵按行压成掩码）
+# 卡牌目录 card_catalog.json 与前端 cardData.ts 的顺序一致，序号i对应 card_{i+1}
+
+CARD_CATALOG_PATH = os.path.join(os.path.dirname(__file__), 'card_catalog.json')
+
+
+def _load_card_registry(path: str) -> Tuple[Card, ...]:
+    """加载卡牌目录，并校验其顺序与位棋盘编号一致"""
+    with open(path, 'r', encoding='utf-8') as f:
+        catalog = json.load(f)
+    if len(catalog) != CARD_COUNT:
+        raise ValueError(f"卡牌目录应有{CARD_COUNT}张牌，实际为{len(catalog)}张")
+
+    cards = []
+    for i, entry in enumerate(catalog):
+        card = Card(
+            id=entry["id"],
+            name=entry["name"],
+            culture=CultureType(entry["culture"]),
+            type=CardType(entry["type"]),
+            image=entry["image"]
+        )
+        if (card.id != f"card_{i + 1}" or card.culture != CULTURE_ORDER[CARD_CULTURE_INDEX[i]] or
+                card.type != TYPE_ORDER[CARD_TYPE_INDEX[i]]):
+            raise ValueError(f"卡牌目录第{i + 1}项与位棋盘编号不一致: {card.id}")
+        cards.append(card)
 
-    def __init__(self, max_depth: int = 4, time_limit: float = 1.0):
-        self.max_depth = max_depth
-        self.time_limit = time_limit
-        self.start_time = time.time()
+    return tuple(cards)
 
-    def search(self, game_state: GameState, depth: int, alpha: float, beta: float, maximizing_player: bool) -> Dict[str, Any]:
-        """主搜索函数"""
-        self.start_time = time.time()
-        return self._alpha_beta_search(game_state, depth, alpha, beta, maximizing_player, 0)
 
-    def _alpha_beta_search(self, game_state: GameState, depth: int, alpha: float, beta: float,
-                          maximizing_player: bool, nodes_evaluated: int) -> Dict[str, Any]:
-        """α-β剪枝搜索实现"""
+CARD_REGISTRY: Tuple[Card, ...] = _load_card_registry(CARD_CATALOG_PATH)
+CARD_INDEX_BY_ID: Dict[str, int] = {card.id: i for i, card in enumerate(CARD_REGISTRY)}
 
-        # 时间限制检查
-        if time.time() - self.start_time > self.time_limit:
-            return {
-                "score": self._evaluate_position(game_state),
-                "nodes_evaluated": nodes_evaluated + 1
-            }
+PLAYABLE_SUCCESSORS: List[int] = [
+    (CULTURE_MASKS[CARD_CULTURE_INDEX[i]] | TYPE_MASKS[CARD_TYPE_INDEX[i]]) & ~(1 << i)
+    for i in range(CARD_COUNT)
+]
 
-        # 深度限制或终止条件
-        if depth == 0 or self._is_terminal(game_state):
-            return {
-                "score": self._evaluate_position(game_state),
-                "nodes_evaluated": nodes_evaluated + 1
-            }
 
-        # 获取可能的移动
-        possible_moves = self._get_possible_moves(game_state)
+# Zobrist 随机键 - 固定种子，保证不同进程得到相同的哈希
+_zobrist_rng = random.Random(0x6D696E706169)
+ZOBRIST_AI_HAND: List[int] = [_zobrist_rng.getrandbits(64) for _ in range(CARD_COUNT)]
+ZOBRIST_PLAYER_HAND: List[int] = [_zobrist_rng.getrandbits(64) for _ in range(CARD_COUNT)]
+ZOBRIST_CURRENT: List[int] = [_zobrist_rng.getrandbits(64) for _ in range(CARD_COUNT)]
+ZOBRIST_AI_TO_MOVE: int = _zobrist_rng.getrandbits(64)
+# 罚牌差相对搜索根节点的变化量（-64 ~ 64），只有模拟罚牌的搜索会用到；变化量为0时不改变哈希
+PENALTY_SHIFT_RANGE = 64
+ZOBRIST_PENALTY_SHIFT: List[int] = [_zobrist_rng.getrandbits(64) if shift else 0
+                                    for shift in range(-PENALTY_SHIFT_RANGE, PENALTY_SHIFT_RANGE + 1)]
 
-        # 如果没有可移动作，返回当前位置评估
-        if not possible_moves:
-            return {
-                "score": self._evaluate_position(game_state),
-                "nodes_evaluated": nodes_evaluated + 1
-            }
 
-        if maximizing_player:
-            # 最大化玩家 (AI)
-            max_eval = float('-inf')
-            best_move = None
+def _popcount(mask: int) -> int:
+    """统计掩码中置位的数量"""
+    return bin(mask).count("1")
 
-            for move in possible_moves:
-                new_state = self._make_move(game_state, move, 'ai')
-                result = self._alpha_beta_search(
-                    new_state, depth - 1, alpha, beta, False, nodes_evaluated + 1
-                )
 
-                if result["score"] > max_eval:
-                    max_eval = result["score"]
-                    best_move = move
+def _iter_bits(mask: int):
+    """按从低到高的顺序遍历掩码中的牌序号"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _card_bit_index(card: Card) -> int:
+    """获取卡牌在位棋盘中的序号"""
+    index = CARD_INDEX_BY_ID.get(card.id)
+    if index is None:
+        raise ValueError(f"无法识别的卡牌ID: {card.id}")
+    if card is CARD_REGISTRY[index]:
+        return index
+    if (CULTURE_ORDER[CARD_CULTURE_INDEX[index]] != card.culture or
+            TYPE_ORDER[CARD_TYPE_INDEX[index]] != card.type):
+        raise ValueError(f"卡牌ID与文化/类型不匹配: {card.id}")
+
+    return index
+
+
+def _cards_to_mask(cards: List[Card]) -> int:
+    """将卡牌列表编码为掩码"""
+    mask = 0
+    for card in cards:
+        mask |= 1 << _card_bit_index(card)
+    return mask
+
+
+def _moves_to_mask(moves: List[int]) -> int:
+    """将着法序号列表编码为掩码"""
+    mask = 0
+    for move in moves:
+        mask |= 1 << move
+    return mask
+
+
+def _card_indices(cards: Optional[List[Card]]) -> Optional[List[int]]:
+    """卡牌列表转为着法序号列表（保持顺序）"""
+    return [_card_bit_index(card) for card in cards] if cards is not None else None
+
+
+def get_playable_cards(hand: List[Card], current_card: Optional[Card]) -> List[Card]:
+    """获取可出牌 - 查兼容表，不再逐张比较文化和类型"""
+    if not current_card:
+        return hand
+
+    successors = PLAYABLE_SUCCESSORS[_card_bit_index(current_card)]
+    return [card for card in hand if successors >> _card_bit_index(card) & 1]
+
+
+def count_playable_cards(hand: List[Card], current_card: Optional[Card]) -> int:
+    """统计可出牌数量"""
+    if not current_card:
+        return len(hand)
+
+    return _popcount(_cards_to_mask(hand) & PLAYABLE_SUCCESSORS[_card_bit_index(current_card)])
+
+
+class HandCounts:
+    """一方手牌的 文化x类型 计数矩阵，随走子/撤销增量维护，评估函数只读这些计数"""
+
+    __slots__ = ('size', 'classes', 'cultures', 'types', 'distinct_cultures', 'single_cultures', 'single_types')
+
+    def __init__(self, mask: int = 0):
+        self.size = 0
+        self.classes = [0] * (len(CULTURE_ORDER) * len(TYPE_ORDER))  # 下标: 文化序号*3 + 类型序号
+        self.cultures = [0] * len(CULTURE_ORDER)
+        self.types = [0] * len(TYPE_ORDER)
+        self.distinct_cultures = 0  # 持有的文化种数
+        self.single_cultures = 0    # 只剩一张的文化数
+        self.single_types = 0       # 只剩一张的类型数
+        for index in _iter_bits(mask):
+            self.add(index)
+
+    def add(self, index: int) -> None:
+        """加入一张牌"""
+        culture = CARD_CULTURE_INDEX[index]
+        card_type = CARD_TYPE_INDEX[index]
+        self.size += 1
+        self.classes[culture * 3 + card_type] += 1
+
+        count = self.cultures[culture] + 1
+        self.cultures[culture] = count
+        if count == 1:
+            self.distinct_cultures += 1
+            self.single_cultures += 1
+        elif count == 2:
+            self.single_cultures -= 1
+
+        count = self.types[card_type] + 1
+        self.types[card_type] = count
+        if count == 1:
+            self.single_types += 1
+        elif count == 2:
+            self.single_types -= 1
+
+    def remove(self, index: int) -> None:
+        """移除一张牌"""
+        culture = CARD_CULTURE_INDEX[index]
+        card_type = CARD_TYPE_INDEX[index]
+        self.size -= 1
+        self.classes[culture * 3 + card_type] -= 1
+
+        count = self.cultures[culture] - 1
+        self.cultures[culture] = count
+        if count == 0:
+            self.distinct_cultures -= 1
+            self.single_cultures -= 1
+        elif count == 1:
+            self.single_cultures += 1
+
+        count = self.types[card_type] - 1
+        self.types[card_type] = count
+        if count == 0:
+            self.single_types -= 1
+        elif count == 1:
+            self.single_types += 1
+
+    def playable_count(self, current: int) -> int:
+        """可接在当前牌后的牌数：同文化 + 同类型 - 同文化同类型"""
+        if current < 0:
+            return self.size
+        culture = CARD_CULTURE_INDEX[current]
+        card_type = CARD_TYPE_INDEX[current]
+        return self.cultures[culture] + self.types[card_type] - self.classes[culture * 3 + card_type]
+
+
+class BitboardState:
+    """搜索用的位棋盘局面 - 手牌和牌堆均以整数掩码表示，走子/撤销只需位运算"""
+
+    __slots__ = ('ai_mask', 'player_mask', 'deck_mask', 'current', 'penalty_diff', 'finished', 'key',
+                 'ai_counts', 'player_counts')
+
+    def __init__(self, ai_mask: int, player_mask: int, deck_mask: int, current: int,
+                 penalty_diff: int, finished: bool = False):
+        self.ai_mask = ai_mask
+        self.player_mask = player_mask
+        self.deck_mask = deck_mask
+        self.current = current  # 当前牌序号，-1 表示没有当前牌
+        self.penalty_diff = penalty_diff  # 玩家罚牌数 - AI罚牌数
+        self.finished = finished
+        self.key = self._compute_key()
+        self.ai_counts = HandCounts(ai_mask)
+        self.player_counts = HandCounts(player_mask)
+
+    def _compute_key(self) -> int:
+        """完整计算局面的Zobrist哈希（不含行动方）"""
+        key = ZOBRIST_CURRENT[self.current] if self.current >= 0 else 0
+        for index in _iter_bits(self.ai_mask):
+            key ^= ZOBRIST_AI_HAND[index]
+        for index in _iter_bits(self.player_mask):
+            key ^= ZOBRIST_PLAYER_HAND[index]
+        return key
+
+    @classmethod
+    def from_game_state(cls, game_state: GameState) -> 'BitboardState':
+        """从GameState构建位棋盘局面"""
+        return cls(
+            ai_mask=_cards_to_mask(game_state.ai_hand),
+            player_mask=_cards_to_mask(game_state.player_hand),
+            deck_mask=_cards_to_mask(game_state.deck),
+            current=_card_bit_index(game_state.current_card) if game_state.current_card else -1,
+            penalty_diff=game_state.penalties.get('player', 0) - game_state.penalties.get('ai', 0),
+            finished=game_state.game_phase == 'finished'
+        )
 
-                alpha = max(alpha, result["score"])
-                nodes_evaluated = result["nodes_evaluated"]
+    def playable_filter(self) -> int:
+        """当前牌允许出的牌的掩码"""
+        if self.current < 0:
+            return -1  # 第一张牌，任意可出
+        return PLAYABLE_SUCCESSORS[self.current]
+
+    def playable_mask(self, is_ai: bool) -> int:
+        """指定一方的可出牌掩码"""
+        hand = self.ai_mask if is_ai else self.player_mask
+        return hand & self.playable_filter()
+
+    def make_move(self, index: int, is_ai: bool) -> int:
+        """出牌，返回撤销所需的原当前牌"""
+        bit = 1 << index
+        if is_ai:
+            self.ai_mask ^= bit
+            self.ai_counts.remove(index)
+            self.key ^= ZOBRIST_AI_HAND[index]
+        else:
+            self.player_mask ^= bit
+            self.player_counts.remove(index)
+            self.key ^= ZOBRIST_PLAYER_HAND[index]
+        previous = self.current
+        if previous >= 0:
+            self.key ^= ZOBRIST_CURRENT[previous]
+        self.key ^= ZOBRIST_CURRENT[index]
+        self.current = index
+        return previous
+
+    def unmake_move(self, index: int, is_ai: bool, previous: int) -> None:
+        """撤销出牌"""
+        bit = 1 << index
+        if is_ai:
+            self.ai_mask |= bit
+            self.ai_counts.add(index)
+            self.key ^= ZOBRIST_AI_HAND[index]
+        else:
+            self.player_mask |= bit
+            self.player_counts.add(index)
+            self.key ^= ZOBRIST_PLAYER_HAND[index]
+        self.key ^= ZOBRIST_CURRENT[index]
+        if previous >= 0:
+            self.key ^= ZOBRIST_CURRENT[previous]
+        self.current = previous
+
+    def draw_card(self, index: int, is_ai: bool) -> None:
+        """从牌堆摸一张牌到指定一方手中"""
+        bit = 1 << index
+        self.deck_mask ^= bit
+        if is_ai:
+            self.ai_mask |= bit
+            self.ai_counts.add(index)
+            self.key ^= ZOBRIST_AI_HAND[index]
+        else:
+            self.player_mask |= bit
+            self.player_counts.add(index)
+            self.key ^= ZOBRIST_PLAYER_HAND[index]
+
+    def undraw_card(self, index: int, is_ai: bool) -> None:
+        """撤销摸牌，把牌放回牌堆"""
+        bit = 1 << index
+        self.deck_mask |= bit
+        if is_ai:
+            self.ai_mask ^= bit
+            self.ai_counts.remove(index)
+            self.key ^= ZOBRIST_AI_HAND[index]
+        else:
+            self.player_mask ^= bit
+            self.player_counts.remove(index)
+            self.key ^= ZOBRIST_PLAYER_HAND[index]
 
-                # β剪枝
-                if beta <= alpha:
-                    break  # 剪枝
+    def is_terminal(self) -> bool:
+        """检查是否为终止状态"""
+        return self.ai_mask == 0 or self.player_mask == 0 or self.finished
 
-            return {
-                "score": max_eval,
-                "best_move": best_move,
-                "nodes_evaluated": nodes_evaluated
-            }
-        else:
-            # 最小化玩家 (人类)
-            min_eval = float('inf')
+    def to_tuple(self) -> tuple:
+        """导出为可跨进程传递的元组，可用 BitboardState(*state) 还原"""
+        return (self.ai_mask, self.player_mask, self.deck_mask, self.current, self.penalty_diff, self.finished)
 
-            for move in possible_moves:
-                new_state = self._make_move(game_state, move, 'human')
-                result = self._alpha_beta_search(
-                    new_state, depth - 1, alpha, beta, True, nodes_evaluated + 1
-                )
 
-                min_eval = min(min_eval, result["score"])
-                beta = min(beta, result["score"])
-                nodes_evaluated = result["nodes_evaluated"]
+# 胜负分数 - 远大于启发式评估的取值范围；越早取胜分数越高
+WIN_SCORE = 10000.0
+WIN_THRESHOLD = WIN_SCORE - 1000.0
 
-                # α剪枝
-                if beta <= alpha:
-                    break  # 剪枝
 
-            return {
-                "score": min_eval,
-                "nodes_evaluated": nodes_evaluated
-            }
+def _score_to_relative(score: float, ply: int) -> float:
+    """将以根节点计的胜负分数转换为以当前局面计（写入置换表/残局库时使用）"""
+    if score > WIN_THRESHOLD:
+        return score + ply
+    if score < -WIN_THRESHOLD:
+        return score - ply
+    return score
+
+
+def _score_from_relative(score: float, ply: int) -> float:
+    """将以当前局面计的胜负分数转换为以根节点计"""
+    if score > WIN_THRESHOLD:
+        return score - ply
+    if score < -WIN_THRESHOLD:
+        return score + ply
+    return score
+
+
+# ==================== 评估权重 ====================
+# _evaluate_position 各项的权重；默认值为手工设定，可由 tune_eval_weights.py 离线调参生成的权重文件覆盖
+
+DEFAULT_EVAL_WEIGHTS_PATH = os.path.join(os.path.dirname(__file__), 'data', 'eval_weights.json')
+
+
+class EvaluationWeights:
+    """局面评估函数的权重，顺序与 PositionEvaluator.evaluation_features 的特征一致"""
+
+    FIELDS = ("hand", "penalty", "quality", "playable", "ai_near_win", "player_near_win", "culture_control")
+    DEFAULTS = (15.0, 10.0, 3.0, 5.0, 20.0, -25.0, 2.0)
+
+    __slots__ = FIELDS
+
+    def __init__(self, values: Optional[Tuple[float, ...]] = None):
+        values = values if values is not None else self.DEFAULTS
+        if len(values) != len(self.FIELDS):
+            raise ValueError(f"评估权重应有{len(self.FIELDS)}项，实际为{len(values)}项")
+        for name, value in zip(self.FIELDS, values):
+            setattr(self, name, float(value))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, float]) -> 'EvaluationWeights':
+        """从字典构建，缺少的项使用默认值"""
+        return cls(tuple(float(data.get(name, default)) for name, default in zip(cls.FIELDS, cls.DEFAULTS)))
+
+    def as_tuple(self) -> Tuple[float, ...]:
+        return tuple(getattr(self, name) for name in self.FIELDS)
+
+    def to_dict(self) -> Dict[str, float]:
+        return dict(zip(self.FIELDS, self.as_tuple()))
+
+    def signature(self) -> bytes:
+        """权重签名（8字节），残局库记录生成时的签名，权重变化后旧库作废"""
+        return hashlib.sha1(json.dumps(self.as_tuple()).encode('utf-8')).digest()[:8]
+
+
+def load_evaluation_weights() -> EvaluationWeights:
+    """启动时加载评估权重，路径可用环境变量 GAME_AI_EVAL_WEIGHTS 指定；文件不存在时使用默认权重"""
+    path = os.getenv('GAME_AI_EVAL_WEIGHTS', DEFAULT_EVAL_WEIGHTS_PATH)
+    if not os.path.exists(path):
+        return EvaluationWeights()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            weights = EvaluationWeights.from_dict(json.load(f)["weights"])
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"⚠️ 评估权重加载失败，使用默认权重: {e}")
+        return EvaluationWeights()
+    print(f"📐 评估权重已加载: {weights.to_dict()}")
+    return weights
+
+
+EVAL_WEIGHTS: EvaluationWeights = load_evaluation_weights()
+
+# ==================== 残局库 ====================
+# 同文化同类型的牌在规则上完全等价，残局按每方手牌的 文化x类型 计数组合编号。
+# 文件格式: 头部(魔数, 版本, 每方最大手牌数, 条目数, 评估权重签名) + float32 条目数组(小端)
+# 条目下标: ((AI手牌编号 * 手牌组合数 + 玩家手牌编号) * 16 + 当前牌类别+1) * 2 + AI行动
+# 条目值: 以该局面计的精确极小极大值，不含罚牌项；NaN 表示不可能出现的局面
+
+CLASS_COUNT = len(CULTURE_ORDER) * len(TYPE_ORDER)
+TABLEBASE_MAGIC = b'MPTB'
+TABLEBASE_VERSION = 2
+TABLEBASE_HEADER = struct.Struct('<4sHHI8s')
+DEFAULT_TABLEBASE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'endgame_tablebase.bin')
+
+
+def enumerate_class_hands(max_cards: int) -> List[Tuple[int, ...]]:
+    """枚举所有不超过max_cards张的手牌（按类别计数表示），顺序固定"""
+    hands: List[Tuple[int, ...]] = []
+
+    def extend(prefix: List[int], remaining: int) -> None:
+        if len(prefix) == CLASS_COUNT:
+            hands.append(tuple(prefix))
+            return
+        for count in range(min(remaining, CARDS_PER_CLASS) + 1):
+            prefix.append(count)
+            extend(prefix, remaining - count)
+            prefix.pop()
+
+    extend([], max_cards)
+    hands.sort(key=lambda hand: (sum(hand), hand))
+    return hands
+
+
+class EndgameTablebase:
+    """只读残局库 - 以内存映射方式打开，按局面查询精确值"""
+
+    def __init__(self, max_cards: int, buffer, source: Optional[mmap.mmap] = None, signature: bytes = b''):
+        self.max_cards = max_cards
+        self.signature = signature  # 生成时评估权重的签名
+        self.hand_ranks: Dict[Tuple[int, ...], int] = {
+            hand: rank for rank, hand in enumerate(enumerate_class_hands(max_cards))
+        }
+        self.hand_count = len(self.hand_ranks)
+        self.buffer = buffer
+        self._source = source
+        self.path: Optional[str] = None  # 从文件加载时记录路径，并行搜索的工作进程按路径打开同一个库
+        self.probes = 0
+        self.hits = 0
+
+    @staticmethod
+    def entry_index(ai_rank: int, player_rank: int, current_class: int, ai_to_move: bool, hand_count: int) -> int:
+        """计算条目下标，current_class 为 -1 表示没有当前牌"""
+        return ((ai_rank * hand_count + player_rank) * (CLASS_COUNT + 1) + current_class + 1) * 2 + ai_to_move
+
+    @classmethod
+    def load(cls, path: str) -> Optional['EndgameTablebase']:
+        """内存映射残局库文件，文件不存在或格式不符时返回None"""
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb') as f:
+            source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
-    def _evaluate_position(self, game_state: GameState) -> float:
-        """启发式评估函数"""
+        magic, version, max_cards, entry_count, signature = TABLEBASE_HEADER.unpack_from(source, 0)
+        if magic != TABLEBASE_MAGIC or version != TABLEBASE_VERSION:
+            print(f"⚠️ 残局库文件格式不符，已忽略: {path}")
+            source.close()
+            return None
+
+        tablebase = cls(max_cards, source, signature=signature)
+        expected = tablebase.hand_count * tablebase.hand_count * (CLASS_COUNT + 1) * 2
+        if entry_count != expected or len(source) != TABLEBASE_HEADER.size + entry_count * 4:
+            print(f"⚠️ 残局库文件格式不符，已忽略: {path}")
+            source.close()
+            return None
+
+        tablebase._source = source
+        tablebase.path = os.path.abspath(path)
+        return tablebase
+
+    def covers(self, board: 'BitboardState') -> bool:
+        """局面是否在残局库范围内"""
+        return board.ai_counts.size <= self.max_cards and board.player_counts.size <= self.max_cards
+
+    def probe(self, board: 'BitboardState', ai_to_move: bool) -> Optional[float]:
+        """查询局面的精确值（以该局面计，不含罚牌项），不在库中返回None"""
+        self.probes += 1
+        ai_rank = self.hand_ranks.get(tuple(board.ai_counts.classes))
+        player_rank = self.hand_ranks.get(tuple(board.player_counts.classes))
+        if ai_rank is None or player_rank is None:
+            return None
+
+        current_class = board.current // CARDS_PER_CLASS if board.current >= 0 else -1
+        index = self.entry_index(ai_rank, player_rank, current_class, ai_to_move, self.hand_count)
+        value = struct.unpack_from('<f', self.buffer, TABLEBASE_HEADER.size + index * 4)[0]
+        if math.isnan(value):
+            return None
+
+        self.hits += 1
+        return value
+
+
+def load_endgame_tablebase() -> Optional[EndgameTablebase]:
+    """启动时加载残局库，路径可用环境变量 GAME_AI_TABLEBASE 指定"""
+    path = os.getenv('GAME_AI_TABLEBASE', DEFAULT_TABLEBASE_PATH)
+    try:
+        tablebase = EndgameTablebase.load(path)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"⚠️ 残局库加载失败: {e}")
+        return None
+    if tablebase and tablebase.signature != EVAL_WEIGHTS.signature():
+        print(f"⚠️ 残局库与当前评估权重不一致，已忽略，请重新生成: {path}")
+        return None
+    if tablebase:
+        print(f"📚 残局库已加载: 每方不超过{tablebase.max_cards}张牌")
+    return tablebase
+
+
+ENDGAME_TABLEBASE: Optional[EndgameTablebase] = load_endgame_tablebase()
+
+
+# 置换表条目的边界类型
+TT_EXACT = 0
+TT_LOWER = 1
+TT_UPPER = 2
+
+
+class TranspositionTable:
+    """置换表 - 固定容量，同槽冲突时按搜索深度优先替换"""
+
+    def __init__(self, size_bits: int = 16):
+        self.size = 1 << size_bits
+        self.mask = self.size - 1
+        # 条目格式: (key, depth, score, bound, best_move)
+        self.entries: List[Optional[tuple]] = [None] * self.size
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self) -> None:
+        """清空置换表和统计"""
+        self.entries = [None] * self.size
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key: int) -> Optional[tuple]:
+        """查询局面，未命中返回None"""
+        self.probes += 1
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, score: float, bound: int, best_move: Optional[int]) -> None:
+        """写入局面，槽位被其他局面占用时只在深度不低于原条目时替换"""
+        slot = key & self.mask
+        existing = self.entries[slot]
+        if existing is None or existing[0] == key or depth >= existing[1]:
+            self.entries[slot] = (key, depth, score, bound, best_move)
+
+    def hit_rate(self) -> float:
+        """命中率"""
+        return self.hits / self.probes if self.probes else 0.0
+
+
+class SearchTimeout(Exception):
+    """迭代加深搜索超过截止时间时抛出，用于中止当前迭代"""
+
+
+# 每层保留的杀手着法数量
+KILLER_SLOTS = 2
+
+
+class SearchStatistics:
+    """单次搜索的统计：节点数、剪枝次数、完成深度、超时等"""
+
+    __slots__ = ('nodes', 'leaf_nodes', 'beta_cutoffs', 'alpha_cutoffs', 'tt_cutoffs', 'tablebase_hits',
+                 'chance_nodes', 'chance_hits', 'prune_readmitted', 'max_ply', 'depth_completed', 'iteration_nodes',
+                 'timed_out')
+
+    def __init__(self):
+        self.nodes = 0
+        self.leaf_nodes = 0
+        self.beta_cutoffs = 0      # AI节点的β剪枝
+        self.alpha_cutoffs = 0     # 对手节点的α剪枝
+        self.tt_cutoffs = 0        # 置换表直接截断
+        self.tablebase_hits = 0    # 残局库直接截断
+        self.chance_nodes = 0      # 罚牌摸牌的机会节点（期望极小化极大搜索）
+        self.chance_hits = 0       # 机会节点命中缓存
+        self.prune_readmitted = 0  # 启发式剪枝剪掉、经一层验证后重新搜索的根着法
+        self.max_ply = 0           # 实际到达的最大层数
+        self.depth_completed = 0
+        self.iteration_nodes: List[int] = []  # 每个完整迭代的节点数
+        self.timed_out = False
+
+    def merge(self, other: 'SearchStatistics') -> None:
+        """合并其他进程中搜索的计数（并行搜索用）"""
+        self.nodes += other.nodes
+        self.leaf_nodes += other.leaf_nodes
+        self.beta_cutoffs += other.beta_cutoffs
+        self.alpha_cutoffs += other.alpha_cutoffs
+        self.tt_cutoffs += other.tt_cutoffs
+        self.tablebase_hits += other.tablebase_hits
+        self.chance_nodes += other.chance_nodes
+        self.chance_hits += other.chance_hits
+        self.max_ply = max(self.max_ply, other.max_ply)
+
+    def effective_branching_factor(self) -> Optional[float]:
+        """有效分支因子：最后一个完整迭代的节点数开完成深度次方"""
+        if not self.depth_completed or not self.iteration_nodes:
+            return None
+        return self.iteration_nodes[-1] ** (1.0 / self.depth_completed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        ebf = self.effective_branching_factor()
+        return {
+            "nodes_evaluated": self.nodes,
+            "leaf_nodes": self.leaf_nodes,
+            "beta_cutoffs": self.beta_cutoffs,
+            "alpha_cutoffs": self.alpha_cutoffs,
+            "tt_cutoffs": self.tt_cutoffs,
+            "tablebase_hits": self.tablebase_hits,
+            "chance_nodes": self.chance_nodes,
+            "chance_hits": self.chance_hits,
+            "prune_readmitted": self.prune_readmitted,
+            "max_ply": self.max_ply,
+            "depth_completed": self.depth_completed,
+            "effective_branching_factor": round(ebf, 3) if ebf is not None else None,
+            "timed_out": self.timed_out
+        }
+
+
+class PositionEvaluator:
+    """局面评估函数 - 不含搜索状态，搜索器和搜索上下文共用；权重默认取启动时加载的 EVAL_WEIGHTS"""
+
+    weights: EvaluationWeights = EVAL_WEIGHTS
+
+    def _evaluate_leaf(self, board: BitboardState, ply: int) -> float:
+        """叶子节点评估：出完手牌的一方获胜，越早获胜分数越高"""
+        if not board.finished:
+            if board.ai_counts.size == 0:
+                return WIN_SCORE - ply
+            if board.player_counts.size == 0:
+                return -WIN_SCORE + ply
+        return self._evaluate_position(board)
+
+    def _evaluate_position(self, board: BitboardState) -> float:
+        """启发式评估函数 - 只读取增量维护的手牌计数，等于 evaluation_features 与权重的内积"""
+        weights = self.weights
         score = 0.0
+        ai_counts = board.ai_counts
+        player_counts = board.player_counts
 
         # 1. 手牌数量差异 (核心因素)
-        hand_diff = len(game_state.ai_hand) - len(game_state.player_hand)
-        score += hand_diff * 15
+        hand_diff = ai_counts.size - player_counts.size
+        score += hand_diff * weights.hand
 
         # 2. 罚牌差异
-        penalty_diff = game_state.penalties.get('player', 0) - game_state.penalties.get('ai', 0)
-        score += penalty_diff * 10
+        score += board.penalty_diff * weights.penalty
 
         # 3. 卡牌质量评估
-        score += self._evaluate_hand_quality(game_state.ai_hand) * 3
-        score -= self._evaluate_hand_quality(game_state.player_hand) * 3
+        score += self._evaluate_hand_quality(ai_counts) * weights.quality
+        score -= self._evaluate_hand_quality(player_counts) * weights.quality
 
         # 4. 出牌机会评估
-        ai_playable = len(self._get_playable_cards(game_state.ai_hand, game_state.current_card))
-        player_playable = len(self._get_playable_cards(game_state.player_hand, game_state.current_card))
-        score += (ai_playable - player_playable) * 5
+        ai_playable = ai_counts.playable_count(board.current)
+        player_playable = player_counts.playable_count(board.current)
+        score += (ai_playable - player_playable) * weights.playable
 
         # 5. 特殊情况评估
-        if len(game_state.ai_hand) == 1:
-            score += 20  # AI快赢了
-        if len(game_state.player_hand) == 1:
-            score -= 25  # 玩家快赢了
+        if ai_counts.size == 1:
+            score += weights.ai_near_win  # AI快赢了
+        if player_counts.size == 1:
+            score += weights.player_near_win  # 玩家快赢了（权重为负）
 
         # 6. 文化控制评估
-        score += self._evaluate_culture_control(game_state.ai_hand, game_state.player_hand) * 2
+        score += self._evaluate_culture_control(ai_counts, player_counts) * weights.culture_control
 
         return score
 
-    def _evaluate_hand_quality(self, hand: List[Card]) -> float:
+    def evaluation_features(self, board: BitboardState) -> List[float]:
+        """评估函数的各项特征（不含权重），顺序与 EvaluationWeights.FIELDS 一致，供离线调参使用"""
+        ai_counts = board.ai_counts
+        player_counts = board.player_counts
+        return [
+            float(ai_counts.size - player_counts.size),
+            float(board.penalty_diff),
+            self._evaluate_hand_quality(ai_counts) - self._evaluate_hand_quality(player_counts),
+            float(ai_counts.playable_count(board.current) - player_counts.playable_count(board.current)),
+            1.0 if ai_counts.size == 1 else 0.0,
+            1.0 if player_counts.size == 1 else 0.0,
+            self._evaluate_culture_control(ai_counts, player_counts)
+        ]
+
+    def _evaluate_hand_quality(self, counts: HandCounts) -> float:
         """评估手牌质量"""
-        if not hand:
+        if not counts.size:
             return 0.0
 
         quality = 0.0
 
         # 文化多样性
-        cultures = set(card.culture for card in hand)
-        quality += len(cultures) * 3
+        quality += counts.distinct_cultures * 3
 
         # 类型平衡性
-        types = {}
-        for card in hand:
-            types[card.type] = types.get(card.type, 0) + 1
-
-        if types:
-            type_balance = min(types.values())
-            quality += type_balance * 2
+        quality += min(count for count in counts.types if count) * 2
 
         # 特殊卡牌价值
-        for card in hand:
-            quality += self._get_card_strategic_value(card, hand)
+        quality += self._get_hand_strategic_value(counts)
 
-        return quality / len(hand)  # 标准化
+        return quality / counts.size  # 标准化
 
-    def _evaluate_culture_control(self, ai_hand: List[Card], player_hand: List[Card]) -> float:
+    def _evaluate_culture_control(self, ai_counts: HandCounts, player_counts: HandCounts) -> float:
         """评估文化控制"""
-        cultures = [CultureType.FUZHOU, CultureType.QUANZHOU, CultureType.NANPING,
-                   CultureType.LONGYAN, CultureType.PUTIAN]
         control_score = 0.0
 
-        for culture in cultures:
-            ai_culture_cards = len([c for c in ai_hand if c.culture == culture])
-            player_culture_cards = len([c for c in player_hand if c.culture == culture])
-
+        for ai_culture_cards, player_culture_cards in zip(ai_counts.cultures, player_counts.cultures):
             if ai_culture_cards > player_culture_cards:
                 control_score += 2
             elif ai_culture_cards < player_culture_cards:
@@ -210,145 +794,788 @@ class AlphaBetaPruning:
 
         return control_score
 
-    def _get_card_strategic_value(self, card: Card, hand: List[Card]) -> float:
-        """获取卡牌战略价值"""
-        value = 1.0  # 基础价值
+    def _get_hand_strategic_value(self, counts: HandCounts) -> float:
+        """获取整手牌的战略价值之和"""
+        value = 1.0 * counts.size  # 基础价值
 
-        # 唯一文化加分
-        same_culture_cards = [c for c in hand if c.culture == card.culture]
-        if len(same_culture_cards) == 1:
-            value += 3  # 这是这个文化的最后一张牌
+        # 唯一文化加分：这是这个文化的最后一张牌
+        value += 3 * counts.single_cultures
 
-        # 唯一类型加分
-        same_type_cards = [c for c in hand if c.type == card.type]
-        if len(same_type_cards) == 1:
-            value += 2  # 这是这个类型的最后一张牌
+        # 唯一类型加分：这是这个类型的最后一张牌
+        value += 2 * counts.single_types
 
         # 根据卡牌类型调整价值
-        if card.type == CardType.CHARACTER:
-            value += 1.5  # 人物牌略有优势
-        elif card.type == CardType.LOCATION:
-            value += 1.2  # 地点牌中等价值
-        elif card.type == CardType.QUOTE:
-            value += 1.0  # 语录牌基础价值
+        types = counts.types
+        value += (TYPE_STRATEGIC_BONUS[0] * types[0] + TYPE_STRATEGIC_BONUS[1] * types[1] +
+                  TYPE_STRATEGIC_BONUS[2] * types[2])
 
         return value
 
-    def _get_possible_moves(self, game_state: GameState) -> List[Card]:
-        """获取所有可能移动"""
-        return self._get_playable_cards(game_state.ai_hand, game_state.current_card)
 
-    def _get_playable_cards(self, hand: List[Card], current_card: Optional[Card]) -> List[Card]:
-        """获取可出牌"""
-        if not current_card:
-            return hand
-
-        return [card for card in hand
-                if card.culture == current_card.culture or card.type == current_card.type]
-
-    def _make_move(self, game_state: GameState, card: Card, player: str) -> GameState:
-        """执行移动"""
-        new_state = GameState(
-            game_phase=game_state.game_phase,
-            current_player=game_state.current_player,
-            current_card=card,  # 更新当前牌
-            deck=game_state.deck.copy(),
-            player_hand=game_state.player_hand.copy(),
-            ai_hand=game_state.ai_hand.copy(),
-            player_called_minpai=game_state.player_called_minpai,
-            ai_called_minpai=game_state.ai_called_minpai,
-            penalties=game_state.penalties.copy(),
-            round_count=game_state.round_count,
-            game_start_time=game_state.game_start_time,
-            winner=game_state.winner,
-            game_end_time=game_state.game_end_time
-        )
+UNLIMITED_NODES = 1 << 62  # 不限节点数时的配额
 
-        # 从手牌中移除卡牌
-        if player == 'human':
-            new_state.player_hand = [c for c in new_state.player_hand if c.id != card.id]
-        else:
-            new_state.ai_hand = [c for c in new_state.ai_hand if c.id != card.id]
 
-        return new_state
+class SearchContext(PositionEvaluator):
+    """单次搜索的全部可变状态：时钟、置换表、着法排序信息和统计
 
-    def _is_terminal(self, game_state: GameState) -> bool:
-        """检查是否为终止状态"""
-        return (len(game_state.ai_hand) == 0 or
-                len(game_state.player_hand) == 0 or
-                game_state.game_phase == 'finished')
+    每次搜索新建一个，互不共享，同一个 AlphaBetaPruning 因此可以被多个线程同时调用。
+    cancel_event 被置位时按超时处理（后台预读用它提前终止搜索）；
+    设置 node_limit 时节点数超出配额也按超时处理。
+    """
 
-class HeuristicPruning:
-    """启发式剪枝优化"""
+    def __init__(self, tablebase: Optional[EndgameTablebase], tt_size_bits: int,
+                 deadline: float, abort_on_timeout: bool,
+                 cancel_event: Optional[threading.Event] = None, node_limit: Optional[int] = None):
+        self.tablebase = tablebase
+        self.start_time = time.time()
+        self.deadline = deadline
+        self.abort_on_timeout = abort_on_timeout
+        self.cancel_event = cancel_event
+        self.node_limit = node_limit if node_limit is not None else UNLIMITED_NODES
+        self.timed_out = False
+        # 置换表中的分数依赖罚牌差等搜索外的局面信息，每次搜索使用新表
+        self.transposition_table = TranspositionTable(tt_size_bits)
+        self.root_depth = 0
+        self.killer_moves: List[List[int]] = []
+        self.history_scores: List[List[int]] = [[0] * CARD_COUNT, [0] * CARD_COUNT]
+        self.principal_variation: List[int] = []
+        # 根节点只搜索 root_mask 中的着法，按 root_order 排序（见 select_root_moves）
+        self.root_mask = -1
+        self.root_order: List[int] = []
+        self.stats = SearchStatistics()
 
-    @staticmethod
-    def quick_prune(candidates: List[Card], game_state: GameState) -> List[Card]:
-        """快速预剪枝"""
-        if len(candidates) <= 3:
-            return candidates
+    def search(self, game_state: GameState, depth: int, alpha: float, beta: float, maximizing_player: bool) -> Dict[str, Any]:
+        """主搜索函数 - 固定深度单次搜索"""
+        self.root_depth = depth
+        board = BitboardState.from_game_state(game_state)
+        result = self._alpha_beta_search(board, depth, alpha, beta, maximizing_player)
+        self.stats.depth_completed = depth
+        self.stats.iteration_nodes.append(self.stats.nodes)
+        return self._finish_search(result, game_state, maximizing_player)
+
+    def search_iterative(self, game_state: GameState, max_depth: int,
+                         root_moves: Optional[List[int]] = None,
+                         reserve_moves: Optional[List[int]] = None) -> Dict[str, Any]:
+        """迭代加深搜索 - 从深度1开始逐层加深，到达截止时间时返回最后一个完整深度的结果
+
+        root_moves 为启发式剪枝保留的根着法（按优先级排序），reserve_moves 为被剪掉的根着法；
+        不给出时搜索全部可出的牌。
+        """
+        initial_board = BitboardState.from_game_state(game_state)
+        # 搜索深度不会超过双方手牌总数
+        max_depth = min(max_depth, _popcount(initial_board.ai_mask) + _popcount(initial_board.player_mask))
+        if root_moves:
+            self.root_order = self.select_root_moves(initial_board, root_moves, reserve_moves or [])
+            self.root_mask = _moves_to_mask(self.root_order)
+
+        result: Dict[str, Any] = {"score": self._evaluate_position(initial_board)}
+        stats = self.stats
+
+        for depth in range(1, max_depth + 1):
+            self.root_depth = depth
+            # 超时中止会留下未撤销的走子，每次迭代从新的局面开始
+            board = BitboardState.from_game_state(game_state)
+            nodes_before = stats.nodes
+            try:
+                iteration = self._alpha_beta_search(board, depth, float('-inf'), float('inf'), True)
+            except SearchTimeout:
+                self.timed_out = True
+                break
+
+            result = iteration
+            stats.depth_completed = depth
+            stats.iteration_nodes.append(stats.nodes - nodes_before)
+            self.principal_variation = self._extract_principal_variation(game_state, depth)
+
+        # 连深度1都没能完成时，退而选择排序最靠前的可出牌
+        if result.get("best_move") is None:
+            possible_moves = initial_board.playable_mask(True) & self.root_mask
+            if possible_moves:
+                result["best_move"] = next(self._ordered_moves(possible_moves, None, 0, True))
+
+        return self._finish_search(result, game_state, True)
+
+    def select_root_moves(self, board: BitboardState, root_moves: List[int], reserve_moves: List[int]) -> List[int]:
+        """确定根节点要搜索的着法：剪枝保留的着法在前，被剪掉的着法先做一层验证，
+        一层分数不低于保留着法中最差者的重新加入，只有一层搜索就明显较差的着法才被真正跳过"""
+        if not reserve_moves:
+            return list(root_moves)
+
+        stats = self.stats
+
+        def one_ply_score(move: int) -> float:
+            previous = board.make_move(move, True)
+            score = self._evaluate_leaf(board, 1)
+            board.unmake_move(move, True, previous)
+            stats.nodes += 1
+            stats.leaf_nodes += 1
+            return score
 
-        # 计算每个候选牌的优先级分数
-        scored_candidates = []
-        for card in candidates:
-            score = HeuristicPruning._calculate_priority_score(card, game_state.current_card, game_state)
-            scored_candidates.append((card, score))
+        worst_kept = min(one_ply_score(move) for move in root_moves)
+        readmitted = [move for move in reserve_moves if one_ply_score(move) >= worst_kept]
+        stats.prune_readmitted += len(readmitted)
+        return list(root_moves) + readmitted
+
+    def search_root_move(self, board: BitboardState, move: int, depth: int,
+                         alpha: float, beta: float) -> Dict[str, Any]:
+        """只搜索AI的一个根着法，返回该着法在(alpha, beta)窗口内的分数"""
+        self.root_depth = depth
+        previous = board.make_move(move, True)
+        try:
+            return self._alpha_beta_search(board, depth - 1, alpha, beta, False)
+        finally:
+            board.unmake_move(move, True, previous)
+
+    def _finish_search(self, result: Dict[str, Any], game_state: GameState, maximizing_player: bool) -> Dict[str, Any]:
+        """补充统计信息，并将最佳着法序号映射回原始卡牌对象"""
+        self.stats.timed_out = self.timed_out
+        result.update(self.stats.to_dict())
+        result["tt_probes"] = self.transposition_table.probes
+        result["tt_hits"] = self.transposition_table.hits
+        result["tt_hit_rate"] = self.transposition_table.hit_rate()
+
+        best_index = result.get("best_move")
+        if best_index is not None:
+            hand = game_state.ai_hand if maximizing_player else game_state.player_hand
+            result["best_move"] = next(card for card in hand if _card_bit_index(card) == best_index)
+        return result
+
+    def _extract_principal_variation(self, game_state: GameState, depth: int) -> List[int]:
+        """沿置换表中的最佳着法提取主变例"""
+        board = BitboardState.from_game_state(game_state)
+        maximizing_player = True
+        variation = []
+        for _ in range(depth):
+            key = board.key ^ ZOBRIST_AI_TO_MOVE if maximizing_player else board.key
+            entry = self.transposition_table.entries[key & self.transposition_table.mask]
+            if entry is None or entry[0] != key or entry[4] is None:
+                break
+            move = entry[4]
+            if not board.playable_mask(maximizing_player) >> move & 1:
+                break
+            variation.append(move)
+            board.make_move(move, maximizing_player)
+            maximizing_player = not maximizing_player
+        return variation
+
+    def _alpha_beta_search(self, board: BitboardState, depth: int, alpha: float, beta: float,
+                          maximizing_player: bool) -> Dict[str, Any]:
+        """α-β剪枝搜索实现"""
+        ply = self.root_depth - depth
+        stats = self.stats
+        stats.nodes += 1
+        if ply > stats.max_ply:
+            stats.max_ply = ply
+
+        # 节点配额和时间限制检查（取消等同于超时）
+        if (stats.nodes > self.node_limit or time.time() > self.deadline
+                or (self.cancel_event is not None and self.cancel_event.is_set())):
+            if self.abort_on_timeout:
+                raise SearchTimeout()
+            self.timed_out = True
+            stats.leaf_nodes += 1
+            return {"score": self._evaluate_position(board)}
 
-        # 按分数排序
-        scored_candidates.sort(key=lambda x: x[1], reverse=True)
+        # 深度限制或终止条件
+        if depth == 0 or board.is_terminal():
+            stats.leaf_nodes += 1
+            return {"score": self._evaluate_leaf(board, ply)}
+
+        # 查询残局库（根节点需要给出着法，不在根节点截断）
+        if ply > 0 and self.tablebase is not None and self.tablebase.covers(board):
+            value = self.tablebase.probe(board, maximizing_player)
+            if value is not None:
+                if -WIN_THRESHOLD <= value <= WIN_THRESHOLD:
+                    value += board.penalty_diff * self.weights.penalty  # 与 _evaluate_position 的罚牌项一致
+                stats.tablebase_hits += 1
+                return {"score": _score_from_relative(value, ply)}
+
+        # 查询置换表
+        key = board.key ^ ZOBRIST_AI_TO_MOVE if maximizing_player else board.key
+        original_alpha, original_beta = alpha, beta
+        tt_move = None
+        entry = self.transposition_table.probe(key)
+        if entry is not None:
+            _, entry_depth, entry_score, entry_bound, tt_move = entry
+            entry_score = _score_from_relative(entry_score, ply)
+            if entry_depth >= depth:
+                if entry_bound == TT_EXACT:
+                    stats.tt_cutoffs += 1
+                    return {"score": entry_score, "best_move": tt_move}
+                if entry_bound == TT_LOWER:
+                    alpha = max(alpha, entry_score)
+                else:
+                    beta = min(beta, entry_score)
+                if beta <= alpha:
+                    stats.tt_cutoffs += 1
+                    return {"score": entry_score, "best_move": tt_move}
 
-        # 只保留前60%的候选牌
-        keep_count = max(2, int(len(scored_candidates) * 0.6))
-        return [card for card, _ in scored_candidates[:keep_count]]
+        # 获取当前行动方的可能移动（根节点只搜索启发式剪枝选出的着法）
+        possible_moves = board.playable_mask(maximizing_player)
+        if ply == 0:
+            possible_moves &= self.root_mask
 
-    @staticmethod
-    def _calculate_priority_score(card: Card, current_card: Optional[Card], game_state: GameState) -> float:
-        """计算优先级分数"""
-        score = 0.0
+        # 如果没有可移动作，交给 _no_move_result 处理（默认返回当前位置评估）
+        if not possible_moves:
+            return self._no_move_result(board, depth, ply, maximizing_player)
 
-        if not current_card:
-            return score
+        best_move = None
+        if maximizing_player:
+            # 最大化玩家 (AI)
+            max_eval = float('-inf')
 
-        # 文化匹配加分
-        if card.culture == current_card.culture:
-            score += 15
+            for move in self._ordered_moves(possible_moves, tt_move, ply, True):
+                previous = board.make_move(move, True)
+                result = self._alpha_beta_search(board, depth - 1, alpha, beta, False)
+                board.unmake_move(move, True, previous)
 
-        # 类型匹配加分
-        if card.type == current_card.type:
-            score += 12
+                if result["score"] > max_eval:
+                    max_eval = result["score"]
+                    best_move = move
 
-        # 唯一性加分
-        ai_hand = game_state.ai_hand
-        same_culture_count = len([c for c in ai_hand if c.culture == card.culture])
-        same_type_count = len([c for c in ai_hand if c.type == card.type])
+                alpha = max(alpha, result["score"])
 
-        if same_culture_count == 1:
-            score += 8
-        if same_type_count == 1:
-            score += 6
+                # β剪枝
+                if beta <= alpha:
+                    stats.beta_cutoffs += 1
+                    self._record_cutoff(move, ply, depth, True)
+                    break  # 剪枝
 
-        # 手牌压力加分
-        if len(ai_hand) <= 3:
-            score += 10
+            self._store_transposition(key, depth, ply, max_eval, original_alpha, original_beta, best_move)
+            return {"score": max_eval, "best_move": best_move}
+        else:
+            # 最小化玩家 (人类)
+            min_eval = float('inf')
 
-        return score
+            for move in self._ordered_moves(possible_moves, tt_move, ply, False):
+                previous = board.make_move(move, False)
+                result = self._alpha_beta_search(board, depth - 1, alpha, beta, True)
+                board.unmake_move(move, False, previous)
+
+                if result["score"] < min_eval:
+                    min_eval = result["score"]
+                    best_move = move
+
+                beta = min(beta, result["score"])
+
+                # α剪枝
+                if beta <= alpha:
+                    stats.alpha_cutoffs += 1
+                    self._record_cutoff(move, ply, depth, False)
+                    break  # 剪枝
+
+            self._store_transposition(key, depth, ply, min_eval, original_alpha, original_beta, best_move)
+            return {"score": min_eval}
+
+    def _no_move_result(self, board: BitboardState, depth: int, ply: int, maximizing_player: bool) -> Dict[str, Any]:
+        """行动方无牌可出：不模拟罚牌，直接按叶子节点评估"""
+        self.stats.leaf_nodes += 1
+        return {"score": self._evaluate_position(board)}
+
+    def _ordered_moves(self, possible_moves: int, tt_move: Optional[int], ply: int, is_ai: bool):
+        """着法排序：置换表着法 > 上一轮主变例 > 杀手着法 > 历史启发分数；根节点在主变例之后按启发式剪枝的顺序"""
+        if tt_move is not None and possible_moves >> tt_move & 1:
+            yield tt_move
+            possible_moves &= ~(1 << tt_move)
+
+        if ply < len(self.principal_variation):
+            pv_move = self.principal_variation[ply]
+            if possible_moves >> pv_move & 1:
+                yield pv_move
+                possible_moves &= ~(1 << pv_move)
+
+        if ply == 0 and self.root_order:
+            yield from (move for move in self.root_order if possible_moves >> move & 1)
+            return
+
+        if ply < len(self.killer_moves):
+            for killer in self.killer_moves[ply]:
+                if possible_moves >> killer & 1:
+                    yield killer
+                    possible_moves &= ~(1 << killer)
+
+        history = self.history_scores[is_ai] if self.history_scores else None
+        remaining = list(_iter_bits(possible_moves))
+        if history is not None and len(remaining) > 1:
+            remaining.sort(key=lambda move: history[move], reverse=True)
+        yield from remaining
+
+    def _record_cutoff(self, move: int, ply: int, depth: int, is_ai: bool) -> None:
+        """记录产生剪枝的着法，更新杀手着法和历史启发分数"""
+        while len(self.killer_moves) <= ply:
+            self.killer_moves.append([])
+        killers = self.killer_moves[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[KILLER_SLOTS:]
+        if self.history_scores:
+            self.history_scores[is_ai][move] += depth * depth
+
+    def _store_transposition(self, key: int, depth: int, ply: int, score: float, alpha: float, beta: float,
+                             best_move: Optional[int]) -> None:
+        """写入置换表，超时后的结果不完整，不写入"""
+        if self.timed_out:
+            return
+        if score <= alpha:
+            bound = TT_UPPER
+        elif score >= beta:
+            bound = TT_LOWER
+        else:
+            bound = TT_EXACT
+        self.transposition_table.store(key, depth, _score_to_relative(score, ply), bound, best_move)
+
+
+class ExpectiminimaxContext(SearchContext):
+    """期望极小化极大搜索的上下文 - 无牌可出的一方被罚摸牌堆的两张牌，作为机会节点展开
+
+    摸到的牌按 文化x类型 分组，同组的牌对出牌规则完全等价，只展开一个代表（组内序号最小的牌），
+    按组内张数加权；机会节点的期望值按(局面, 牌堆)缓存，迭代加深的各层共用。
+    牌堆不足两张时（需要洗弃牌堆，结果不可预知）仍按叶子节点评估。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.root_penalty_diff = 0
+        self.chance_cache: Dict[Tuple[int, int], Tuple[int, float]] = {}
+
+    def search(self, game_state: GameState, depth: int, alpha: float, beta: float, maximizing_player: bool) -> Dict[str, Any]:
+        self.root_penalty_diff = BitboardState.from_game_state(game_state).penalty_diff
+        return super().search(game_state, depth, alpha, beta, maximizing_player)
+
+    def search_iterative(self, game_state: GameState, max_depth: int,
+                         root_moves: Optional[List[int]] = None,
+                         reserve_moves: Optional[List[int]] = None) -> Dict[str, Any]:
+        self.root_penalty_diff = BitboardState.from_game_state(game_state).penalty_diff
+        return super().search_iterative(game_state, max_depth, root_moves, reserve_moves)
+
+    def _no_move_result(self, board: BitboardState, depth: int, ply: int, maximizing_player: bool) -> Dict[str, Any]:
+        """机会节点：对罚摸的两张牌按分组求期望，摸牌后轮到对方行动"""
+        deck_mask = board.deck_mask
+        deck_size = _popcount(deck_mask)
+        # 罚牌差 = 玩家罚牌数 - AI罚牌数，AI被罚时减一
+        step = -1 if maximizing_player else 1
+        shift = board.penalty_diff - self.root_penalty_diff
+        if deck_size < PENALTY_DRAW_COUNT or abs(shift + step) > PENALTY_SHIFT_RANGE:
+            return super()._no_move_result(board, depth, ply, maximizing_player)
+
+        stats = self.stats
+        stats.chance_nodes += 1
+        cache_key = (board.key ^ ZOBRIST_AI_TO_MOVE if maximizing_player else board.key, deck_mask)
+        entry = self.chance_cache.get(cache_key)
+        if entry is not None and entry[0] >= depth:
+            stats.chance_hits += 1
+            return {"score": _score_from_relative(entry[1], ply)}
+
+        # 牌堆中每组的代表牌（最小序号）和张数
+        groups = []
+        for class_mask in CLASS_MASKS:
+            cards = deck_mask & class_mask
+            if cards:
+                groups.append((cards, _popcount(cards)))
+
+        previous_key = board.key
+        board.penalty_diff += step
+        board.key ^= (ZOBRIST_PENALTY_SHIFT[shift + PENALTY_SHIFT_RANGE] ^
+                      ZOBRIST_PENALTY_SHIFT[shift + step + PENALTY_SHIFT_RANGE])
+
+        expected = 0.0
+        try:
+            for i, (first_cards, first_count) in enumerate(groups):
+                first = (first_cards & -first_cards).bit_length() - 1
+                for second_cards, second_count in groups[i:]:
+                    if second_cards == first_cards:
+                        # 两张来自同一组
+                        if first_count < 2:
+                            continue
+                        rest = first_cards & (first_cards - 1)
+                        second = (rest & -rest).bit_length() - 1
+                        weight = first_count * (first_count - 1) // 2
+                    else:
+                        second = (second_cards & -second_cards).bit_length() - 1
+                        weight = first_count * second_count
+
+                    board.draw_card(first, maximizing_player)
+                    board.draw_card(second, maximizing_player)
+                    try:
+                        result = self._alpha_beta_search(board, depth - 1, float('-inf'), float('inf'),
+                                                          not maximizing_player)
+                    finally:
+                        board.undraw_card(second, maximizing_player)
+                        board.undraw_card(first, maximizing_player)
+                    expected += weight * result["score"]
+        finally:
+            board.penalty_diff -= step
+            board.key = previous_key
+
+        expected /= deck_size * (deck_size - 1) // 2
+        if not self.timed_out:
+            self.chance_cache[cache_key] = (depth, _score_to_relative(expected, ply))
+        return {"score": expected}
+
+
+class AlphaBetaPruning(PositionEvaluator):
+    """α-β剪枝算法 - 只保存搜索配置，每次搜索的状态放在独立的 SearchContext 中，可多线程并发调用
+
+    设置 node_limit 时按节点预算搜索：不看墙钟时间，同一局面总是得到相同的结果，
+    每次决策的CPU开销也可预估。weights 可替换评估权重（残局库与权重不一致时不使用残局库）。
+    """
+
+    context_class = SearchContext
+
+    def __init__(self, max_depth: int = 4, time_limit: float = 1.0, tt_size_bits: int = 16,
+                 tablebase: Optional[EndgameTablebase] = None, node_limit: Optional[int] = None,
+                 weights: Optional[EvaluationWeights] = None):
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.tt_size_bits = tt_size_bits
+        self.node_limit = node_limit
+        if weights is not None:
+            self.weights = weights
+        self.tablebase = tablebase if tablebase is not None else ENDGAME_TABLEBASE
+        if self.tablebase is not None and self.tablebase.signature != self.weights.signature():
+            self.tablebase = None
+
+    def new_context(self, deadline: float, abort_on_timeout: bool = True,
+                    cancel_event: Optional[threading.Event] = None) -> SearchContext:
+        """为一次搜索创建独立的上下文，按节点预算搜索时忽略截止时间"""
+        if self.node_limit is not None:
+            deadline = float('inf')
+        context = self.context_class(self.tablebase, self.tt_size_bits, deadline, abort_on_timeout,
+                                     cancel_event, self.node_limit)
+        context.weights = self.weights
+        return context
+
+    def search(self, game_state: GameState, depth: int, alpha: float, beta: float, maximizing_player: bool) -> Dict[str, Any]:
+        """主搜索函数 - 固定深度单次搜索"""
+        context = self.new_context(time.time() + self.time_limit, abort_on_timeout=False)
+        return context.search(game_state, depth, alpha, beta, maximizing_player)
+
+    def search_iterative(self, game_state: GameState, max_depth: Optional[int] = None,
+                         time_limit: Optional[float] = None,
+                         cancel_event: Optional[threading.Event] = None,
+                         root_moves: Optional[List[Card]] = None,
+                         reserve_moves: Optional[List[Card]] = None) -> Dict[str, Any]:
+        """迭代加深搜索 - 到达截止时间或被取消时返回最后一个完整深度的结果
+
+        root_moves/reserve_moves 为启发式剪枝保留/剪掉的候选牌（见 _prune_candidates），不给出时搜索全部可出的牌。
+        """
+        max_depth = max_depth if max_depth is not None else self.max_depth
+        time_limit = time_limit if time_limit is not None else self.time_limit
+        context = self.new_context(time.time() + time_limit, abort_on_timeout=True, cancel_event=cancel_event)
+        return context.search_iterative(game_state, max_depth, _card_indices(root_moves), _card_indices(reserve_moves))
+
+    def worker_config(self) -> Tuple[Tuple[float, ...], int, Optional[str]]:
+        """可传给并行搜索工作进程的配置：评估权重、置换表大小、残局库路径
+
+        没有从文件加载的残局库（如生成残局库时的内存库）无法传递，工作进程不使用残局库。
+        """
+        tablebase_path = self.tablebase.path if self.tablebase is not None else None
+        return self.weights.as_tuple(), self.tt_size_bits, tablebase_path
+
+class ExpectiminimaxSearch(AlphaBetaPruning):
+    """期望极小化极大搜索 - 在α-β搜索中加入罚牌摸牌的机会节点，接口与 AlphaBetaPruning 相同
+
+    残局库按无牌可出即停止的规则生成，与罚牌模型不一致，这里不使用。
+    """
+
+    context_class = ExpectiminimaxContext
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tablebase = None
+
+# ==================== 根节点并行搜索 ====================
+# 进程池在第一次使用时创建并预热，之后常驻复用
+
+_search_pool: Optional[ProcessPoolExecutor] = None
+_search_pool_workers = 0
+_search_pool_lock = threading.Lock()
+
+# 工作进程内常驻的搜索器，配置与主进程的搜索器一致，配置变化时重建；
+# 同一次搜索的各层迭代复用同一个上下文的置换表和历史启发信息
+_worker_alpha_beta: Optional[AlphaBetaPruning] = None
+_worker_config: Optional[tuple] = None
+_worker_tablebases: Dict[str, Optional[EndgameTablebase]] = {}
+_worker_context: Optional[SearchContext] = None
+_worker_search_id: Optional[str] = None
+
+
+def _configure_worker(config: Optional[tuple]) -> None:
+    """按主进程搜索器的配置（AlphaBetaPruning.worker_config）创建工作进程的搜索器，配置未变时复用"""
+    global _worker_alpha_beta, _worker_config, _worker_context, _worker_search_id
+    if _worker_alpha_beta is not None and config == _worker_config:
+        return
+
+    if config is None:
+        alpha_beta = AlphaBetaPruning()
+    else:
+        weights, tt_size_bits, tablebase_path = config
+        alpha_beta = AlphaBetaPruning(tt_size_bits=tt_size_bits, weights=EvaluationWeights(weights))
+        if tablebase_path is None:
+            tablebase = None
+        elif ENDGAME_TABLEBASE is not None and ENDGAME_TABLEBASE.path == tablebase_path:
+            tablebase = ENDGAME_TABLEBASE
+        else:
+            if tablebase_path not in _worker_tablebases:
+                _worker_tablebases[tablebase_path] = EndgameTablebase.load(tablebase_path)
+            tablebase = _worker_tablebases[tablebase_path]
+        if tablebase is not None and tablebase.signature != alpha_beta.weights.signature():
+            tablebase = None
+        alpha_beta.tablebase = tablebase
+
+    _worker_alpha_beta = alpha_beta
+    _worker_config = config
+    _worker_context = None
+    _worker_search_id = None
+
+
+def _warm_up_worker(config: Optional[tuple] = None) -> int:
+    """预热工作进程：完成模块导入并创建搜索器"""
+    _configure_worker(config)
+    return os.getpid()
+
+
+def _parallel_root_worker(search_id: str, config: tuple, board_state: tuple, move: int, depth: int, alpha: float,
+                          deadline: float) -> Optional[Tuple[int, float, SearchStatistics, int, int]]:
+    """在工作进程中搜索一个根着法，超过截止时间返回None；config 为主进程搜索器的配置"""
+    global _worker_context, _worker_search_id
+    _configure_worker(config)
+    if search_id != _worker_search_id:
+        _worker_context = _worker_alpha_beta.new_context(deadline, abort_on_timeout=True)
+        _worker_search_id = search_id
+
+    context = _worker_context
+    table = context.transposition_table
+    probes, hits = table.probes, table.hits
+    # 每个根着法单独计数，主进程负责合并
+    context.stats = SearchStatistics()
+    try:
+        result = context.search_root_move(BitboardState(*board_state), move, depth, alpha, float('inf'))
+    except SearchTimeout:
+        return None
+    return move, result["score"], context.stats, table.probes - probes, table.hits - hits
+
+
+def get_search_pool(workers: int) -> ProcessPoolExecutor:
+    """获取（必要时创建并预热）根节点并行搜索用的进程池"""
+    global _search_pool, _search_pool_workers
+    with _search_pool_lock:
+        if _search_pool is None or _search_pool_workers != workers:
+            if _search_pool is not None:
+                _search_pool.shutdown(wait=False)
+            _search_pool = ProcessPoolExecutor(max_workers=workers)
+            _search_pool_workers = workers
+            wait([_search_pool.submit(_warm_up_worker) for _ in range(workers)])
+        return _search_pool
+
+
+def shutdown_search_pool() -> None:
+    """关闭进程池"""
+    global _search_pool, _search_pool_workers
+    with _search_pool_lock:
+        if _search_pool is not None:
+            _search_pool.shutdown(wait=True, cancel_futures=True)
+        _search_pool = None
+        _search_pool_workers = 0
+
+
+class ParallelRootSearch:
+    """根节点并行的迭代加深搜索
+
+    每一层先在本进程搜索上一层的最佳着法得到alpha，再把其余根着法以(alpha, +inf)窗口
+    分发到进程池；截止时间前没有全部返回的层次作废，返回最后一个完整层次的最佳着法。
+    """
+
+    def __init__(self, alpha_beta: AlphaBetaPruning, workers: int):
+        self.alpha_beta = alpha_beta
+        self.workers = workers
+
+    def search(self, game_state: GameState, max_depth: int, time_limit: float,
+               root_moves: Optional[List[Card]] = None,
+               reserve_moves: Optional[List[Card]] = None) -> Dict[str, Any]:
+        """并行搜索，参数和返回格式与 AlphaBetaPruning.search_iterative 相同"""
+        deadline = time.time() + time_limit
+        search_id = uuid.uuid4().hex
+        alpha_beta = self.alpha_beta
+        context = alpha_beta.new_context(deadline, abort_on_timeout=True)
+
+        board = BitboardState.from_game_state(game_state)
+        max_depth = min(max_depth, _popcount(board.ai_mask) + _popcount(board.player_mask))
+        config = alpha_beta.worker_config()
+
+        try:
+            pool = get_search_pool(self.workers)
+        except (OSError, BrokenProcessPool) as e:
+            print(f"⚠️ 并行搜索进程池不可用，改用单线程搜索: {e}")
+            return alpha_beta.search_iterative(game_state, max_depth, deadline - time.time(),
+                                               root_moves=root_moves, reserve_moves=reserve_moves)
+
+        if root_moves:
+            root_moves = context.select_root_moves(board, _card_indices(root_moves), _card_indices(reserve_moves) or [])
+        else:
+            root_moves = list(_iter_bits(board.playable_mask(True)))
+
+        result: Dict[str, Any] = {"score": context._evaluate_position(board),
+                                  "best_move": root_moves[0] if root_moves else None}
+        # 没有可出的牌（只能罚摸）时与单线程搜索一样直接返回，不提交任何任务
+        if not root_moves:
+            return context._finish_search(result, game_state, True)
+        stats = context.stats
+        tt_probes = tt_hits = 0
+
+        for depth in range(1, max_depth + 1):
+            # 第一个着法在本进程完整窗口搜索，为其余着法提供alpha下界
+            nodes_before = stats.nodes
+            try:
+                first = context.search_root_move(board, root_moves[0], depth, float('-inf'), float('inf'))
+            except SearchTimeout:
+                break
+            scores = {root_moves[0]: first["score"]}
+            alpha = first["score"]
+
+            futures = [
+                pool.submit(_parallel_root_worker, search_id, config, board.to_tuple(), move, depth, alpha, deadline)
+                for move in root_moves[1:]
+            ]
+            done, not_done = wait(futures, timeout=max(0.0, deadline - time.time()))
+            for future in not_done:
+                future.cancel()
+
+            outcomes = [future.result() for future in done if future.exception() is None]
+            if not_done or len(outcomes) != len(futures) or any(outcome is None for outcome in outcomes):
+                break
+
+            for move, score, worker_stats, probes, hits in outcomes:
+                scores[move] = score
+                stats.merge(worker_stats)
+                tt_probes += probes
+                tt_hits += hits
+
+            # 窗口下界之下的分数只是上界，保持第一个着法优先
+            best_move = max(root_moves, key=lambda m: (scores[m], m == root_moves[0]))
+            result = {"score": scores[best_move], "best_move": best_move}
+            stats.depth_completed = depth
+            stats.iteration_nodes.append(stats.nodes - nodes_before)
+
+            # 下一层按本层分数排序，最佳着法仍在本进程先搜
+            root_moves.sort(key=lambda m: scores[m], reverse=True)
+            root_moves.remove(best_move)
+            root_moves.insert(0, best_move)
+
+        context.timed_out = stats.depth_completed < max_depth
+        result = context._finish_search(result, game_state, True)
+        result["tt_probes"] += tt_probes
+        result["tt_hits"] += tt_hits
+        result["tt_hit_rate"] = result["tt_hits"] / result["tt_probes"] if result["tt_probes"] else 0.0
+        return result
+
+
+# 边界剪枝：本次搜索剩余的时间（按节点预算搜索时为节点配额）不足以展开全部候选时，只保留优先级最高的几个
+BOUNDARY_PRUNE_TIME = 0.3
+BOUNDARY_PRUNE_NODES = 20000
+BOUNDARY_PRUNE_KEEP = 3
+
+
+class HeuristicPruning:
+    """启发式剪枝 - 按出牌优先级排序并裁剪根节点候选
+
+    保留的候选按优先级顺序作为α-β搜索的根着法，被剪掉的候选在搜索前还会做一层验证
+    （见 SearchContext.select_root_moves），只跳过明显较差的着法。
+    """
 
     @staticmethod
-    def boundary_prune(candidates: List[Card], game_state: GameState) -> List[Card]:
-        """边界情况剪枝"""
-        # 如果只剩1-2张牌，保留所有
-        if len(game_state.ai_hand) <= 2:
-            return candidates
+    def priority_scores(cards: List[Card], current_card: Optional[Card], hand: List[Card]) -> List[float]:
+        """计算一组候选牌的优先级分数，hand 为出牌方的手牌，其文化/类型张数只统计一次"""
+        if not current_card:
+            return [0.0] * len(cards)
 
-        # 如果候选牌很少，保留所有
-        if len(candidates) <= 2:
-            return candidates
+        culture_counts = [0] * len(CULTURE_ORDER)
+        type_counts = [0] * len(TYPE_ORDER)
+        for card in hand:
+            index = _card_bit_index(card)
+            culture_counts[CARD_CULTURE_INDEX[index]] += 1
+            type_counts[CARD_TYPE_INDEX[index]] += 1
 
-        # 如果时间紧张，只保留最好的几个
-        time_spent = time.time() - game_state.game_start_time
-        if time_spent > 0.8 and len(candidates) > 3:
-            return candidates[:3]
+        current = _card_bit_index(current_card)
+        current_culture = CARD_CULTURE_INDEX[current]
+        current_type = CARD_TYPE_INDEX[current]
+        # 手牌压力加分
+        base_score = 10.0 if len(hand) <= 3 else 0.0
+
+        scores = []
+        for card in cards:
+            index = _card_bit_index(card)
+            culture = CARD_CULTURE_INDEX[index]
+            card_type = CARD_TYPE_INDEX[index]
+            score = base_score
+            # 文化/类型匹配加分
+            if culture == current_culture:
+                score += 15
+            if card_type == current_type:
+                score += 12
+            # 唯一性加分
+            if culture_counts[culture] == 1:
+                score += 8
+            if type_counts[card_type] == 1:
+                score += 6
+            scores.append(score)
+        return scores
 
-        return candidates
+    @staticmethod
+    def quick_prune(candidates: List[Card], game_state: GameState) -> Tuple[List[Card], List[Card]]:
+        """快速预剪枝：按优先级排序，返回（保留的候选, 剪掉的候选），两者均按优先级从高到低"""
+        scores = HeuristicPruning.priority_scores(candidates, game_state.current_card, game_state.ai_hand)
+        order = sorted(range(len(candidates)), key=scores.__getitem__, reverse=True)
+        ranked = [candidates[i] for i in order]
+        if len(ranked) <= 3:
+            return ranked, []
+
+        # 只保留前60%的候选牌
+        keep_count = max(2, int(len(ranked) * 0.6))
+        return ranked[:keep_count], ranked[keep_count:]
+
+    @staticmethod
+    def boundary_prune(candidates: List[Card], game_state: GameState, deadline: float,
+                       node_limit: Optional[int] = None) -> Tuple[List[Card], List[Card]]:
+        """边界情况剪枝：按本次搜索的截止时间或节点配额判断预算是否紧张，返回（保留的候选, 剪掉的候选）"""
+        # 如果只剩1-2张牌，或候选牌很少，保留所有
+        if len(game_state.ai_hand) <= 2 or len(candidates) <= BOUNDARY_PRUNE_KEEP:
+            return candidates, []
+
+        if node_limit is not None:
+            tight = node_limit < BOUNDARY_PRUNE_NODES
+        else:
+            tight = deadline - time.time() < BOUNDARY_PRUNE_TIME
+        if tight:
+            return candidates[:BOUNDARY_PRUNE_KEEP], candidates[BOUNDARY_PRUNE_KEEP:]
+        return candidates, []
+
+# 搜索结果中的统计字段（见 SearchStatistics.to_dict 和 AlphaBetaPruning._finish_search）
+SEARCH_STAT_KEYS = (
+    "nodes_evaluated", "leaf_nodes", "beta_cutoffs", "alpha_cutoffs", "tt_cutoffs", "tablebase_hits",
+    "chance_nodes", "chance_hits", "prune_readmitted", "max_ply", "depth_completed", "effective_branching_factor",
+    "timed_out",
+    "tt_probes", "tt_hits", "tt_hit_rate"
+)
+
+def _extract_search_stats(result: Dict[str, Any]) -> Dict[str, Any]:
+    """从搜索结果中提取统计信息"""
+    return {key: result[key] for key in SEARCH_STAT_KEYS if key in result}
+
+def _prune_candidates(candidates: List[Card], game_state: GameState, deadline: float,
+                      node_limit: Optional[int] = None) -> Tuple[List[Card], List[Card], Dict[str, int]]:
+    """依次执行快速预剪枝和边界剪枝，返回（保留的候选, 剪掉的候选, 各自剪掉的候选数）
+
+    保留的候选按优先级排序，剪掉的候选按剪掉的先后排在其后，两者一起交给 search_iterative。
+    """
+    total = len(candidates)
+    kept, quick_pruned = HeuristicPruning.quick_prune(candidates, game_state)
+    kept, boundary_pruned = HeuristicPruning.boundary_prune(kept, game_state, deadline, node_limit)
+    return kept, boundary_pruned + quick_pruned, {
+        "candidates": total,
+        "quick_pruned": len(quick_pruned),
+        "boundary_pruned": len(boundary_pruned)
+    }
 
 class EasyAI:
     """简单AI - 快速响应，基础策略"""
@@ -359,7 +1586,7 @@ class EasyAI:
 
     def make_decision(self, game_state: GameState) -> Optional[Card]:
         """简单决策：优先级策略"""
-        candidates = self._get_playable_cards(game_state)
+        candidates = get_playable_cards(game_state.ai_hand, game_state.current_card)
 
         if not candidates:
             return None
@@ -382,14 +1609,10 @@ class EasyAI:
         import random
         return random.choice(candidates)
 
-    def _get_playable_cards(self, game_state: GameState) -> List[Card]:
-        """获取可出牌"""
-        if not game_state.current_card:
-            return game_state.ai_hand
-
-        return [card for card in game_state.ai_hand
-                if card.culture == game_state.current_card.culture or
-                   card.type == game_state.current_card.type]
+    def decide(self, game_state: GameState, time_limit: Optional[float] = None,
+               cancel_event: Optional[threading.Event] = None) -> Tuple[Optional[Card], Dict[str, Any]]:
+        """决策并返回本次的搜索统计（简单AI不搜索，忽略时间预算）"""
+        return self.make_decision(game_state), {}
 
     def should_report_minpai(self, opponent_hand_count: int) -> bool:
         """简单AI准确报告"""
@@ -399,39 +1622,44 @@ class EasyAI:
 class MediumAI:
     """中等AI - 平衡策略，α-β剪枝"""
 
-    def __init__(self):
+    def __init__(self, node_limit: Optional[int] = None):
         self.name = "中等AI"
         self.description = "策略分析，概率计算"
-        self.alpha_beta = AlphaBetaPruning(max_depth=3, time_limit=0.8)
+        self.alpha_beta = AlphaBetaPruning(max_depth=3, time_limit=0.8, node_limit=node_limit)
+        self.last_search_stats: Dict[str, Any] = {}
 
     def make_decision(self, game_state: GameState) -> Optional[Card]:
-        """中等决策：使用α-β剪枝但限制深度"""
-        candidates = self._get_playable_cards(game_state)
+        """中等决策（统计保存在 last_search_stats，多线程调用请使用 decide）"""
+        decision, self.last_search_stats = self.decide(game_state)
+        return decision
 
-        if not candidates:
-            return None
-        if len(candidates) == 1:
-            return candidates[0]
+    def decide(self, game_state: GameState, time_limit: Optional[float] = None,
+               cancel_event: Optional[threading.Event] = None) -> Tuple[Optional[Card], Dict[str, Any]]:
+        """中等决策：使用α-β剪枝但限制深度，返回出牌和本次的搜索统计
 
-        # 预剪枝优化
-        candidates = HeuristicPruning.quick_prune(candidates, game_state)
-        candidates = HeuristicPruning.boundary_prune(candidates, game_state)
+        time_limit 覆盖默认的搜索时间（按节点预算搜索时忽略），cancel_event 置位时提前结束搜索。
+        """
+        start_time = time.time()
+        candidates = get_playable_cards(game_state.ai_hand, game_state.current_card)
 
+        if not candidates:
+            return None, {}
         if len(candidates) == 1:
-            return candidates[0]
+            return candidates[0], {}
 
-        # 使用α-β剪枝搜索
-        result = self.alpha_beta.search(game_state, 2, float('-inf'), float('inf'), True)
-        return result.get("best_move")
-
-    def _get_playable_cards(self, game_state: GameState) -> List[Card]:
-        """获取可出牌"""
-        if not game_state.current_card:
-            return game_state.ai_hand
+        # 预剪枝优化（按本次搜索的预算），结果作为根着法的搜索顺序
+        time_limit = time_limit if time_limit is not None else self.alpha_beta.time_limit
+        candidates, reserve, search_stats = _prune_candidates(
+            candidates, game_state, start_time + time_limit, self.alpha_beta.node_limit
+        )
 
-        return [card for card in game_state.ai_hand
-                if card.culture == game_state.current_card.culture or
-                   card.type == game_state.current_card.type]
+        # 使用α-β剪枝搜索
+        remaining_time = time_limit - (time.time() - start_time)
+        result = self.alpha_beta.search_iterative(game_state, 2, remaining_time, cancel_event, candidates, reserve)
+        search_stats.update(_extract_search_stats(result))
+        if self.alpha_beta.node_limit is not None:
+            search_stats["node_limit"] = self.alpha_beta.node_limit
+        return result.get("best_move"), search_stats
 
     def should_report_minpai(self, opponent_hand_count: int) -> bool:
         """中等AI准确报告"""
@@ -441,35 +1669,67 @@ class MediumAI:
 class HardAI:
     """困难AI - 深度分析，最优策略"""
 
-    def __init__(self):
+    def __init__(self, parallel_workers: Optional[int] = None, node_limit: Optional[int] = None,
+                 chance_nodes: Optional[bool] = None):
         self.name = "困难AI"
         self.description = "深度搜索，最优解算"
-        self.alpha_beta = AlphaBetaPruning(max_depth=4, time_limit=1.5)
+        self.last_search_stats: Dict[str, Any] = {}
+
+        # 是否模拟罚牌摸牌（期望极小化极大搜索），默认读取环境变量
+        if chance_nodes is None:
+            chance_nodes = os.getenv('GAME_AI_CHANCE_NODES', '0') == '1'
+        search_class = ExpectiminimaxSearch if chance_nodes else AlphaBetaPruning
+        self.alpha_beta = search_class(max_depth=4, time_limit=1.5, node_limit=node_limit)
+
+        # 根节点并行搜索的进程数，默认读取环境变量，0或1表示单线程搜索；
+        # 并行搜索的结果取决于各进程完成的先后，按节点预算搜索时不使用；工作进程只有普通α-β搜索
+        if node_limit is not None or chance_nodes:
+            parallel_workers = 0
+        elif parallel_workers is None:
+            parallel_workers = int(os.getenv('GAME_AI_PARALLEL_WORKERS', '0'))
+        self.parallel_search = ParallelRootSearch(self.alpha_beta, parallel_workers) if parallel_workers > 1 else None
 
     def make_decision(self, game_state: GameState) -> Optional[Card]:
-        """困难决策：完整α-β剪枝搜索"""
+        """困难决策（统计保存在 last_search_stats，多线程调用请使用 decide）"""
+        decision, self.last_search_stats = self.decide(game_state)
+        return decision
+
+    def decide(self, game_state: GameState, time_limit: Optional[float] = None,
+               cancel_event: Optional[threading.Event] = None) -> Tuple[Optional[Card], Dict[str, Any]]:
+        """困难决策：完整α-β剪枝搜索，返回出牌和本次的搜索统计
+
+        time_limit 覆盖默认的搜索时间（按节点预算搜索时忽略），cancel_event 置位时提前结束搜索；
+        可取消的搜索（后台预读）不占用根节点并行进程池。
+        """
         start_time = time.time()
-        candidates = self._get_playable_cards(game_state)
+        candidates = get_playable_cards(game_state.ai_hand, game_state.current_card)
 
         if not candidates:
-            return None
+            return None, {}
         if len(candidates) == 1:
-            return candidates[0]
-
-        # 预剪枝优化
-        candidates = HeuristicPruning.quick_prune(candidates, game_state)
-        candidates = HeuristicPruning.boundary_prune(candidates, game_state)
+            return candidates[0], {}
 
-        if len(candidates) == 1:
-            return candidates[0]
+        # 预剪枝优化（按本次搜索的预算），结果作为根着法的搜索顺序
+        time_limit = time_limit if time_limit is not None else self.alpha_beta.time_limit
+        candidates, reserve, search_stats = _prune_candidates(
+            candidates, game_state, start_time + time_limit, self.alpha_beta.node_limit
+        )
 
-        # 动态调整搜索深度
-        time_spent = time.time() - start_time
+        # 动态调整搜索深度（按节点预算搜索时不看耗时，保证结果可复现）
+        time_spent = time.time() - start_time if self.alpha_beta.node_limit is None else 0.0
         adjusted_depth = self._adjust_search_depth(game_state, time_spent)
 
-        # 使用完整α-β剪枝搜索
-        result = self.alpha_beta.search(game_state, adjusted_depth, float('-inf'), float('inf'), True)
-        return result.get("best_move")
+        # 使用迭代加深α-β剪枝搜索，截止时间内返回最后一个完整深度的最佳着法
+        remaining_time = time_limit - (time.time() - start_time)
+        if self.parallel_search and cancel_event is None and len(candidates) + len(reserve) > 2:
+            result = self.parallel_search.search(game_state, adjusted_depth, remaining_time, candidates, reserve)
+        else:
+            result = self.alpha_beta.search_iterative(game_state, adjusted_depth, remaining_time, cancel_event,
+                                                      candidates, reserve)
+        search_stats.update(_extract_search_stats(result))
+        if self.alpha_beta.node_limit is not None:
+            search_stats["node_limit"] = self.alpha_beta.node_limit
+        return result.get("best_move"), search_stats
 
     def _adjust_search_depth(self, game_state: GameState, time_spent: float) -> int:
         """动态调整搜索深度"""
@@ -485,29 +1745,44 @@ class HardAI:
 
         return base_depth
 
-    def _get_playable_cards(self, game_state: GameState) -> List[Card]:
-        """获取可出牌"""
-        if not game_state.current_card:
-            return game_state.ai_hand
-
-        return [card for card in game_state.ai_hand
-                if card.culture == game_state.current_card.culture or
-                   card.type == game_state.current_card.type]
-
     def should_report_minpai(self, opponent_hand_count: int) -> bool:
         """困难AI从不误报"""
         return opponent_hand_count != 1
 
 
+def _parse_difficulty_values(text: str, value_type=float) -> Dict[str, Any]:
+    """解析 "medium:0.2,hard:0.4" 形式的按难度配置"""
+    values = {}
+    for item in text.split(','):
+        difficulty, _, value = item.strip().partition(':')
+        if difficulty and value:
+            values[difficulty] = value_type(value)
+    return values
+
+# 各难度默认的节点配额，约为默认搜索时间内能搜索的节点数
+DEFAULT_NODE_BUDGETS = "medium:80000,hard:150000"
+
+def load_node_budgets() -> Optional[Dict[str, int]]:
+    """GAME_AI_BUDGET_MODE=nodes 时返回各难度的节点配额（GAME_AI_NODE_BUDGETS），否则返回 None 表示按时间搜索"""
+    if os.getenv('GAME_AI_BUDGET_MODE', 'time') != 'nodes':
+        return None
+    return _parse_difficulty_values(os.getenv('GAME_AI_NODE_BUDGETS', DEFAULT_NODE_BUDGETS), int)
+
+
 class SmartAIController:
-    """智能AI控制器 - 根据难度选择不同的AI算法"""
+    """智能AI控制器 - 根据难度选择不同的AI算法
+
+    node_budgets 为各难度的节点配额，给出时按节点预算搜索；默认按 GAME_AI_BUDGET_MODE 配置。
+    """
 
-    def __init__(self, difficulty: str = 'medium'):
+    def __init__(self, difficulty: str = 'medium', node_budgets: Optional[Dict[str, int]] = None):
         self.difficulty = difficulty
+        if node_budgets is None:
+            node_budgets = load_node_budgets() or {}
         self.ai_engines = {
             'easy': EasyAI(),
-            'medium': MediumAI(),
-            'hard': HardAI()
+            'medium': MediumAI(node_limit=node_budgets.get('medium')),
+            'hard': HardAI(node_limit=node_budgets.get('hard'))
         }
         self.current_ai = self.ai_engines.get(difficulty, self.ai_engines['medium'])
 
@@ -515,10 +1790,26 @@ class SmartAIController:
         """智能决策 - 委托给对应的AI引擎"""
         return self.current_ai.make_decision(game_state)
 
+    def decide(self, game_state: GameState, time_limit: Optional[float] = None,
+               cancel_event: Optional[threading.Event] = None) -> Tuple[Optional[Card], Dict[str, Any]]:
+        """智能决策并返回本次的搜索统计 - 不依赖共享状态，可多线程并发调用"""
+        return self.current_ai.decide(game_state, time_limit, cancel_event)
+
     def should_report_minpai(self, opponent_hand_count: int) -> bool:
         """判断是否应该举报对方叫'闽派'"""
         return self.current_ai.should_report_minpai(opponent_hand_count)
 
+    def get_search_stats(self) -> Dict[str, Any]:
+        """获取最近一次决策的搜索统计（简单AI不搜索，返回空字典）"""
+        return dict(getattr(self.current_ai, 'last_search_stats', {}))
+
+    def get_time_limit(self) -> Optional[float]:
+        """当前引擎默认的搜索时间，不搜索或按节点预算搜索的引擎返回 None"""
+        alpha_beta = getattr(self.current_ai, 'alpha_beta', None)
+        if alpha_beta is None or alpha_beta.node_limit is not None:
+            return None
+        return alpha_beta.time_limit
+
     def get_ai_info(self) -> Dict[str, str]:
         """获取当前AI信息"""
         return {
@@ -527,78 +1818,747 @@ class SmartAIController:
             'description': self.current_ai.description
         }
 
-# 全局AI控制器实例
+# 全局AI控制器实例 - 控制器只保存配置，搜索状态在每次调用的 SearchContext 中，可被多个请求线程共享
 _ai_controllers = {}
+_ai_controllers_lock = threading.Lock()
+
+# 可用的难度；控制器、指标和预算调度都按难度常驻，只接受这几种
+AI_DIFFICULTIES = ('easy', 'medium', 'hard')
+
 
 def get_ai_controller(difficulty: str) -> SmartAIController:
-    """获取AI控制器实例"""
-    if difficulty not in _ai_controllers:
-        _ai_controllers[difficulty] = SmartAIController(difficulty)
-    return _ai_controllers[difficulty]
-
-def make_ai_decision(game_state_dict: Dict[str, Any], difficulty: str) -> Dict[str, Any]:
-    """AI决策接口"""
-    print("🎮 === AI决策开始 ===")
-    print(f"🎯 难度级别: {difficulty}")
-    print(f"🎲 当前玩家: {game_state_dict.get('current_player', 'unknown')}")
-    print(f"🃏 当前牌: {game_state_dict.get('current_card', {}).get('name', '无')}")
-    print(f"👤 玩家手牌数: {len(game_state_dict.get('player_hand', []))}")
-    print(f"🤖 AI手牌数: {len(game_state_dict.get('ai_hand', []))}")
-    print(f"🎭 回合数: {game_state_dict.get('round_count', 0)}")
+    """获取AI控制器实例，未知难度抛出 ValueError（不为任意字符串创建常驻控制器）"""
+    if difficulty not in AI_DIFFICULTIES:
+        raise ValueError(f"未知的难度: {difficulty}")
+    with _ai_controllers_lock:
+        if difficulty not in _ai_controllers:
+            _ai_controllers[difficulty] = SmartAIController(difficulty)
+        return _ai_controllers[difficulty]
+
+
+class AIMetricsRegistry:
+    """进程内的AI指标汇总 - 按难度累计搜索统计，以及包含Flask层在内的请求耗时"""
+
+    # 按次累加的搜索计数
+    COUNTERS = ("nodes_evaluated", "leaf_nodes", "beta_cutoffs", "alpha_cutoffs", "tt_cutoffs",
+                "tablebase_hits", "chance_nodes", "chance_hits", "tt_probes", "tt_hits", "candidates", "quick_pruned",
+                "boundary_pruned", "prune_readmitted")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_difficulty: Dict[str, Dict[str, Any]] = {}
+
+    def _bucket(self, difficulty: str) -> Dict[str, Any]:
+        bucket = self._by_difficulty.get(difficulty)
+        if bucket is None:
+            bucket = {
+                "decisions": 0, "cached_decisions": 0, "failures": 0, "searches": 0, "timeouts": 0,
+                "decision_time": 0.0, "decision_time_max": 0.0,
+                "requests": 0, "request_time": 0.0, "request_time_max": 0.0,
+                "depth_total": 0, "ebf_total": 0.0, "ebf_samples": 0
+            }
+            bucket.update((key, 0) for key in self.COUNTERS)
+            self._by_difficulty[difficulty] = bucket
+        return bucket
+
+    def record_decision(self, difficulty: str, decision_time: float, search_stats: Dict[str, Any],
+                        cached: bool = False) -> None:
+        """记录一次AI决策（只含搜索本身的耗时）"""
+        with self._lock:
+            bucket = self._bucket(difficulty)
+            bucket["decisions"] += 1
+            bucket["cached_decisions"] += cached
+            bucket["decision_time"] += decision_time
+            bucket["decision_time_max"] = max(bucket["decision_time_max"], decision_time)
+            for key in self.COUNTERS:
+                bucket[key] += search_stats.get(key, 0)
+            if "depth_completed" in search_stats:
+                bucket["searches"] += 1
+                bucket["depth_total"] += search_stats["depth_completed"]
+                bucket["timeouts"] += bool(search_stats.get("timed_out"))
+                if search_stats.get("effective_branching_factor") is not None:
+                    bucket["ebf_total"] += search_stats["effective_branching_factor"]
+                    bucket["ebf_samples"] += 1
+
+    def record_failure(self, difficulty: str) -> None:
+        with self._lock:
+            self._bucket(difficulty)["failures"] += 1
+
+    def record_request(self, difficulty: str, request_time: float) -> None:
+        """记录一次完整的API请求耗时（含反序列化和Flask层）"""
+        with self._lock:
+            bucket = self._bucket(difficulty)
+            bucket["requests"] += 1
+            bucket["request_time"] += request_time
+            bucket["request_time_max"] = max(bucket["request_time_max"], request_time)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """导出当前指标，附带平均值"""
+        with self._lock:
+            result = {}
+            for difficulty, bucket in self._by_difficulty.items():
+                data = dict(bucket)
+                decisions, searches, requests = data["decisions"], data["searches"], data["requests"]
+                data["decision_time_mean"] = data["decision_time"] / decisions if decisions else None
+                data["request_time_mean"] = data["request_time"] / requests if requests else None
+                data["nodes_per_sec"] = (data["nodes_evaluated"] / data["decision_time"]
+                                         if data["decision_time"] > 0 else None)
+                data["mean_depth"] = data.pop("depth_total") / searches if searches else None
+                ebf_total, ebf_samples = data.pop("ebf_total"), data.pop("ebf_samples")
+                data["mean_effective_branching_factor"] = ebf_total / ebf_samples if ebf_samples else None
+                data["tt_hit_rate"] = data["tt_hits"] / data["tt_probes"] if data["tt_probes"] else 0.0
+                result[difficulty] = data
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._by_difficulty.clear()
+
+
+# 全局指标实例
+ai_metrics = AIMetricsRegistry()
+
+
+class SearchBudgetScheduler:
+    """负载感知的搜索预算 - 跟踪进程内进行中的AI搜索，按并发数缩减每次搜索的时间预算
+
+    cpu_slots 个搜索可以同时按默认时间全速进行（同一进程内的搜索线程共享GIL，默认为1）；
+    并发更多时每个新搜索按份额缩减时间，但不低于该难度的下限。
+    宁可降低搜索深度，也不让请求排队直到超时。
+
+    后台搜索（预读）按最低优先级登记：只在有空闲份额时开始，前台搜索到达后占满份额时被取消。
+    """
+
+    def __init__(self, cpu_slots: int = 1, floors: Optional[Dict[str, float]] = None):
+        self.cpu_slots = max(1, cpu_slots)
+        self.floors = dict(floors or {})
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, int] = {}
+        self._by_difficulty: Dict[str, Dict[str, Any]] = {}
+        self._background: List[threading.Event] = []
+        self.preempted = 0
+
+    def _budget(self, difficulty: str, base_time: float, in_flight: int) -> float:
+        """in_flight 个搜索并发时的时间预算"""
+        share = min(1.0, self.cpu_slots / max(in_flight, 1))
+        floor = min(self.floors.get(difficulty, 0.0), base_time)
+        return max(floor, base_time * share)
+
+    def acquire(self, difficulty: str, base_time: float) -> float:
+        """登记一个即将开始的搜索，返回其时间预算；搜索结束后必须调用 release"""
+        with self._lock:
+            self._in_flight[difficulty] = self._in_flight.get(difficulty, 0) + 1
+            budget = self._budget(difficulty, base_time, sum(self._in_flight.values()))
+
+            bucket = self._by_difficulty.get(difficulty)
+            if bucket is None:
+                bucket = {"base_time": base_time, "searches": 0, "degraded": 0,
+                          "budget_total": 0.0, "budget_min": base_time}
+                self._by_difficulty[difficulty] = bucket
+            bucket["base_time"] = base_time
+            bucket["searches"] += 1
+            bucket["degraded"] += budget < base_time
+            bucket["budget_total"] += budget
+            bucket["budget_min"] = min(bucket["budget_min"], budget)
+
+            # 前台搜索加后台搜索超出份额时，取消最近开始的后台搜索让出CPU
+            excess = sum(self._in_flight.values()) + len(self._background) - self.cpu_slots
+            while excess > 0 and self._background:
+                self._background.pop().set()
+                self.preempted += 1
+                excess -= 1
+        return budget
+
+    def release(self, difficulty: str) -> None:
+        with self._lock:
+            self._in_flight[difficulty] -= 1
+
+    def acquire_background(self, cancel_event: threading.Event) -> bool:
+        """登记一个后台搜索：份额已被占满时返回 False（不登记），否则前台搜索需要时会置位 cancel_event；
+        登记成功的搜索结束后必须调用 release_background"""
+        with self._lock:
+            if sum(self._in_flight.values()) + len(self._background) >= self.cpu_slots:
+                return False
+            self._background.append(cancel_event)
+            return True
+
+    def release_background(self, cancel_event: threading.Event) -> None:
+        with self._lock:
+            if cancel_event in self._background:
+                self._background.remove(cancel_event)
+
+    def stats(self) -> Dict[str, Any]:
+        """当前负载和各难度的预算：current_budget 为此刻新到达的搜索能得到的时间"""
+        with self._lock:
+            in_flight = sum(self._in_flight.values())
+            difficulties = {}
+            for difficulty, bucket in self._by_difficulty.items():
+                data = dict(bucket)
+                data["in_flight"] = self._in_flight.get(difficulty, 0)
+                data["floor"] = self.floors.get(difficulty, 0.0)
+                data["current_budget"] = self._budget(difficulty, bucket["base_time"], in_flight + 1)
+                data["budget_mean"] = data.pop("budget_total") / data["searches"] if data["searches"] else None
+                difficulties[difficulty] = data
+            return {
+                "cpu_slots": self.cpu_slots,
+                "in_flight": in_flight,
+                "background_in_flight": len(self._background),
+                "background_preempted": self.preempted,
+                "difficulties": difficulties
+            }
+
+
+# 全局搜索预算调度器
+search_scheduler = SearchBudgetScheduler(
+    cpu_slots=int(os.getenv('GAME_AI_CPU_SLOTS', '1')),
+    floors=_parse_difficulty_values(os.getenv('GAME_AI_BUDGET_FLOORS', 'medium:0.2,hard:0.4'))
+)
+
+
+def decision_cache_key(difficulty: str, game_state: GameState) -> str:
+    """决策缓存的规范键：难度、当前牌、双方手牌（位掩码，与顺序无关）、牌堆数量和罚牌数"""
+    current = _card_bit_index(game_state.current_card) if game_state.current_card else -1
+    penalties = game_state.penalties
+    return (f"{difficulty}:{_cards_to_mask(game_state.ai_hand):x}:{_cards_to_mask(game_state.player_hand):x}:"
+            f"{current}:{len(game_state.deck)}:{penalties.get('player', 0)}:{penalties.get('ai', 0)}")
+
+
+class DecisionCache:
+    """跨请求的AI决策缓存 - 进程内LRU + TTL，可选用SQLite在多个工作进程间共享
+
+    只缓存经过搜索得到的决策，值为卡牌序号；相同局面直接返回，不再运行α-β搜索。
+    """
+
+    def __init__(self, max_size: int = 4096, ttl: float = 600.0, shared_path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared_path = shared_path
+        self._entries: 'OrderedDict[str, Tuple[int, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        if shared_path:
+            self._init_shared_db()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, key: str) -> Optional[Card]:
+        """查询缓存，过期的条目视为未命中"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return CARD_REGISTRY[entry[0]]
+                del self._entries[key]
+
+        index = self._get_shared(key, now)
+        with self._lock:
+            if index is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+            self._put_locked(key, index, now)
+        return CARD_REGISTRY[index]
+
+    def put(self, key: str, card: Card) -> None:
+        """写入缓存（共享存储同时写入）"""
+        index = _card_bit_index(card)
+        now = time.time()
+        with self._lock:
+            self._put_locked(key, index, now)
+            self.stores += 1
+            prune_shared = self.shared_path and self.stores % 256 == 0
+        self._put_shared(key, index, now, prune_shared)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "shared": bool(self.shared_path),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions
+            }
+
+    def _put_locked(self, key: str, index: int, stored_at: float) -> None:
+        """写入进程内LRU，超出容量淘汰最久未用的条目（调用方需持有锁）"""
+        self._entries[key] = (index, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.shared_path, timeout=1)
+
+    def _init_shared_db(self) -> None:
+        """创建共享缓存表"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.shared_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ai_decision_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    card_index INTEGER NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+            """)
 
+    def _get_shared(self, key: str, now: float) -> Optional[int]:
+        """查询共享缓存，出错时按未命中处理"""
+        if not self.shared_path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT card_index FROM ai_decision_cache WHERE cache_key = ? AND stored_at >= ?",
+                    (key, now - self.ttl)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ 共享决策缓存读取失败: {e}")
+            return None
+        return row[0] if row else None
+
+    def _put_shared(self, key: str, index: int, now: float, prune: bool) -> None:
+        """写入共享缓存，定期清理过期和超出容量的条目"""
+        if not self.shared_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO ai_decision_cache (cache_key, card_index, stored_at) VALUES (?, ?, ?)",
+                    (key, index, now)
+                )
+                if prune:
+                    conn.execute("DELETE FROM ai_decision_cache WHERE stored_at < ?", (now - self.ttl,))
+                    conn.execute(
+                        "DELETE FROM ai_decision_cache WHERE cache_key IN ("
+                        "SELECT cache_key FROM ai_decision_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_size,)
+                    )
+        except sqlite3.Error as e:
+            print(f"⚠️ 共享决策缓存写入失败: {e}")
+
+
+def _create_decision_cache() -> DecisionCache:
+    """按环境变量创建决策缓存：容量为0时关闭"""
+    return DecisionCache(
+        max_size=int(os.getenv('GAME_AI_DECISION_CACHE_SIZE', '4096')),
+        ttl=float(os.getenv('GAME_AI_DECISION_CACHE_TTL', '600')),
+        shared_path=os.getenv('GAME_AI_DECISION_CACHE_DB') or None
+    )
+
+
+# 全局决策缓存实例
+decision_cache = _create_decision_cache()
+
+
+def predict_human_replies(game_state: GameState, max_replies: int) -> List[GameState]:
+    """预测人类在当前局面下最可能的应对，返回应对之后轮到AI的局面（按可能性从高到低）
+
+    有牌可出时按启发式优先级（从人类视角计算）取前 max_replies 种出牌；
+    无牌可出时人类会被罚摸牌堆顶的牌，牌堆不足需要洗牌时结果无法预知，不做预测。
+    出完最后一张牌的应对直接结束对局，不需要预测。
+    """
+    playable = get_playable_cards(game_state.player_hand, game_state.current_card)
+
+    if not playable:
+        if len(game_state.deck) < PENALTY_DRAW_COUNT:
+            return []
+        penalties = dict(game_state.penalties)
+        penalties['player'] = penalties.get('player', 0) + 1
+        return [replace(
+            game_state,
+            current_player='ai',
+            deck=game_state.deck[PENALTY_DRAW_COUNT:],
+            player_hand=game_state.player_hand + game_state.deck[:PENALTY_DRAW_COUNT],
+            ai_hand=list(game_state.ai_hand),
+            penalties=penalties
+        )]
+
+    # 用人类的手牌计算出牌优先级（与AI剪枝的优先级相同）
+    scores = HeuristicPruning.priority_scores(playable, game_state.current_card, game_state.player_hand)
+    playable = [card for _, card in sorted(zip(scores, playable), key=lambda item: item[0], reverse=True)]
+
+    replies = []
+    for card in playable:
+        if len(replies) >= max_replies:
+            break
+        player_hand = [c for c in game_state.player_hand if c is not card]
+        if not player_hand:
+            continue
+        replies.append(replace(
+            game_state,
+            current_player='ai',
+            current_card=card,
+            deck=list(game_state.deck),
+            player_hand=player_hand,
+            ai_hand=list(game_state.ai_hand),
+            player_called_minpai=False,
+            penalties=dict(game_state.penalties),
+            round_count=game_state.round_count + 1
+        ))
+    return replies
+
+
+class PonderJob:
+    """一个预读任务：人类的一种应对之后的局面"""
+
+    __slots__ = ('cache_key', 'cancel_event', 'future')
+
+    def __init__(self, cache_key: str):
+        self.cache_key = cache_key
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def cancel(self) -> None:
+        """取消任务：排队中的直接移除，运行中的搜索在下一个节点处停止"""
+        self.cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+
+class AIPonderer:
+    """后台预读 - AI出牌后，趁人类思考时在后台线程池中搜索人类最可能应对之后的局面
+
+    预读结果写入决策缓存；实际着法到达时若与某个预读一致就直接命中缓存，其余预读立即取消。
+    每个预读有独立的时间预算且可随时取消，工作线程数为0或决策缓存关闭时不预读。
+    """
+
+    def __init__(self, workers: int = 0, max_replies: int = 3, time_limit: float = 1.5,
+                 difficulties: Tuple[str, ...] = ('hard',), max_sessions: int = 1024):
+        self.workers = workers
+        self.max_replies = max_replies
+        self.time_limit = time_limit
+        self.difficulties = difficulties
+        self.max_sessions = max_sessions
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: 'OrderedDict[str, List[PonderJob]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.scheduled = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.skipped = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0 and decision_cache.enabled
+
+    def ponder(self, session_id: str, game_state: GameState, difficulty: str) -> int:
+        """AI出牌后调用：预测人类的应对并提交后台搜索，返回提交的任务数"""
+        if not self.enabled or difficulty not in self.difficulties:
+            return 0
+
+        # 局面在当前线程中复制，之后会话状态的修改不影响预读
+        replies = predict_human_replies(game_state, self.max_replies)
+        jobs = [PonderJob(decision_cache_key(difficulty, state)) for state in replies]
+
+        with self._lock:
+            stale = self._jobs.pop(session_id, [])
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ai-ponder')
+            for job, state in zip(jobs, replies):
+                job.future = self._executor.submit(self._run, job, state, difficulty)
+            if jobs:
+                self._jobs[session_id] = jobs
+                self.scheduled += len(jobs)
+            # 长时间未回来的会话不再保留预读任务
+            while len(self._jobs) > self.max_sessions:
+                _, evicted = self._jobs.popitem(last=False)
+                stale.extend(evicted)
+
+        for job in stale:
+            job.cancel()
+        return len(jobs)
+
+    def resolve(self, session_id: str, game_state: GameState, difficulty: str) -> bool:
+        """人类的实际着法到达后调用：取消不匹配的预读，匹配的预读正在运行时等待其完成
+
+        返回 True 表示预读结果已写入决策缓存，随后的决策可直接命中。
+        """
+        with self._lock:
+            jobs = self._jobs.pop(session_id, None)
+        if not jobs:
+            return False
+
+        cache_key = decision_cache_key(difficulty, game_state)
+        matched = None
+        for job in jobs:
+            if matched is None and job.cache_key == cache_key:
+                matched = job
+            else:
+                job.cancel()
+
+        # 匹配的预读还没开始时不再等待，直接走正常搜索
+        if matched is None or matched.future.cancel():
+            with self._lock:
+                self.misses += 1
+            return False
+
+        try:
+            found = matched.future.result()
+        except Exception as e:
+            print(f"⚠️ AI预读失败: {e}")
+            found = False
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def cancel(self, session_id: str) -> None:
+        """取消会话的全部预读（会话结束时调用）"""
+        with self._lock:
+            jobs = self._jobs.pop(session_id, [])
+        for job in jobs:
+            job.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """预读统计"""
+        with self._lock:
+            resolved = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "workers": self.workers,
+                "pending_sessions": len(self._jobs),
+                "scheduled": self.scheduled,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "skipped": self.skipped,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / resolved if resolved else 0.0
+            }
+
+    def shutdown(self) -> None:
+        """取消全部预读并关闭线程池"""
+        with self._lock:
+            jobs = [job for session_jobs in self._jobs.values() for job in session_jobs]
+            self._jobs.clear()
+            executor, self._executor = self._executor, None
+        for job in jobs:
+            job.cancel()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _run(self, job: PonderJob, game_state: GameState, difficulty: str) -> bool:
+        """工作线程：搜索一个预读局面，返回结果是否写入了决策缓存"""
+        # 预读以后台优先级登记：没有空闲份额时放弃，搜索中前台搜索到达时被取消
+        if job.cancel_event.is_set() or not search_scheduler.acquire_background(job.cancel_event):
+            with self._lock:
+                self.skipped += 1
+            return False
+
+        try:
+            decision, search_stats = get_ai_controller(difficulty).decide(game_state, self.time_limit, job.cancel_event)
+        finally:
+            search_scheduler.release_background(job.cancel_event)
+
+        # 被取消的搜索可能只完成了较浅的深度，不写入缓存
+        if job.cancel_event.is_set():
+            with self._lock:
+                self.cancelled += 1
+            return False
+
+        stored = decision is not None and 'nodes_evaluated' in search_stats
+        if stored:
+            decision_cache.put(job.cache_key, decision)
+        with self._lock:
+            self.completed += 1
+        return stored
+
+
+def _create_ai_ponderer() -> AIPonderer:
+    """按环境变量创建后台预读：工作线程数默认为0（关闭）"""
+    difficulties = os.getenv('GAME_AI_PONDER_DIFFICULTIES', 'hard')
+    return AIPonderer(
+        workers=int(os.getenv('GAME_AI_PONDER_WORKERS', '0')),
+        max_replies=int(os.getenv('GAME_AI_PONDER_REPLIES', '3')),
+        time_limit=float(os.getenv('GAME_AI_PONDER_TIME', '1.5')),
+        difficulties=tuple(d.strip() for d in difficulties.split(',') if d.strip())
+    )
+
+
+# 全局后台预读实例
+ai_ponderer = _create_ai_ponderer()
+
+def make_ai_decision(game_state_dict: Dict[str, Any], difficulty: str,
+                     compact: bool = False, verbose: bool = True, scheduled: bool = True) -> Dict[str, Any]:
+    """AI决策接口 - 接收完整的游戏状态字典（卡牌可为字典或紧凑整数ID）"""
     try:
         # 转换数据结构
         game_state = _dict_to_game_state(game_state_dict)
-        print(f"✅ 游戏状态转换完成")
+        if verbose:
+            print(f"✅ 游戏状态转换完成")
+    except Exception as e:
+        return _decision_failure(e, difficulty, verbose)
+
+    return make_ai_decision_for_state(game_state, difficulty, compact, verbose, scheduled)
+
+def make_ai_decision_for_state(game_state: GameState, difficulty: str,
+                               compact: bool = False, verbose: bool = True, scheduled: bool = True) -> Dict[str, Any]:
+    """AI决策接口 - 接收已构建好的GameState（供服务端游戏会话使用），compact 时返回整数卡牌ID
+
+    verbose 为 False 时不输出调试日志（批量决策使用）；scheduled 为 False 时不经过负载感知的
+    搜索预算（批量决策使用：批量项按默认时间完整搜索，结果可以缓存）。
+    """
+    if verbose:
+        print("🎮 === AI决策开始 ===")
+        print(f"🎯 难度级别: {difficulty}")
+        print(f"🎲 当前玩家: {game_state.current_player}")
+        print(f"🃏 当前牌: {game_state.current_card.name if game_state.current_card else '无'}")
+        print(f"👤 玩家手牌数: {len(game_state.player_hand)}")
+        print(f"🤖 AI手牌数: {len(game_state.ai_hand)}")
+        print(f"🎭 回合数: {game_state.round_count}")
 
+    try:
         # 获取AI控制器
         ai_controller = get_ai_controller(difficulty)
         ai_info = ai_controller.get_ai_info()
-        print(f"🤖 AI信息: {ai_info['name']} - {ai_info['description']}")
 
-        # 分析当前局面
-        _analyze_game_state(game_state)
+        if verbose:
+            print(f"🤖 AI信息: {ai_info['name']} - {ai_info['description']}")
+            # 分析当前局面
+            _analyze_game_state(game_state)
 
-        # 做出决策
+        # 做出决策：相同局面优先使用缓存
         start_time = time.time()
-        print(f"⚡ 开始AI决策...")
-
-        decision = ai_controller.make_decision(game_state)
+        cache_key = decision_cache_key(difficulty, game_state) if decision_cache.enabled else None
+        decision = decision_cache.get(cache_key) if cache_key else None
+        cached = decision is not None
+        if cached:
+            if verbose:
+                print(f"💾 命中决策缓存")
+            search_stats: Dict[str, Any] = {}
+        else:
+            if verbose:
+                print(f"⚡ 开始AI决策...")
+            base_time = ai_controller.get_time_limit()
+            if base_time is None or not scheduled:
+                decision, search_stats = ai_controller.decide(game_state)
+                degraded = False
+            else:
+                # 按当前负载分配时间预算
+                time_budget = search_scheduler.acquire(difficulty, base_time)
+                try:
+                    decision, search_stats = ai_controller.decide(game_state, time_budget)
+                finally:
+                    search_scheduler.release(difficulty)
+                degraded = time_budget < base_time
+                if degraded and verbose:
+                    print(f"⏳ 服务器繁忙，搜索时间缩减为 {time_budget:.2f}秒")
+                if 'nodes_evaluated' in search_stats:
+                    search_stats["time_budget"] = time_budget
+            # 只缓存经过完整预算搜索的决策
+            if cache_key and decision is not None and 'nodes_evaluated' in search_stats and not degraded:
+                decision_cache.put(cache_key, decision)
 
         decision_time = time.time() - start_time
-        print(f"⚡ 决策耗时: {decision_time:.3f}秒")
-        print(f"🎯 决策结果: {decision.name if decision else '无可用牌'}")
-
-        # 决策后分析
-        if decision:
-            print(f"🃏 选择牌: {decision.name} ({decision.culture.value}, {decision.type.value})")
-            print(f"📊 牌ID: {decision.id}")
-
-        # 获取AI信息
-        ai_info = ai_controller.get_ai_info()
-
-        print("🎮 === AI决策完成 ===\n")
+        ai_metrics.record_decision(difficulty, decision_time, search_stats, cached)
+        if verbose:
+            print(f"⚡ 决策耗时: {decision_time:.3f}秒")
+            if 'nodes_evaluated' in search_stats:
+                print(f"🧠 搜索节点: {search_stats['nodes_evaluated']}，完成深度: {search_stats['depth_completed']}，"
+                      f"剪枝: β{search_stats['beta_cutoffs']}/α{search_stats['alpha_cutoffs']}，"
+                      f"置换表命中率: {search_stats['tt_hit_rate']:.1%} "
+                      f"({search_stats['tt_hits']}/{search_stats['tt_probes']})")
+            print(f"🎯 决策结果: {decision.name if decision else '无可用牌'}")
+
+            # 决策后分析
+            if decision:
+                print(f"🃏 选择牌: {decision.name} ({decision.culture.value}, {decision.type.value})")
+                print(f"📊 牌ID: {decision.id}")
+
+            print("🎮 === AI决策完成 ===\n")
 
         return {
             "success": True,
-            "card": _card_to_dict(decision) if decision else None,
+            "card": card_to_wire(decision, compact) if decision else None,
             "decision_time": decision_time,
+            "tt_hit_rate": search_stats.get("tt_hit_rate", 0.0),
+            "search_stats": search_stats,
+            "cached": cached,
             "difficulty": difficulty,
             "ai_info": ai_info
         }
 
     except Exception as e:
-        print(f"❌ AI决策出现异常: {str(e)}")
+        ai_metrics.record_failure(difficulty)
+        return _decision_failure(e, difficulty, verbose)
+
+
+# 批量决策的线程池：与单个请求共享控制器、决策缓存和卡牌表；
+# 搜索线程共享GIL，多开线程只会分摊每项的搜索时间，默认单线程逐项决策
+_batch_pool: Optional[ThreadPoolExecutor] = None
+_batch_pool_lock = threading.Lock()
+
+def get_batch_pool() -> ThreadPoolExecutor:
+    """获取批量决策线程池，线程数由 GAME_AI_BATCH_WORKERS 配置"""
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ThreadPoolExecutor(max_workers=max(1, int(os.getenv('GAME_AI_BATCH_WORKERS', '1'))),
+                                             thread_name_prefix='ai-batch')
+        return _batch_pool
+
+def make_ai_decisions_batch(items: List[Dict[str, Any]], compact: bool = False) -> List[Dict[str, Any]]:
+    """批量AI决策 - 每项为 {"gameState": ..., "difficulty": ...}，按原顺序返回结果
+
+    各项在线程池中决策，不输出逐项调试日志；每项结果附带 item_time（含状态转换的耗时）。
+    批量项不经过 search_scheduler：按默认时间完整搜索，不因并发被缩减到预算下限，结果照常写入决策缓存。
+    单项失败只影响该项。
+    """
+    def decide_item(item: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.time()
+        difficulty = item.get('difficulty', 'medium') if isinstance(item, dict) else 'medium'
+        game_state = item.get('gameState') if isinstance(item, dict) else None
+        if difficulty not in AI_DIFFICULTIES:
+            result = {"success": False, "error": "未知的难度", "difficulty": None}
+        elif not game_state:
+            result = {"success": False, "error": "缺少游戏状态", "difficulty": difficulty}
+        else:
+            result = make_ai_decision(game_state, difficulty, compact, verbose=False, scheduled=False)
+        result["item_time"] = time.time() - started
+        return result
+
+    return list(get_batch_pool().map(decide_item, items))
+
+def _decision_failure(error: Exception, difficulty: str, verbose: bool = True) -> Dict[str, Any]:
+    """记录异常并返回失败结果"""
+    print(f"❌ AI决策出现异常: {str(error)}")
+    if verbose:
         import traceback
         print("📋 异常堆栈:")
         traceback.print_exc()
         print("🎮 === AI决策失败 ===\n")
 
-        return {
-            "success": False,
-            "error": str(e),
-            "difficulty": difficulty
-        }
+    return {
+        "success": False,
+        "error": str(error),
+        "difficulty": difficulty
+    }
 
 def _dict_to_game_state(data: Dict[str, Any]) -> GameState:
     """将字典转换为GameState对象"""
@@ -618,15 +2578,46 @@ def _dict_to_game_state(data: Dict[str, Any]) -> GameState:
         game_end_time=data.get("game_end_time")
     )
 
-def _dict_to_card(data: Dict[str, Any]) -> Card:
-    """将字典转换为Card对象"""
-    return Card(
-        id=data["id"],
-        name=data["name"],
-        culture=CultureType(data["culture"]),
-        type=CardType(data["type"]),
-        image=data["image"]
-    )
+def _game_state_to_dict(game_state: GameState) -> Dict[str, Any]:
+    """将GameState对象转换为字典（与 _dict_to_game_state 互逆）"""
+    return {
+        "game_phase": game_state.game_phase,
+        "current_player": game_state.current_player,
+        "current_card": _card_to_dict(game_state.current_card) if game_state.current_card else None,
+        "deck": [_card_to_dict(card) for card in game_state.deck],
+        "player_hand": [_card_to_dict(card) for card in game_state.player_hand],
+        "ai_hand": [_card_to_dict(card) for card in game_state.ai_hand],
+        "player_called_minpai": game_state.player_called_minpai,
+        "ai_called_minpai": game_state.ai_called_minpai,
+        "penalties": dict(game_state.penalties),
+        "round_count": game_state.round_count,
+        "game_start_time": game_state.game_start_time,
+        "winner": game_state.winner,
+        "game_end_time": game_state.game_end_time
+    }
+
+def get_card(ref: Any) -> Card:
+    """按引用取注册表中的卡牌：紧凑整数ID（1-75）、"card_N" 或含 id 的字典"""
+    if isinstance(ref, dict):
+        ref = ref["id"]
+    if isinstance(ref, int) and not isinstance(ref, bool):
+        if 1 <= ref <= CARD_COUNT:
+            return CARD_REGISTRY[ref - 1]
+    elif isinstance(ref, str):
+        index = CARD_INDEX_BY_ID.get(ref)
+        if index is not None:
+            return CARD_REGISTRY[index]
+    raise ValueError(f"无法识别的卡牌ID: {ref}")
+
+def card_to_wire(card: Card, compact: bool) -> Any:
+    """按请求的格式输出卡牌：紧凑格式为整数ID，否则为完整字典"""
+    if compact:
+        return CARD_INDEX_BY_ID[card.id] + 1
+    return _card_to_dict(card)
+
+def _dict_to_card(data: Any) -> Card:
+    """将字典（或紧凑整数ID）转换为Card对象 - 直接复用注册表中的实例"""
+    return get_card(data)
 
 def _card_to_dict(card: Card) -> Dict[str, Any]:
     """将Card对象转换为字典"""
@@ -661,15 +2652,8 @@ def _analyze_game_state(game_state: GameState) -> None:
     print(f"👤 玩家类型分布: {player_types}")
 
     # 分析可出牌情况
-    ai_playable = len(game_state.ai_hand) if not game_state.current_card else len([
-        card for card in game_state.ai_hand
-        if card.culture == game_state.current_card.culture or card.type == game_state.current_card.type
-    ])
-
-    player_playable = len(game_state.player_hand) if not game_state.current_card else len([
-        card for card in game_state.player_hand
-        if card.culture == game_state.current_card.culture or card.type == game_state.current_card.type
-    ])
+    ai_playable = count_playable_cards(game_state.ai_hand, game_state.current_card)
+    player_playable = count_playable_cards(game_state.player_hand, game_state.current_card)
 
     print(f"🎯 AI可出牌数: {ai_playable}/{len(game_state.ai_hand)}")
     print(f"🎯 玩家可出牌数: {player_playable}/{len(game_state.player_hand)}")
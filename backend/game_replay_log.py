@@ -0,0 +1,326 @@
+"""
+对局回放日志 - 把每局游戏以紧凑的二进制格式追加写入日志文件
+卡牌用整数ID（1-75）占一个字节，着法按顺序编码；写入由后台线程批量完成，不占用请求路径
+
+文件格式：文件头 MPRL + 版本号，之后是连续的记录，每条记录为 [负载长度][CRC32][负载]。
+负载依次为：会话信息（REPLAY_HEADER）、初始局面、着法序列。
+进程异常退出时文件尾部可能留下半条记录，读取时会被忽略。
+"""
+
+import atexit
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+REPLAY_MAGIC = b'MPRL'
+REPLAY_VERSION = 1
+FILE_HEADER = struct.Struct('<4sH')
+RECORD_FRAME = struct.Struct('<II')
+# 会话ID、用户ID、难度、胜者、开始时间、结束时间、双方罚牌次数、回合数、双方是否已喊"闽"
+REPLAY_HEADER = struct.Struct('<16sIBBddHHHB')
+
+DEFAULT_REPLAY_LOG_PATH = os.path.join(os.path.dirname(__file__), 'data', 'game_replays.bin')
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+WINNERS = (None, 'human', 'ai')
+UNKNOWN_CODE = 0xFF
+
+# 着法字节：高位为类型，最低位为出手方（0=人类, 1=AI）
+MOVE_PLAY = 0
+MOVE_DRAW = 1
+MOVE_RESHUFFLE = 2
+MOVE_MINPAI = 3
+MOVE_FINISH = 4
+MOVE_TYPES = ('play', 'draw', 'reshuffle', 'minpai', 'finish')
+
+
+def _code(values: Tuple[Any, ...], value: Any) -> int:
+    return values.index(value) if value in values else UNKNOWN_CODE
+
+
+def _value(values: Tuple[Any, ...], code: int, unknown: Any) -> Any:
+    return values[code] if code < len(values) else unknown
+
+
+def encode_move(move_type: int, player: str, card_ids: List[int] = (), winner: Optional[str] = None) -> bytes:
+    """把一个着法编码为字节：出牌带一张牌，摸牌/洗牌带数量和牌，终局带胜者"""
+    head = bytes(((move_type << 1) | (player == 'ai'),))
+    if move_type == MOVE_PLAY:
+        return head + bytes(card_ids)
+    if move_type in (MOVE_DRAW, MOVE_RESHUFFLE):
+        return head + bytes((len(card_ids),)) + bytes(card_ids)
+    if move_type == MOVE_FINISH:
+        return head + bytes((_code(WINNERS, winner),))
+    return head
+
+
+def decode_moves(data: bytes) -> Iterator[Dict[str, Any]]:
+    """把着法字节解码为与会话增量事件相同格式的字典（卡牌为整数ID）"""
+    position = 0
+    while position < len(data):
+        head = data[position]
+        move_type, player = head >> 1, 'ai' if head & 1 else 'human'
+        position += 1
+        event: Dict[str, Any] = {'type': MOVE_TYPES[move_type], 'player': player}
+        if move_type == MOVE_PLAY:
+            event['card_id'] = data[position]
+            position += 1
+        elif move_type in (MOVE_DRAW, MOVE_RESHUFFLE):
+            count = data[position]
+            event['card_ids'] = list(data[position + 1:position + 1 + count])
+            position += 1 + count
+        elif move_type == MOVE_FINISH:
+            event['winner'] = _value(WINNERS, data[position], None)
+            position += 1
+        yield event
+
+
+@dataclass
+class GameReplay:
+    """一局游戏的回放：初始局面 + 着法序列，卡牌均为整数ID"""
+    session_id: str
+    user_id: int
+    difficulty: str
+    winner: Optional[str]
+    started_at: float
+    ended_at: float
+    current_card: Optional[int]
+    player_hand: List[int]
+    ai_hand: List[int]
+    deck: List[int]
+    penalties: Tuple[int, int]
+    round_count: int
+    player_called_minpai: bool
+    ai_called_minpai: bool
+    moves: bytes
+
+    def initial_state(self) -> Dict[str, Any]:
+        """初始局面，格式与前端上传的游戏状态一致（可直接交给 _dict_to_game_state）"""
+        return {
+            "game_phase": "playing",
+            "current_player": "human",
+            "current_card": self.current_card,
+            "deck": list(self.deck),
+            "player_hand": list(self.player_hand),
+            "ai_hand": list(self.ai_hand),
+            "player_called_minpai": self.player_called_minpai,
+            "ai_called_minpai": self.ai_called_minpai,
+            "penalties": {"player": self.penalties[0], "ai": self.penalties[1]},
+            "round_count": self.round_count,
+            "game_start_time": self.started_at
+        }
+
+    def events(self) -> List[Dict[str, Any]]:
+        """着法序列，可依次交给 game_session_service.apply_event 重放"""
+        return list(decode_moves(self.moves))
+
+    def encode(self) -> bytes:
+        """编码为一条记录的负载"""
+        flags = (1 if self.player_called_minpai else 0) | (2 if self.ai_called_minpai else 0)
+        parts = [
+            REPLAY_HEADER.pack(
+                bytes.fromhex(self.session_id), self.user_id,
+                _code(DIFFICULTIES, self.difficulty), _code(WINNERS, self.winner),
+                self.started_at, self.ended_at,
+                self.penalties[0], self.penalties[1], self.round_count, flags
+            ),
+            bytes((self.current_card or 0,))
+        ]
+        for cards in (self.player_hand, self.ai_hand, self.deck):
+            parts.append(bytes((len(cards),)))
+            parts.append(bytes(cards))
+        parts.append(self.moves)
+        return b''.join(parts)
+
+    @classmethod
+    def decode(cls, payload: bytes) -> 'GameReplay':
+        """从一条记录的负载解码"""
+        (session_id, user_id, difficulty, winner, started_at, ended_at,
+         player_penalties, ai_penalties, round_count, flags) = REPLAY_HEADER.unpack_from(payload)
+        position = REPLAY_HEADER.size
+        current_card = payload[position] or None
+        position += 1
+
+        hands = []
+        for _ in range(3):
+            count = payload[position]
+            hands.append(list(payload[position + 1:position + 1 + count]))
+            position += 1 + count
+
+        return cls(
+            session_id=session_id.hex(),
+            user_id=user_id,
+            difficulty=_value(DIFFICULTIES, difficulty, 'unknown'),
+            winner=_value(WINNERS, winner, None),
+            started_at=started_at,
+            ended_at=ended_at,
+            current_card=current_card,
+            player_hand=hands[0],
+            ai_hand=hands[1],
+            deck=hands[2],
+            penalties=(player_penalties, ai_penalties),
+            round_count=round_count,
+            player_called_minpai=bool(flags & 1),
+            ai_called_minpai=bool(flags & 2),
+            moves=payload[position:]
+        )
+
+
+def iter_replays(path: str) -> Iterator[GameReplay]:
+    """逐条流式读取回放日志，不把整个文件读入内存；遇到写了一半或校验失败的记录即停止"""
+    with open(path, 'rb') as f:
+        header = f.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size:
+            return
+        magic, version = FILE_HEADER.unpack(header)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"回放日志格式不匹配: {path}")
+
+        while True:
+            frame = f.read(RECORD_FRAME.size)
+            if len(frame) < RECORD_FRAME.size:
+                return
+            length, checksum = RECORD_FRAME.unpack(frame)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                print(f"⚠️ 回放日志在 {f.tell()} 字节处损坏，之后的记录已忽略: {path}")
+                return
+            yield GameReplay.decode(payload)
+
+
+class ReplayLogWriter:
+    """回放日志的后台写入器 - 请求线程只把回放放入队列，后台线程攒够一批或到时间后一次性追加写入
+
+    队列满时（磁盘跟不上）丢弃新回放并计数，不阻塞游戏。
+    """
+
+    def __init__(self, path: str, batch_size: int = 256, flush_interval: float = 2.0, max_pending: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: 'queue.Queue[Optional[GameReplay]]' = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.bytes_written = 0
+        self.errors = 0
+
+    def submit(self, replay: GameReplay) -> bool:
+        """提交一局回放（不阻塞），返回是否已入队"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='replay-log', daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(replay)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def close(self) -> None:
+        """写完队列中剩余的回放后停止后台线程"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """写入统计"""
+        with self._lock:
+            return {
+                "path": self.path,
+                "submitted": self.submitted,
+                "pending": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "bytes_written": self.bytes_written,
+                "errors": self.errors
+            }
+
+    def _run(self) -> None:
+        """后台线程：攒批写入，收到 None 时写完当前批次后退出"""
+        running = True
+        while running:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            # 从收到第一局起最多等待 flush_interval 秒凑满一批
+            deadline = time.monotonic() + self.flush_interval
+            batch: List[GameReplay] = []
+            item = first
+            while True:
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch: List[GameReplay]) -> None:
+        """把一批回放编码后一次性追加到文件末尾"""
+        chunks = []
+        for replay in batch:
+            payload = replay.encode()
+            chunks.append(RECORD_FRAME.pack(len(payload), zlib.crc32(payload)))
+            chunks.append(payload)
+        data = b''.join(chunks)
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'ab') as f:
+                if f.tell() == 0:
+                    f.write(FILE_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION))
+                f.write(data)
+        except OSError as e:
+            print(f"⚠️ 回放日志写入失败: {e}")
+            with self._lock:
+                self.errors += 1
+                self.dropped += len(batch)
+            return
+
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+            self.bytes_written += len(data)
+
+
+def _create_replay_log() -> Optional[ReplayLogWriter]:
+    """按环境变量创建回放日志：GAME_REPLAY_LOG 设为空字符串时不记录"""
+    path = os.getenv('GAME_REPLAY_LOG', DEFAULT_REPLAY_LOG_PATH)
+    if not path:
+        return None
+    writer = ReplayLogWriter(
+        path,
+        batch_size=int(os.getenv('GAME_REPLAY_BATCH_SIZE', '256')),
+        flush_interval=float(os.getenv('GAME_REPLAY_FLUSH_INTERVAL', '2.0'))
+    )
+    # 进程正常退出前写完队列中的回放
+    atexit.register(writer.close)
+    return writer
+
+
+# 全局回放日志实例
+replay_log: Optional[ReplayLogWriter] = _create_replay_log()
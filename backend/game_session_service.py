@@ -0,0 +1,403 @@
+"""
+游戏会话服务 - 服务端保存权威的游戏状态
+客户端创建会话时上传一次完整状态，之后每回合只发送增量事件
+会话同时按顺序记下全部着法，对局结束时交给回放日志（game_replay_log）后台写入
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Any
+
+from game_ai_service import Card, GameState, card_to_wire, get_card, _dict_to_game_state, _game_state_to_dict
+from game_replay_log import (
+    GameReplay, ReplayLogWriter, encode_move, replay_log,
+    MOVE_DRAW, MOVE_FINISH, MOVE_MINPAI, MOVE_PLAY, MOVE_RESHUFFLE
+)
+
+
+class SessionEventError(ValueError):
+    """增量事件与服务端状态不一致，客户端需要重新同步"""
+
+
+class SessionVersionError(SessionEventError):
+    """请求携带的会话版本与服务端不一致（其他请求已先修改了会话），事件未应用"""
+
+
+@dataclass
+class GameSession:
+    session_id: str
+    user_id: int
+    difficulty: str
+    state: GameState
+    version: int
+    updated_at: float
+    replay: Optional[GameReplay] = None
+    moves: bytearray = field(default_factory=bytearray)
+    recorded: bool = False
+    closed: bool = False
+    # 同一会话的请求串行执行：检查版本、应用事件、AI决策和记入AI出牌期间持有
+    lock: threading.RLock = field(default_factory=threading.RLock, repr=False, compare=False)
+
+
+def _card_ids(cards: List[Card]) -> List[int]:
+    return [card_to_wire(card, True) for card in cards]
+
+
+def _replay_seed(session_id: str, user_id: int, difficulty: str, state: GameState) -> GameReplay:
+    """会话创建时的局面，作为回放的起点"""
+    return GameReplay(
+        session_id=session_id,
+        user_id=user_id,
+        difficulty=difficulty,
+        winner=None,
+        started_at=state.game_start_time,
+        ended_at=0.0,
+        current_card=card_to_wire(state.current_card, True) if state.current_card else None,
+        player_hand=_card_ids(state.player_hand),
+        ai_hand=_card_ids(state.ai_hand),
+        deck=_card_ids(state.deck),
+        penalties=(state.penalties.get('player', 0), state.penalties.get('ai', 0)),
+        round_count=state.round_count,
+        player_called_minpai=state.player_called_minpai,
+        ai_called_minpai=state.ai_called_minpai,
+        moves=b''
+    )
+
+
+def _hand_of(state: GameState, player: str) -> List[Card]:
+    """获取指定一方的手牌"""
+    if player == 'human':
+        return state.player_hand
+    if player == 'ai':
+        return state.ai_hand
+    raise SessionEventError(f"未知的玩家: {player}")
+
+
+def _resolve_card(ref: Any) -> Card:
+    """卡牌引用（整数ID或 "card_N"）转为注册表中的卡牌"""
+    try:
+        return get_card(ref)
+    except (KeyError, ValueError) as e:
+        raise SessionEventError(str(e))
+
+
+def apply_event(session: GameSession, event: Dict[str, Any]) -> None:
+    """将一个增量事件应用到会话状态，规则与前端 gameEngine.ts 一致；卡牌用整数ID或 "card_N" 引用"""
+    state = session.state
+    event_type = event.get('type')
+    player = event.get('player')
+
+    if event_type == 'play':
+        # 出牌：从手牌移到当前牌
+        hand = _hand_of(state, player)
+        card = _resolve_card(event.get('card_id'))
+        if card not in hand:
+            raise SessionEventError(f"手牌中没有这张牌: {card.id}")
+        hand.remove(card)
+        state.current_card = card
+        if player == 'human':
+            state.player_called_minpai = False
+        else:
+            state.ai_called_minpai = False
+        state.round_count += 1
+        state.current_player = 'ai' if player == 'human' else 'human'
+        session.moves += encode_move(MOVE_PLAY, player, _card_ids([card]))
+
+    elif event_type == 'draw':
+        # 罚牌：从牌堆顶依次摸牌
+        hand = _hand_of(state, player)
+        card_ids = event.get('card_ids', [])
+        drawn = []
+        for card_id in card_ids:
+            card = _resolve_card(card_id)
+            if card not in state.deck:
+                raise SessionEventError(f"牌堆中没有这张牌: {card.id}")
+            state.deck.remove(card)
+            hand.append(card)
+            drawn.append(card)
+        if card_ids:
+            penalty_key = 'player' if player == 'human' else 'ai'
+            state.penalties[penalty_key] = state.penalties.get(penalty_key, 0) + 1
+        session.moves += encode_move(MOVE_DRAW, player, _card_ids(drawn))
+
+    elif event_type == 'reshuffle':
+        # 弃牌堆洗回牌堆底：客户端给出洗好的弃牌顺序，只能是不在牌堆、手牌和当前牌中的牌，且不重复
+        cards = [_resolve_card(card_id) for card_id in event.get('card_ids', [])]
+        in_play = set(state.deck) | set(state.player_hand) | set(state.ai_hand)
+        if state.current_card:
+            in_play.add(state.current_card)
+        seen = set()
+        for card in cards:
+            if card in in_play:
+                raise SessionEventError(f"这张牌不在弃牌堆中: {card.id}")
+            if card in seen:
+                raise SessionEventError(f"洗牌中有重复的牌: {card.id}")
+            seen.add(card)
+        state.deck.extend(cards)
+        session.moves += encode_move(MOVE_RESHUFFLE, player, _card_ids(cards))
+
+    elif event_type == 'minpai':
+        if player == 'human':
+            state.player_called_minpai = True
+        else:
+            state.ai_called_minpai = True
+        session.moves += encode_move(MOVE_MINPAI, player)
+
+    elif event_type == 'finish':
+        state.game_phase = 'finished'
+        state.winner = event.get('winner')
+        state.game_end_time = time.time()
+        session.moves += encode_move(MOVE_FINISH, player, winner=state.winner)
+
+    else:
+        raise SessionEventError(f"未知的事件类型: {event_type}")
+
+
+class GameSessionStore:
+    """有界的游戏会话存储 - LRU淘汰，可选把会话快照到SQLite
+
+    对局结束、会话被删除或被淘汰且不保存快照时，把回放交给 replay_log 后台写入。
+    """
+
+    def __init__(self, capacity: int = 1000, snapshot_path: Optional[str] = None,
+                 replay_log: Optional[ReplayLogWriter] = None):
+        self.capacity = capacity
+        self.snapshot_path = snapshot_path
+        self.replay_log = replay_log
+        self._sessions: 'OrderedDict[str, GameSession]' = OrderedDict()
+        # 已淘汰、快照还没写完的会话；这期间的请求仍拿到同一个会话对象（同一把会话锁）
+        self._evicting: Dict[str, GameSession] = {}
+        self._lock = threading.Lock()
+        if snapshot_path:
+            self._init_snapshot_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.snapshot_path, timeout=5)
+
+    def _init_snapshot_db(self) -> None:
+        """创建快照表"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.snapshot_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS game_session_snapshots (
+                    session_id TEXT PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    difficulty TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    state TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    replay BLOB
+                )
+            """)
+            # 旧版本建的快照表没有回放列
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(game_session_snapshots)")}
+            if 'replay' not in columns:
+                conn.execute("ALTER TABLE game_session_snapshots ADD COLUMN replay BLOB")
+
+    def create(self, user_id: int, difficulty: str, state_dict: Dict[str, Any]) -> GameSession:
+        """用完整状态创建会话"""
+        state = _dict_to_game_state(state_dict)
+        session_id = uuid.uuid4().hex
+        session = GameSession(
+            session_id=session_id,
+            user_id=user_id,
+            difficulty=difficulty,
+            state=state,
+            version=0,
+            updated_at=time.time(),
+            replay=_replay_seed(session_id, user_id, difficulty, state)
+        )
+        with self._lock:
+            self._sessions[session.session_id] = session
+            evicted = self._evict_locked()
+        self._flush_evicted(evicted)
+        return session
+
+    def get(self, session_id: str) -> Optional[GameSession]:
+        """获取会话，内存中没有时尝试从快照恢复
+
+        快照在锁外读取；放回内存前再检查一次，并发恢复同一会话的请求最终都拿到同一个对象。
+        """
+        with self._lock:
+            session = self._sessions.get(session_id) or self._evicting.get(session_id)
+            if session is not None:
+                self._sessions[session_id] = session
+                self._sessions.move_to_end(session_id)
+                return session
+
+        loaded = self._load_snapshot(session_id)
+        if loaded is None:
+            return None
+        with self._lock:
+            session = self._sessions.get(session_id) or self._evicting.get(session_id)
+            if session is None:
+                session = loaded
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            evicted = self._evict_locked()
+        self._flush_evicted(evicted)
+        return session
+
+    def apply_events(self, session: GameSession, events: List[Dict[str, Any]],
+                     expected_version: Optional[int] = None) -> None:
+        """按顺序应用增量事件，任一事件失败时会话作废，客户端需重新创建
+
+        给出 expected_version 时在会话锁内先比较版本再应用，版本不一致时抛出 SessionVersionError 且不修改会话。
+        """
+        with session.lock:
+            if session.closed:
+                raise SessionVersionError("游戏会话已结束")
+            if expected_version is not None and expected_version != session.version:
+                raise SessionVersionError("游戏会话版本不一致")
+            try:
+                for event in events:
+                    apply_event(session, event)
+            except SessionEventError:
+                # 与客户端失去同步的对局不记录回放
+                self.remove(session.session_id, record=False)
+                raise
+            session.version += 1
+            session.updated_at = time.time()
+            if session.state.game_phase == 'finished':
+                self._record(session)
+
+    def remove(self, session_id: str, record: bool = True) -> None:
+        """删除会话及其快照，未结束的对局按中途放弃记录回放"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            evicting = self._evicting.pop(session_id, None)
+            session = session or evicting
+        if session is not None:
+            session.closed = True
+            if record:
+                self._record(session)
+        if self.snapshot_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM game_session_snapshots WHERE session_id = ?", (session_id,))
+
+    def snapshot_all(self) -> int:
+        """把内存中的全部会话写入快照，返回写入数量"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        self._save_snapshots(sessions)
+        return len(sessions)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict_locked(self) -> List[GameSession]:
+        """超出容量时淘汰最久未使用的会话（调用方需持有锁），返回被淘汰的会话，
+        由调用方释放锁后交给 _flush_evicted 写快照，写SQLite时不阻塞其他会话"""
+        evicted = []
+        while len(self._sessions) > self.capacity:
+            _, session = self._sessions.popitem(last=False)
+            evicted.append(session)
+            if self.snapshot_path:
+                self._evicting[session.session_id] = session
+        return evicted
+
+    def _flush_evicted(self, evicted: List[GameSession]) -> None:
+        """在锁外写入被淘汰会话的快照（未配置快照时记录回放）"""
+        if not evicted:
+            return
+        if not self.snapshot_path:
+            for session in evicted:
+                self._record(session)
+            return
+
+        self._save_snapshots(evicted)
+        with self._lock:
+            for session in evicted:
+                if self._evicting.get(session.session_id) is session:
+                    del self._evicting[session.session_id]
+        # 写快照期间被删除的会话不保留快照
+        closed = [(session.session_id,) for session in evicted if session.closed]
+        if closed:
+            with self._connect() as conn:
+                conn.executemany("DELETE FROM game_session_snapshots WHERE session_id = ?", closed)
+
+    def _record(self, session: GameSession) -> None:
+        """把会话的回放交给后台写入（每个会话只记录一次）"""
+        if self.replay_log is None or session.replay is None or session.recorded or not session.moves:
+            return
+        session.recorded = True
+        state = session.state
+        self.replay_log.submit(replace(
+            session.replay,
+            winner=state.winner,
+            ended_at=state.game_end_time or time.time(),
+            moves=bytes(session.moves)
+        ))
+
+    def _replay_blob(self, session: GameSession) -> Optional[bytes]:
+        """快照中保存的回放：初始局面和目前为止的着法，已记录过的会话不再保存"""
+        if session.replay is None or session.recorded:
+            return None
+        return replace(session.replay, moves=bytes(session.moves)).encode()
+
+    def _save_snapshots(self, sessions: List[GameSession]) -> None:
+        """写入快照（未配置快照时直接丢弃）"""
+        if not self.snapshot_path or not sessions:
+            return
+        rows = [
+            (s.session_id, s.user_id, s.difficulty, s.version,
+             json.dumps(_game_state_to_dict(s.state), ensure_ascii=False), s.updated_at, self._replay_blob(s))
+            for s in sessions
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO game_session_snapshots "
+                "(session_id, user_id, difficulty, version, state, updated_at, replay) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def _load_snapshot(self, session_id: str) -> Optional[GameSession]:
+        """从快照恢复会话"""
+        if not self.snapshot_path:
+            return None
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT user_id, difficulty, version, state, updated_at, replay FROM game_session_snapshots "
+                "WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        user_id, difficulty, version, state_json, updated_at, replay_blob = row
+        state = _dict_to_game_state(json.loads(state_json))
+        session = GameSession(
+            session_id=session_id,
+            user_id=user_id,
+            difficulty=difficulty,
+            state=state,
+            version=version,
+            updated_at=updated_at
+        )
+        if replay_blob is not None:
+            replay = GameReplay.decode(bytes(replay_blob))
+            session.moves = bytearray(replay.moves)
+            session.replay = replace(replay, moves=b'')
+        return session
+
+
+# 全局会话存储实例
+_session_store: Optional[GameSessionStore] = None
+_session_store_lock = threading.Lock()
+
+def get_session_store() -> GameSessionStore:
+    """获取会话存储，容量和快照路径可用环境变量配置"""
+    global _session_store
+    with _session_store_lock:
+        if _session_store is None:
+            _session_store = GameSessionStore(
+                capacity=int(os.getenv('GAME_SESSION_CAPACITY', '1000')),
+                snapshot_path=os.getenv('GAME_SESSION_SNAPSHOT_DB') or None,
+                replay_log=replay_log
+            )
+        return _session_store
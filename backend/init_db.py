@@ -4,6 +4,8 @@ import os
 from datetime import datetime
 import json
 
+from question_bank import load_question_files, question_metadata
+
 app = Flask(__name__)
 
 # 配置
@@ -59,141 +61,6 @@ class UserCityExploration(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
-# 福州市题目模型
-class FuzhouQuestion(db.Model):
-    __tablename__ = 'fuzhou_questions'
-    id = db.Column(db.Integer, primary_key=True)
-    question_text = db.Column(db.Text, nullable=False)   # 题目文本
-    option_a = db.Column(db.String(500), nullable=False) # 选项A
-    option_b = db.Column(db.String(500), nullable=False) # 选项B
-    option_c = db.Column(db.String(500), nullable=False) # 选项C
-    option_d = db.Column(db.String(500), nullable=False) # 选项D
-    correct_answer = db.Column(db.String(1), nullable=False) # 正确答案 (A/B/C/D)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'city_name': '福州市',
-            'question_text': self.question_text,
-            'options': {
-                'A': self.option_a,
-                'B': self.option_b,
-                'C': self.option_c,
-                'D': self.option_d
-            },
-            'correct_answer': self.correct_answer,
-            'created_at': self.created_at.isoformat()
-        }
-
-# 泉州市题目模型
-class QuanzhouQuestion(db.Model):
-    __tablename__ = 'quanzhou_questions'
-    id = db.Column(db.Integer, primary_key=True)
-    question_text = db.Column(db.Text, nullable=False)   # 题目文本
-    option_a = db.Column(db.String(500), nullable=False) # 选项A
-    option_b = db.Column(db.String(500), nullable=False) # 选项B
-    option_c = db.Column(db.String(500), nullable=False) # 选项C
-    option_d = db.Column(db.String(500), nullable=False) # 选项D
-    correct_answer = db.Column(db.String(1), nullable=False) # 正确答案 (A/B/C/D)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'city_name': '泉州市',
-            'question_text': self.question_text,
-            'options': {
-                'A': self.option_a,
-                'B': self.option_b,
-                'C': self.option_c,
-                'D': self.option_d
-            },
-            'correct_answer': self.correct_answer,
-            'created_at': self.created_at.isoformat()
-        }
-
-# 南平市题目模型
-class NanpingQuestion(db.Model):
-    __tablename__ = 'nanping_questions'
-    id = db.Column(db.Integer, primary_key=True)
-    question_text = db.Column(db.Text, nullable=False)   # 题目文本
-    option_a = db.Column(db.String(500), nullable=False) # 选项A
-    option_b = db.Column(db.String(500), nullable=False) # 选项B
-    option_c = db.Column(db.String(500), nullable=False) # 选项C
-    option_d = db.Column(db.String(500), nullable=False) # 选项D
-    correct_answer = db.Column(db.String(1), nullable=False) # 正确答案 (A/B/C/D)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'city_name': '南平市',
-            'question_text': self.question_text,
-            'options': {
-                'A': self.option_a,
-                'B': self.option_b,
-                'C': self.option_c,
-                'D': self.option_d
-            },
-            'correct_answer': self.correct_answer,
-            'created_at': self.created_at.isoformat()
-        }
-
-# 龙岩市题目模型
-class LongyanQuestion(db.Model):
-    __tablename__ = 'longyan_questions'
-    id = db.Column(db.Integer, primary_key=True)
-    question_text = db.Column(db.Text, nullable=False)   # 题目文本
-    option_a = db.Column(db.String(500), nullable=False) # 选项A
-    option_b = db.Column(db.String(500), nullable=False) # 选项B
-    option_c = db.Column(db.String(500), nullable=False) # 选项C
-    option_d = db.Column(db.String(500), nullable=False) # 选项D
-    correct_answer = db.Column(db.String(1), nullable=False) # 正确答案 (A/B/C/D)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'city_name': '龙岩市',
-            'question_text': self.question_text,
-            'options': {
-                'A': self.option_a,
-                'B': self.option_b,
-                'C': self.option_c,
-                'D': self.option_d
-            },
-            'correct_answer': self.correct_answer,
-            'created_at': self.created_at.isoformat()
-        }
-
-# 莆田市题目模型
-class PutianQuestion(db.Model):
-    __tablename__ = 'putian_questions'
-    id = db.Column(db.Integer, primary_key=True)
-    question_text = db.Column(db.Text, nullable=False)   # 题目文本
-    option_a = db.Column(db.String(500), nullable=False) # 选项A
-    option_b = db.Column(db.String(500), nullable=False) # 选项B
-    option_c = db.Column(db.String(500), nullable=False) # 选项C
-    option_d = db.Column(db.String(500), nullable=False) # 选项D
-    correct_answer = db.Column(db.String(1), nullable=False) # 正确答案 (A/B/C/D)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'city_name': '莆田市',
-            'question_text': self.question_text,
-            'options': {
-                'A': self.option_a,
-                'B': self.option_b,
-                'C': self.option_c,
-                'D': self.option_d
-            },
-            'correct_answer': self.correct_answer,
-            'created_at': self.created_at.isoformat()
-        }
-
 # 用户答题记录模型
 class UserQuizAttempt(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -258,148 +125,22 @@ class UserQuizStats(db.Model):
 
 
 
-def parse_question_files():
-    """解析5个题目文件，返回题目数据"""
-    question_files = [
-        ('frontend/fuzhou-question.txt', '福州市'),
-        ('frontend/quanzhou-question.txt', '泉州市'),
-        ('frontend/nanping-question.txt', '南平市'),
-        ('frontend/longyan-question.txt', '龙岩市'),
-        ('frontend/putian-question.txt', '莆田市')
-    ]
-
-    questions = []
-
-    for file_path, city_name in question_files:
-        full_path = os.path.join(os.path.dirname(__file__), '..', file_path)
-
-        if not os.path.exists(full_path):
-            print(f"警告：找不到题目文件 {full_path}")
-            continue
-
-        print(f"正在解析 {city_name} 的题目文件...")
-
-        with open(full_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-
-        # 按行分割内容
-        lines = content.strip().split('\n')
-
-        # 查找所有题目（只处理前20个）
-        question_count = 0
-        i = 0
-
-        while i < len(lines) and question_count < 20:
-            line = lines[i].strip()
-
-            # 跳过空行
-            if not line:
-                i += 1
-                continue
-
-            # 查找题目行（以数字开头）
-            if line and line[0].isdigit() and '.' in line:
-                try:
-                    # 解析题目
-                    question_text = line.split('.', 1)[1].strip()
-
-                    # 解析选项
-                    options = {}
-                    for j in range(4):  # A, B, C, D
-                        if i + j + 1 < len(lines):
-                            option_line = lines[i + j + 1].strip()
-                            if option_line.startswith(('A.', 'B.', 'C.', 'D.')):
-                                option_key = option_line[0]
-                                option_text = option_line[2:].strip()
-                                options[option_key] = option_text
-
-                    # 解析答案
-                    answer_line = ""
-                    if i + 5 < len(lines):
-                        answer_line = lines[i + 5].strip()
-                        if answer_line.startswith('答案：'):
-                            correct_answer = answer_line[3:].strip()
-
-                            # 创建题目对象
-                            question_data = {
-                                'city_name': city_name,
-                                'question_text': question_text,
-                                'option_a': options.get('A', ''),
-                                'option_b': options.get('B', ''),
-                                'option_c': options.get('C', ''),
-                                'option_d': options.get('D', ''),
-                                'correct_answer': correct_answer
-                            }
-                            questions.append(question_data)
-                            question_count += 1
-                            print(f"    添加题目 {question_count}: {question_text[:30]}... -> {city_name}")
-
-                    # 跳过已处理的行
-                    i += 6
-
-                except Exception as e:
-                    print(f"解析题目时出错: {e}")
-                    i += 1
-            else:
-                i += 1
-
-        print(f"  从 {city_name} 成功解析到 {question_count} 道题目")
-
-    return questions
-
 def init_quiz_questions():
-    """初始化题目数据"""
+    """初始化题目数据：在一个事务中把5个题目文件批量导入统一题目表 quiz_questions"""
     print("开始初始化题目数据...")
 
-    # 城市模型映射
-    city_models = {
-        '福州市': FuzhouQuestion,
-        '泉州市': QuanzhouQuestion,
-        '南平市': NanpingQuestion,
-        '龙岩市': LongyanQuestion,
-        '莆田市': PutianQuestion
-    }
-
-    # 检查是否已有题目数据
-    total_existing = 0
-    for model in city_models.values():
-        total_existing += model.query.count()
-
-    if total_existing > 0:
-        print(f"题目数据已存在，共 {total_existing} 道题目，跳过初始化")
-        return
+    question_metadata.create_all(db.engine)
+    city_stats = load_question_files(db.engine)
 
-    # 解析题目文件
-    questions = parse_question_files()
-
-    if not questions:
+    if not city_stats:
         print("错误：未解析到任何题目数据")
         return
 
-    # 按城市分组插入题目
-    city_stats = {}
-    for question_data in questions:
-        city_name = question_data['city_name']
-        model = city_models.get(city_name)
-
-        if model:
-            question = model(
-                question_text=question_data['question_text'],
-                option_a=question_data['option_a'],
-                option_b=question_data['option_b'],
-                option_c=question_data['option_c'],
-                option_d=question_data['option_d'],
-                correct_answer=question_data['correct_answer']
-            )
-            db.session.add(question)
-            city_stats[city_name] = city_stats.get(city_name, 0) + 1
-
-    db.session.commit()
-    print(f"成功初始化 {len(questions)} 道题目")
+    print(f"成功初始化 {sum(city_stats.values())} 道题目")
 
     # 显示统计结果
-    for city, count in city_stats.items():
-        print(f"  {city}: {count} 道题目")
+    for city_key, count in city_stats.items():
+        print(f"  {city_key}: {count} 道题目")
 
 def init_user_quiz_stats():
     """为所有用户初始化答题统计"""
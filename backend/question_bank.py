@@ -0,0 +1,347 @@
+"""
+题库服务 - 五个城市的题目统一存放在一张题目表 quiz_questions 中，主键为 (城市键, 题号)
+题目文件只作为导入源：load_question_files 在一个事务中把题目文件批量导入题目表；
+答题接口读取由题目表生成的不可变内存快照，文件修改时间变化后重新导入该城市并整城原子替换快照
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import AbstractSet, Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import Column, Float, Index, Integer, MetaData, String, Table, Text, delete, insert, select
+from sqlalchemy.engine import Engine
+
+QUESTION_DIR = os.path.join(os.path.dirname(__file__), '..', 'frontend')
+
+# 城市名称映射（城市名和文化名都可以作为题库名称）
+CITY_KEYS: Mapping[str, str] = MappingProxyType({
+    '福州市': 'fuzhou',
+    '泉州市': 'quanzhou',
+    '南平市': 'nanping',
+    '龙岩市': 'longyan',
+    '莆田市': 'putian',
+    '福州候官文化': 'fuzhou',
+    '泉州海丝文化': 'quanzhou',
+    '南平朱子文化': 'nanping',
+    '龙岩红色文化': 'longyan',
+    '莆田妈祖文化': 'putian'
+})
+CITIES: Tuple[str, ...] = ('fuzhou', 'quanzhou', 'nanping', 'longyan', 'putian')
+OPTION_KEYS: Tuple[str, ...] = ('A', 'B', 'C', 'D')
+
+question_metadata = MetaData()
+
+# 统一题目表：复合主键 (city_key, question_id) 即按 (城市, 题号) 的索引，按城市读取时也走该索引
+question_table = Table(
+    'quiz_questions', question_metadata,
+    Column('city_key', String(20), primary_key=True),
+    Column('question_id', Integer, primary_key=True),
+    Column('question_text', Text, nullable=False),
+    Column('option_a', String(500), nullable=True),
+    Column('option_b', String(500), nullable=True),
+    Column('option_c', String(500), nullable=True),
+    Column('option_d', String(500), nullable=True),
+    Column('correct_answer', String(1), nullable=False)
+)
+
+# 每个城市最近一次导入的题目文件修改时间，用于判断题目表是否需要重新导入
+question_source_table = Table(
+    'quiz_question_sources', question_metadata,
+    Column('city_key', String(20), primary_key=True),
+    Column('mtime', Float, nullable=False),
+    Column('question_count', Integer, nullable=False)
+)
+
+# 答题记录（quiz_attempts.QuizAttemptStore）：服务端抽的题号和种子，多个工作进程、重启后都能提交；
+# submitted_at 非空表示已提交，已提交答题中的题目才对该用户公开正确答案
+quiz_attempt_table = Table(
+    'quiz_attempts', question_metadata,
+    Column('attempt_id', String(32), primary_key=True),
+    Column('user_id', Integer, nullable=False),
+    Column('city_name', String(50), nullable=False),
+    Column('city_key', String(20), nullable=False),
+    Column('seed', Integer, nullable=False),
+    Column('question_ids', Text, nullable=False),  # JSON格式存储题号数组
+    Column('created_at', Float, nullable=False),
+    Column('submitted_at', Float, nullable=True),
+    Index('ix_quiz_attempts_user_city', 'user_id', 'city_key'),
+    Index('ix_quiz_attempts_created_at', 'created_at')
+)
+
+
+def resolve_city_key(city_name: str) -> str:
+    """城市名或文化名转为题目文件的城市键"""
+    return CITY_KEYS.get(city_name, city_name)
+
+
+@dataclass(frozen=True)
+class Question:
+    """一道选择题，题号为题目在文件中的块序号（从1开始）"""
+    id: int
+    question_text: str
+    options: Tuple[Tuple[str, str], ...]
+    correct_answer: str
+
+    def to_dict(self, city_name: str) -> Dict[str, object]:
+        """接口返回的题目格式，不含正确答案（答案只在判分后返回）"""
+        return {
+            'id': self.id,
+            'city_name': city_name,
+            'question_text': self.question_text,
+            'options': dict(self.options)
+        }
+
+
+@dataclass(frozen=True)
+class CityQuestions:
+    """一个城市的题目快照，重新加载时整体替换，读取方拿到的快照不会再变"""
+    city_key: str
+    mtime: float
+    questions: Tuple[Question, ...]
+    by_id: Mapping[int, Question]
+
+    def grade(self, answers: List[Tuple[Any, Any]],
+              revealed: Optional[AbstractSet[int]] = None) -> List[Dict[str, object]]:
+        """按题号批量判分，answers 为 (题号, 答案) 列表；题号不存在的记为答错并标注 error
+
+        revealed 给出时只对其中的题目判分并返回正确答案，其余题目的 is_correct 和 correct_answer
+        均为 None 并标注 error（否则逐个选项试答即可得到答案）。
+        """
+        results = []
+        for question_id, answer in answers:
+            valid_id = isinstance(question_id, int) and not isinstance(question_id, bool)
+            question = self.by_id.get(question_id) if valid_id else None
+            if question is None:
+                results.append({'question_id': question_id, 'user_answer': answer, 'correct_answer': None,
+                                'is_correct': False, 'error': '题目不存在'})
+                continue
+            if revealed is not None and question_id not in revealed:
+                results.append({'question_id': question_id, 'user_answer': answer, 'correct_answer': None,
+                                'is_correct': None, 'error': '提交答题后才能查看'})
+                continue
+            results.append({
+                'question_id': question_id,
+                'user_answer': answer,
+                'correct_answer': question.correct_answer,
+                'is_correct': bool(answer) and answer == question.correct_answer
+            })
+        return results
+
+
+def parse_questions(content: str) -> Tuple[Question, ...]:
+    """解析题目文件：题目之间空一行，每题为 题干 + 4个选项 + "答案：X" """
+    questions = []
+    for i, block in enumerate(content.strip().split('\n\n'), 1):
+        if not block.strip():
+            continue
+
+        lines = block.strip().split('\n')
+        if len(lines) < 6:  # 题目 + 4个选项 + 答案
+            continue
+
+        question_text = lines[0].strip()
+        if not question_text:
+            continue
+
+        # 解析选项
+        options = []
+        for j in range(1, 5):
+            line = lines[j].strip()
+            if line and len(line) > 2:
+                options.append((line[0], line[2:].strip()))  # A, B, C, D -> 选项内容
+
+        # 解析答案
+        correct_answer = ''
+        for line in lines:
+            if line.startswith('答案：'):
+                correct_answer = line.replace('答案：', '').strip()
+                break
+
+        if options and correct_answer:
+            questions.append(Question(i, question_text, tuple(options), correct_answer))
+    return tuple(questions)
+
+
+def question_file_path(city_key: str, directory: str = QUESTION_DIR) -> str:
+    return os.path.join(directory, f'{city_key}-question.txt')
+
+
+def load_question_files(engine: Engine, directory: str = QUESTION_DIR,
+                        cities: Iterable[str] = CITIES) -> Dict[str, int]:
+    """在一个事务中把题目文件批量导入题目表（按城市整体替换），返回各城市导入的题数
+
+    先在事务外读取并解析全部文件，事务内只做删除和批量插入；任一步失败时整个事务回滚，
+    题目表保持导入前的内容。读取不到的文件跳过，该城市保留原有题目。
+    """
+    parsed = {}
+    for city_key in cities:
+        path = question_file_path(city_key, directory)
+        try:
+            mtime = os.stat(path).st_mtime
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except OSError as e:
+            print(f"⚠️ 读取题目文件失败: {e}")
+            continue
+        parsed[city_key] = (mtime, parse_questions(content))
+
+    if not parsed:
+        return {}
+
+    rows = []
+    for city_key, (_, questions) in parsed.items():
+        for question in questions:
+            options = dict(question.options)
+            rows.append({
+                'city_key': city_key,
+                'question_id': question.id,
+                'question_text': question.question_text,
+                'option_a': options.get('A'),
+                'option_b': options.get('B'),
+                'option_c': options.get('C'),
+                'option_d': options.get('D'),
+                'correct_answer': question.correct_answer
+            })
+    sources = [{'city_key': city_key, 'mtime': mtime, 'question_count': len(questions)}
+               for city_key, (mtime, questions) in parsed.items()]
+
+    with engine.begin() as conn:
+        conn.execute(delete(question_table).where(question_table.c.city_key.in_(parsed)))
+        conn.execute(delete(question_source_table).where(question_source_table.c.city_key.in_(parsed)))
+        if rows:
+            conn.execute(insert(question_table), rows)
+        conn.execute(insert(question_source_table), sources)
+
+    return {source['city_key']: source['question_count'] for source in sources}
+
+
+def read_city_questions(engine: Engine, city_key: str) -> Optional[CityQuestions]:
+    """从题目表读取一个城市的全部题目（按题号排序），该城市从未导入过时返回 None"""
+    with engine.connect() as conn:
+        mtime = conn.execute(
+            select(question_source_table.c.mtime).where(question_source_table.c.city_key == city_key)
+        ).scalar()
+        if mtime is None:
+            return None
+        rows = conn.execute(
+            select(question_table)
+            .where(question_table.c.city_key == city_key)
+            .order_by(question_table.c.question_id)
+        ).all()
+
+    questions = []
+    for row in rows:
+        values = (row.option_a, row.option_b, row.option_c, row.option_d)
+        options = tuple((key, value) for key, value in zip(OPTION_KEYS, values) if value is not None)
+        questions.append(Question(row.question_id, row.question_text, options, row.correct_answer))
+    questions = tuple(questions)
+    return CityQuestions(city_key, mtime, questions, MappingProxyType({q.id: q for q in questions}))
+
+
+class QuestionBank:
+    """题库 - 题目表上的内存缓存，每个城市一个不可变快照
+
+    bind 之后才可读取。读取时最多每 check_interval 秒查看一次文件修改时间，
+    与快照的导入时间不同时把该城市重新导入题目表，再从题目表生成新快照整体替换；
+    正在处理的请求继续使用旧快照。
+    """
+
+    def __init__(self, directory: str = QUESTION_DIR, check_interval: float = 2.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.engine: Optional[Engine] = None
+        self._cities: Dict[str, CityQuestions] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.reloads = 0
+
+    def path_for(self, city_key: str) -> str:
+        return question_file_path(city_key, self.directory)
+
+    def bind(self, engine: Engine) -> int:
+        """绑定数据库：建表，导入修改过的题目文件，加载全部城市，返回题目总数"""
+        question_metadata.create_all(engine)
+        self.engine = engine
+        with self._lock:
+            self._cities = {}
+            self._checked_at = {}
+        return self.load_all()
+
+    def load_all(self) -> int:
+        """加载全部城市的题目，返回题目总数"""
+        return sum(len(city.questions) for city in map(self.city, CITIES) if city is not None)
+
+    def city(self, city_name: str) -> Optional[CityQuestions]:
+        """获取城市的题目快照（城市名、文化名或城市键均可），题目文件不存在时返回 None"""
+        city_key = resolve_city_key(city_name)
+        if city_key not in CITIES or self.engine is None:
+            return None
+        snapshot = self._cities.get(city_key)
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at.get(city_key, 0.0) < self.check_interval:
+            return snapshot
+
+        self._checked_at[city_key] = now
+        try:
+            mtime = os.stat(self.path_for(city_key)).st_mtime
+        except OSError:
+            # 文件被删除或暂时不可读时继续使用题目表中已有的题目
+            return snapshot if snapshot is not None else self._reload(city_key, None)
+        if snapshot is not None and snapshot.mtime == mtime:
+            return snapshot
+        return self._reload(city_key, mtime)
+
+    def get(self, city_name: str, question_id: int) -> Optional[Question]:
+        """按 (城市, 题号) 取题目"""
+        city = self.city(city_name)
+        return city.by_id.get(question_id) if city is not None else None
+
+    def questions(self, city_name: str) -> Optional[Tuple[Question, ...]]:
+        """城市的全部题目，题目文件不存在时返回 None"""
+        city = self.city(city_name)
+        return city.questions if city is not None else None
+
+    def stats(self) -> Dict[str, object]:
+        """各城市的题目数和加载次数"""
+        cities = dict(self._cities)
+        return {
+            'cities': {key: len(city.questions) for key, city in cities.items()},
+            'reloads': self.reloads
+        }
+
+    def _reload(self, city_key: str, mtime: Optional[float]) -> Optional[CityQuestions]:
+        """题目表中的导入时间与文件不同时重新导入该城市，再从题目表读取并原子替换快照
+
+        mtime 为 None 表示题目文件不可读，只从题目表读取。
+        """
+        # 并发请求同时发现文件变化时只导入一次
+        with self._reload_lock:
+            current = self._cities.get(city_key)
+            if current is not None and current.mtime == mtime:
+                return current
+            try:
+                snapshot = read_city_questions(self.engine, city_key)
+                if mtime is not None and (snapshot is None or snapshot.mtime != mtime):
+                    load_question_files(self.engine, self.directory, (city_key,))
+                    snapshot = read_city_questions(self.engine, city_key)
+            except Exception as e:
+                print(f"⚠️ 加载题目失败: {e}")
+                return current
+            if snapshot is None:
+                return current
+
+            with self._lock:
+                cities = dict(self._cities)
+                cities[city_key] = snapshot
+                self._cities = cities
+                self.reloads += 1
+        print(f"📚 题库已加载: {city_key} {len(snapshot.questions)}题")
+        return snapshot
+
+
+# 全局题库实例，app.py 建表后调用 bind 绑定数据库并加载全部城市
+question_bank = QuestionBank(check_interval=float(os.getenv('QUESTION_BANK_CHECK_INTERVAL', '2.0')))
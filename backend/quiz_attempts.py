@@ -0,0 +1,123 @@
+"""
+答题尝试 - 服务端为每次答题从题库抽取一套题，客户端只拿到题干和选项
+提交时凭尝试令牌判分：只按本次抽到的题号查正确答案，每个令牌只能提交一次
+尝试保存在题目表所在数据库的 quiz_attempts 表中，多个工作进程共享，重启后仍可提交
+"""
+
+import json
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, insert, select, update
+
+from question_bank import QuestionBank, question_bank, quiz_attempt_table, resolve_city_key
+
+_seed_source = random.SystemRandom()
+
+
+@dataclass(frozen=True)
+class QuizAttempt:
+    """一次答题：抽题种子和抽到的题号一起保存，提交时只按这些题号判分"""
+    attempt_id: str
+    user_id: int
+    city_name: str
+    seed: int
+    question_ids: Tuple[int, ...]
+    created_at: float
+
+
+class QuizAttemptStore:
+    """答题尝试存储 - 超过 ttl 秒未提交的尝试作废，创建新尝试时顺带删除过期未提交的尝试
+
+    使用题库绑定的数据库（QuestionBank.bind 时建表），提交用一条带条件的 UPDATE 标记，
+    多个工作进程同时提交同一个令牌时只有一个成功。
+    """
+
+    def __init__(self, bank: QuestionBank, ttl: float = 3600.0):
+        self.bank = bank
+        self.ttl = ttl
+
+    def create(self, user_id: int, city_name: str, count: int) -> Optional[Tuple[QuizAttempt, List[Dict[str, Any]]]]:
+        """抽题并登记尝试，返回（尝试, 不含答案的题目列表）；城市没有题库时返回 None"""
+        city = self.bank.city(city_name)
+        if city is None:
+            return None
+
+        seed = _seed_source.getrandbits(63)
+        questions = city.questions
+        picked = random.Random(seed).sample(range(len(questions)), min(count, len(questions)))
+        attempt = QuizAttempt(
+            attempt_id=uuid.uuid4().hex,
+            user_id=user_id,
+            city_name=city_name,
+            seed=seed,
+            question_ids=tuple(questions[i].id for i in picked),
+            created_at=time.time()
+        )
+
+        with self.bank.engine.begin() as conn:
+            conn.execute(delete(quiz_attempt_table).where(
+                quiz_attempt_table.c.submitted_at.is_(None),
+                quiz_attempt_table.c.created_at < attempt.created_at - self.ttl
+            ))
+            conn.execute(insert(quiz_attempt_table).values(
+                attempt_id=attempt.attempt_id,
+                user_id=user_id,
+                city_name=city_name,
+                city_key=city.city_key,
+                seed=seed,
+                question_ids=json.dumps(list(attempt.question_ids)),
+                created_at=attempt.created_at
+            ))
+
+        return attempt, [questions[i].to_dict(city_name) for i in picked]
+
+    def take(self, attempt_id: str, user_id: int) -> Optional[QuizAttempt]:
+        """标记尝试已提交并返回（只能成功一次）；不存在、已提交、已过期或不属于该用户时返回 None"""
+        now = time.time()
+        table = quiz_attempt_table
+        with self.bank.engine.begin() as conn:
+            marked = conn.execute(update(table).where(
+                table.c.attempt_id == attempt_id,
+                table.c.user_id == user_id,
+                table.c.submitted_at.is_(None),
+                table.c.created_at >= now - self.ttl
+            ).values(submitted_at=now)).rowcount
+            if marked != 1:
+                return None
+            row = conn.execute(select(table).where(table.c.attempt_id == attempt_id)).one()
+
+        return QuizAttempt(
+            attempt_id=row.attempt_id,
+            user_id=row.user_id,
+            city_name=row.city_name,
+            seed=row.seed,
+            question_ids=tuple(json.loads(row.question_ids)),
+            created_at=row.created_at
+        )
+
+    def grade(self, attempt: QuizAttempt, answers: Dict[int, Any]) -> Optional[List[Dict[str, object]]]:
+        """按本次抽到的题号判分，answers 为 题号 -> 答案，未作答的题记为答错"""
+        city = self.bank.city(attempt.city_name)
+        if city is None:
+            return None
+        return city.grade([(question_id, answers.get(question_id)) for question_id in attempt.question_ids])
+
+    def revealed_question_ids(self, user_id: int, city_name: str) -> Set[int]:
+        """用户在该城市已提交的答题中出现过的题号，这些题的正确答案可以返回给该用户"""
+        table = quiz_attempt_table
+        with self.bank.engine.connect() as conn:
+            rows = conn.execute(select(table.c.question_ids).where(
+                table.c.user_id == user_id,
+                table.c.city_key == resolve_city_key(city_name),
+                table.c.submitted_at.is_not(None)
+            )).scalars()
+            return {question_id for ids in rows for question_id in json.loads(ids)}
+
+
+# 全局答题尝试存储
+quiz_attempts = QuizAttemptStore(question_bank, ttl=float(os.getenv('QUIZ_ATTEMPT_TTL', '3600')))
@@ -0,0 +1,209 @@
+"""
+评估权重离线调参（Texel方法）
+1. record: 让AI自对弈，在每次出牌决策时记录局面的评估特征，终局后标注该方的胜负，写入CSV
+2. fit:    用NumPy向量化的逻辑回归（牛顿法）拟合 P(胜) = sigmoid(特征·系数)，
+           把系数按当前权重的总量换算回评估分数的尺度后写入权重文件；
+           同时给出当前权重在Texel缩放系数K下的误差作为对比基线
+
+game_ai_service 启动时加载权重文件（默认 data/eval_weights.json，可用 GAME_AI_EVAL_WEIGHTS 指定）。
+权重变化后残局库会作废，需要重新运行 build_endgame_tablebase.py。
+
+用法:
+  python tune_eval_weights.py record --games 200 --engine medium --output data/eval_positions.csv
+  python tune_eval_weights.py fit --input data/eval_positions.csv --output data/eval_weights.json
+record 只依赖本项目；fit 需要 NumPy（pip install -r requirements-tools.txt）。
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from typing import List, Optional, Tuple
+
+from benchmark_game_ai import SelfPlayGame, create_engine
+from game_ai_service import (
+    BitboardState, DEFAULT_EVAL_WEIGHTS_PATH, EVAL_WEIGHTS, EvaluationWeights, PositionEvaluator,
+    _parse_difficulty_values, get_playable_cards
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RESULT_COLUMN = "result"
+_features = PositionEvaluator()
+
+
+def record_game(engine, rng: random.Random, max_turns: int) -> List[List[float]]:
+    """进行一局自对弈（双方使用同一引擎），返回每个决策局面的 特征 + 该方最终得分（胜1/负0/平0.5）"""
+    game = SelfPlayGame(rng)
+    positions: List[Tuple[str, List[float]]] = []
+    seat = 'human'
+    winner: Optional[str] = None
+
+    for _ in range(max_turns):
+        if len(game.hands[seat]) == 1:
+            game.called_minpai[seat] = True
+
+        if get_playable_cards(game.hands[seat], game.current_card):
+            view = game.view_for(seat)
+            positions.append((seat, _features.evaluation_features(BitboardState.from_game_state(view))))
+            card, _ = engine.decide(view)
+            game.play(seat, card)
+            if not game.hands[seat]:
+                winner = seat
+                break
+        else:
+            game.penalize(seat)
+
+        seat = 'ai' if seat == 'human' else 'human'
+
+    rows = []
+    for position_seat, features in positions:
+        result = 0.5 if winner is None else float(position_seat == winner)
+        rows.append(features + [result])
+    return rows
+
+
+def record(args) -> None:
+    """自对弈并写出局面数据"""
+    node_budgets = _parse_difficulty_values(args.nodes, int) if args.nodes else None
+    engine = create_engine(args.engine, node_budgets)
+    started = time.time()
+    total = 0
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(list(EvaluationWeights.FIELDS) + [RESULT_COLUMN])
+        for game_index in range(args.games):
+            game_seed = args.seed + game_index
+            random.seed(game_seed)
+            rows = record_game(engine, random.Random(game_seed), args.max_turns)
+            writer.writerows(rows)
+            total += len(rows)
+            print(f"🎲 第{game_index + 1}/{args.games}局: {len(rows)}个局面", file=sys.stderr)
+
+    print(f"✅ 已记录 {total} 个局面到 {args.output}，耗时 {time.time() - started:.1f}秒", file=sys.stderr)
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -50.0, 50.0)))
+
+
+def log_loss(features, results, coefficients) -> float:
+    """预测胜率 sigmoid(特征·系数) 与实际结果的交叉熵"""
+    predictions = np.clip(_sigmoid(features @ coefficients), 1e-12, 1 - 1e-12)
+    return float(-np.mean(results * np.log(predictions) + (1 - results) * np.log(1 - predictions)))
+
+
+def fit_scale(features, results, weights) -> float:
+    """Texel缩放系数K：使 sigmoid(K * 评估分数) 最贴近实际结果，一次向量化计算全部候选"""
+    candidates = np.logspace(-6, 0, 600)
+    scores = features @ weights
+    predictions = np.clip(_sigmoid(candidates[:, None] * scores[None, :]), 1e-12, 1 - 1e-12)
+    losses = -np.mean(results * np.log(predictions) + (1 - results) * np.log(1 - predictions), axis=1)
+    return float(candidates[int(np.argmin(losses))])
+
+
+def fit_logistic(features, results, l2: float, iterations: int = 50):
+    """牛顿法（IRLS）求带L2正则的逻辑回归系数，不含截距：评估分数为0时双方机会均等"""
+    coefficients = np.zeros(features.shape[1])
+    regularization = np.eye(features.shape[1]) * l2
+
+    for _ in range(iterations):
+        predictions = _sigmoid(features @ coefficients)
+        gradient = features.T @ (predictions - results) + l2 * coefficients
+        hessian = (features * (predictions * (1 - predictions))[:, None]).T @ features + regularization
+        step = np.linalg.solve(hessian, gradient)
+        coefficients -= step
+        if np.max(np.abs(step)) < 1e-10:
+            break
+
+    return coefficients
+
+
+def fit(args) -> None:
+    """拟合权重并写出权重文件"""
+    if np is None:
+        print("❌ fit 需要 NumPy，请先安装离线工具依赖: pip install -r requirements-tools.txt", file=sys.stderr)
+        sys.exit(1)
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        header = next(csv.reader(f))
+    if header != list(EvaluationWeights.FIELDS) + [RESULT_COLUMN]:
+        print(f"❌ 数据列与当前评估特征不一致: {header}", file=sys.stderr)
+        sys.exit(1)
+
+    data = np.loadtxt(args.input, delimiter=',', skiprows=1, ndmin=2)
+    features, results = data[:, :-1], data[:, -1]
+    initial = np.array(EVAL_WEIGHTS.as_tuple())
+
+    # 当前权重的基线：最优缩放系数K下的交叉熵
+    scale = fit_scale(features, results, initial)
+    loss_before = log_loss(features, results, scale * initial)
+
+    coefficients = fit_logistic(features, results, args.l2)
+    loss_after = log_loss(features, results, coefficients)
+
+    # 系数以胜率的对数几率为单位，按当前权重的总量换算回评估分数的尺度（与胜负分数 WIN_SCORE 的相对大小不变）
+    magnitude = np.sum(np.abs(coefficients))
+    weights = coefficients * (np.sum(np.abs(initial)) / magnitude) if magnitude > 0 else initial
+
+    tuned = EvaluationWeights(tuple(round(float(w), 4) for w in weights))
+    report = {
+        "weights": tuned.to_dict(),
+        "meta": {
+            "positions": int(len(results)),
+            "l2": args.l2,
+            "texel_scale": scale,
+            "log_loss_before": loss_before,
+            "log_loss_after": loss_after,
+            "initial_weights": EVAL_WEIGHTS.to_dict(),
+            "source": os.path.abspath(args.input)
+        }
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+
+    print(f"📐 {len(results)}个局面, 交叉熵 {loss_before:.5f} → {loss_after:.5f}", file=sys.stderr)
+    for name, before, after in zip(EvaluationWeights.FIELDS, EVAL_WEIGHTS.as_tuple(), tuned.as_tuple()):
+        print(f"   {name}: {before} → {after}", file=sys.stderr)
+    print(f"✅ 权重已写入 {args.output}，重启服务后生效；请重新生成残局库", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评估权重离线调参（Texel方法）")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help="自对弈记录局面特征和胜负")
+    record_parser.add_argument('--games', type=int, default=200, help="对局数")
+    record_parser.add_argument('--seed', type=int, default=2024, help="发牌种子")
+    record_parser.add_argument('--engine', default='medium', help="自对弈使用的引擎 easy/medium/hard/expecti/alphabeta")
+    record_parser.add_argument('--nodes', nargs='?', const="medium:3000,hard:10000", metavar='medium:N,hard:N',
+                               help="按节点预算搜索，结果可复现")
+    record_parser.add_argument('--max-turns', type=int, default=400, help="单局回合上限，超过记为平局")
+    record_parser.add_argument('--output', default=os.path.join(os.path.dirname(__file__), 'data', 'eval_positions.csv'),
+                               help="局面数据CSV的输出路径")
+    record_parser.set_defaults(handler=record)
+
+    fit_parser = subparsers.add_parser('fit', help="拟合权重并写出权重文件（需要NumPy）")
+    fit_parser.add_argument('--input', default=os.path.join(os.path.dirname(__file__), 'data', 'eval_positions.csv'),
+                            help="record 生成的局面数据")
+    fit_parser.add_argument('--output', default=DEFAULT_EVAL_WEIGHTS_PATH, help="权重文件的输出路径")
+    fit_parser.add_argument('--l2', type=float, default=1.0, help="L2正则强度，数据少时防止稀有特征的权重过大")
+    fit_parser.set_defaults(handler=fit)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
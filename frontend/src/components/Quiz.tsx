@@ -12,7 +12,6 @@ interface Question {
     C: string;
     D: string;
   };
-  correct_answer: string;
 }
 
 interface QuizResult {
@@ -49,15 +48,14 @@ const Quiz: React.FC<QuizProps> = ({ cityName: propCityName, onComplete, onBack
   const currentCityName = propCityName || (paramCityName ? getCityNameFromParam(paramCityName) : '');
 
   const [questions, setQuestions] = useState<Question[]>([]);
+  const [attemptId, setAttemptId] = useState<string>('');
   const [currentQuestionIndex, setCurrentQuestionIndex] = useState(0);
   const [selectedAnswer, setSelectedAnswer] = useState<string>('');
   const [answers, setAnswers] = useState<string[]>([]);
   const [quizResults, setQuizResults] = useState<QuizResult[]>([]);
-  const [showFeedback, setShowFeedback] = useState(false);
-  const [feedbackMessage, setFeedbackMessage] = useState('');
-  const [isCorrect, setIsCorrect] = useState(false);
   const [loading, setLoading] = useState(true);
   const [verifying, setVerifying] = useState(false);
+  const [reviewing, setReviewing] = useState(false);
   const [error, setError] = useState<string>('');
 
   // 获取题目数据
@@ -70,20 +68,22 @@ const Quiz: React.FC<QuizProps> = ({ cityName: propCityName, onComplete, onBack
   const fetchQuestions = async () => {
     try {
       setLoading(true);
-      // 使用完整的API URL
-      const apiUrl = `/api/questions/${currentCityName}`;
-
-      const response = await fetch(apiUrl);
+      // 由服务端抽取5道题，返回的题目不含答案，提交时凭 attempt_id 判分
+      const response = await fetch('/api/quiz/attempts', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        credentials: 'include',
+        body: JSON.stringify({ cityName: currentCityName, count: 5 })
+      });
       if (!response.ok) {
         throw new Error(`获取题目失败: ${response.status} ${response.statusText}`);
       }
       const data = await response.json();
-      const allQuestions = data.questions || [];
-
-      // 从所有题目中随机选择5道
-      const shuffled = [...allQuestions].sort(() => 0.5 - Math.random());
-      const selectedQuestions = shuffled.slice(0, 5);
+      const selectedQuestions: Question[] = data.questions || [];
 
+      setAttemptId(data.attempt_id);
       setQuestions(selectedQuestions);
       setAnswers(new Array(selectedQuestions.length).fill(''));
       setQuizResults(new Array(selectedQuestions.length).fill(null));
@@ -95,57 +95,78 @@ const Quiz: React.FC<QuizProps> = ({ cityName: propCityName, onComplete, onBack
     }
   };
 
-  // 验证答案
-  const verifyAnswer = async (answer: string) => {
-    if (!questions[currentQuestionIndex]) return;
+  const handleAnswerSelect = (answer: string) => {
+    if (verifying || reviewing) return;
+
+    setSelectedAnswer(answer);
+    const newAnswers = [...answers];
+    newAnswers[currentQuestionIndex] = answer;
+    setAnswers(newAnswers);
+  };
+
+  const handleNextQuestion = () => {
+    if (currentQuestionIndex < questions.length - 1) {
+      setCurrentQuestionIndex(currentQuestionIndex + 1);
+      setSelectedAnswer(answers[currentQuestionIndex + 1] || '');
+    } else {
+      // 所有题目答完，验证并跳转
+      finishQuiz();
+    }
+  };
+
+  const handlePrevious = () => {
+    if (currentQuestionIndex > 0) {
+      setCurrentQuestionIndex(currentQuestionIndex - 1);
+      setSelectedAnswer(answers[currentQuestionIndex - 1] || '');
+    }
+  };
 
+  // 全部答完后一次提交本次答题
+  const finishQuiz = async () => {
     try {
       setVerifying(true);
-      const apiUrl = `/api/questions/${currentCityName}/${questions[currentQuestionIndex].id}/verify`;
-
-      const response = await fetch(apiUrl, {
+      const response = await fetch(`/api/quiz/attempts/${attemptId}/submit`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
         credentials: 'include',
-        body: JSON.stringify({ answer })
+        body: JSON.stringify({
+          answers: questions.map((question, index) => ({ questionId: question.id, answer: answers[index] }))
+        })
       });
 
       if (!response.ok) {
         throw new Error(`验证失败: ${response.status} ${response.statusText}`);
       }
 
-      const result = await response.json();
-      const correct = result.is_correct;
-
-      // 更新答案数组
-      const newAnswers = [...answers];
-      newAnswers[currentQuestionIndex] = answer;
-      setAnswers(newAnswers);
-
-      // 更新结果数组
-      const newResults = [...quizResults];
-      newResults[currentQuestionIndex] = {
-        questionId: questions[currentQuestionIndex].id,
-        userAnswer: answer,
+      const data = await response.json();
+      const results: QuizResult[] = data.results.map((result: any, index: number) => ({
+        questionId: result.question_id,
+        userAnswer: result.user_answer,
         correctAnswer: result.correct_answer,
-        isCorrect: correct,
-        questionText: questions[currentQuestionIndex].question_text
+        isCorrect: result.is_correct,
+        questionText: questions[index].question_text
+      }));
+      setQuizResults(results);
+
+      // 保存到localStorage
+      const quizData = {
+        cityName: currentCityName,
+        questions: questions,
+        results: results,
+        score: data.score,
+        total: data.total,
+        percentage: Math.round(data.percentage),
+        completedAt: new Date().toISOString()
       };
-      setQuizResults(newResults);
 
-      // 显示反馈
-      setIsCorrect(correct);
-      setFeedbackMessage(correct ? '✓ 回答正确！' : `✗ 回答错误，正确答案是：${result.correct_answer}`);
-      setShowFeedback(true);
-
-      // 2秒后自动隐藏反馈并进入下一题
-      setTimeout(() => {
-        setShowFeedback(false);
-        handleNextQuestion();
-      }, 2000);
+      localStorage.setItem('quizResult', JSON.stringify(quizData));
 
+      // 逐题显示对错反馈，看完后再进入结果页面
+      setReviewing(true);
+      setCurrentQuestionIndex(0);
+      setSelectedAnswer(answers[0] || '');
     } catch (err) {
       console.error('验证答案错误:', err);
       setError(err instanceof Error ? err.message : '验证答案失败');
@@ -154,49 +175,7 @@ const Quiz: React.FC<QuizProps> = ({ cityName: propCityName, onComplete, onBack
     }
   };
 
-  const handleAnswerSelect = (answer: string) => {
-    if (verifying || showFeedback) return; // 防止重复点击
-
-    setSelectedAnswer(answer);
-    verifyAnswer(answer);
-  };
-
-  const handleNextQuestion = () => {
-    if (currentQuestionIndex < questions.length - 1) {
-      setCurrentQuestionIndex(currentQuestionIndex + 1);
-      setSelectedAnswer(answers[currentQuestionIndex + 1] || '');
-    } else {
-      // 所有题目答完，保存结果并跳转
-      finishQuiz();
-    }
-  };
-
-  const handlePrevious = () => {
-    if (currentQuestionIndex > 0) {
-      setCurrentQuestionIndex(currentQuestionIndex - 1);
-      setSelectedAnswer(answers[currentQuestionIndex - 1] || '');
-    }
-  };
-
-  const finishQuiz = () => {
-    // 计算最终得分
-    const correctCount = quizResults.filter(result => result?.isCorrect).length;
-    const totalQuestions = questions.length;
-
-    // 保存到localStorage
-    const quizData = {
-      cityName: currentCityName,
-      questions: questions,
-      results: quizResults,
-      score: correctCount,
-      total: totalQuestions,
-      percentage: totalQuestions > 0 ? Math.round((correctCount / totalQuestions) * 100) : 0,
-      completedAt: new Date().toISOString()
-    };
-
-    localStorage.setItem('quizResult', JSON.stringify(quizData));
-
-    // 导航到结果页面
+  const showResultPage = () => {
     navigate(`/quiz-result/${paramCityName}`);
   };
 
@@ -244,6 +223,7 @@ const Quiz: React.FC<QuizProps> = ({ cityName: propCityName, onComplete, onBack
   const currentQuestion = questions[currentQuestionIndex];
   const isAnswered = answers[currentQuestionIndex] !== '';
   const isLastQuestion = currentQuestionIndex === questions.length - 1;
+  const currentResult = reviewing ? quizResults[currentQuestionIndex] : null;
 
   return (
     <div className="quiz-container">
@@ -293,12 +273,12 @@ const Quiz: React.FC<QuizProps> = ({ cityName: propCityName, onComplete, onBack
               className={`option-btn ${
                 selectedAnswer === key ? 'selected' : ''
               } ${
-                showFeedback && key === currentQuestion.correct_answer ? 'correct' : ''
+                currentResult && key === currentResult.correctAnswer ? 'correct' : ''
               } ${
-                showFeedback && selectedAnswer === key && key !== currentQuestion.correct_answer ? 'incorrect' : ''
+                currentResult && selectedAnswer === key && !currentResult.isCorrect ? 'incorrect' : ''
               }`}
               onClick={() => handleAnswerSelect(key)}
-              disabled={verifying || showFeedback}
+              disabled={verifying || reviewing}
             >
               <span className="option-key">{key}.</span>
               <span className="option-text">{value}</span>
@@ -306,14 +286,14 @@ const Quiz: React.FC<QuizProps> = ({ cityName: propCityName, onComplete, onBack
           ))}
         </div>
 
-        {/* 即时反馈 */}
-        {showFeedback && (
-          <div className={`feedback-message ${isCorrect ? 'correct' : 'incorrect'}`}>
+        {/* 提交后的逐题反馈 */}
+        {currentResult && (
+          <div className={`feedback-message ${currentResult.isCorrect ? 'correct' : 'incorrect'}`}>
             <div className="feedback-icon">
-              {isCorrect ? '✅' : '❌'}
+              {currentResult.isCorrect ? '✅' : '❌'}
             </div>
             <div className="feedback-text">
-              {feedbackMessage}
+              {currentResult.isCorrect ? '✓ 回答正确！' : `✗ 回答错误，正确答案是：${currentResult.correctAnswer}`}
             </div>
           </div>
         )}
@@ -331,7 +311,7 @@ const Quiz: React.FC<QuizProps> = ({ cityName: propCityName, onComplete, onBack
       <div className="quiz-navigation">
         <button
           onClick={handlePrevious}
-          disabled={currentQuestionIndex === 0 || verifying || showFeedback}
+          disabled={currentQuestionIndex === 0 || verifying}
           className="nav-btn"
         >
           上一题
@@ -340,18 +320,25 @@ const Quiz: React.FC<QuizProps> = ({ cityName: propCityName, onComplete, onBack
         {!isLastQuestion ? (
           <button
             onClick={handleNextQuestion}
-            disabled={!isAnswered || verifying || showFeedback}
+            disabled={!isAnswered || verifying}
             className="nav-btn primary"
           >
             下一题
           </button>
+        ) : reviewing ? (
+          <button
+            onClick={showResultPage}
+            className="nav-btn primary submit-btn"
+          >
+            查看结果
+          </button>
         ) : (
           <button
             onClick={finishQuiz}
-            disabled={getAnsweredCount() < questions.length || verifying || showFeedback}
+            disabled={getAnsweredCount() < questions.length || verifying}
             className="nav-btn primary submit-btn"
           >
-            查看结果
+            提交答案
           </button>
         )}
       </div>
@@ -369,12 +356,12 @@ const Quiz: React.FC<QuizProps> = ({ cityName: propCityName, onComplete, onBack
                 result ? (result.isCorrect ? 'correct' : 'incorrect') : ''
               }`}
               onClick={() => {
-                if (!verifying && !showFeedback) {
+                if (!verifying) {
                   setCurrentQuestionIndex(index);
                   setSelectedAnswer(answers[index] || '');
                 }
               }}
-              disabled={verifying || showFeedback}
+              disabled={verifying}
             >
               {index + 1}
             </button>
@@ -15,6 +15,11 @@ import { GameAI, createAI, getAIDecisionDelay } from './gameAI';
 import { SmartAIController } from './alphaBetaPruning';
 import axios from 'axios';
 
+// 紧凑卡牌ID（card_N 中的 N）到卡牌的映射，用于与后端以整数ID收发卡牌
+const CARDS_BY_WIRE_ID: Map<number, Card> = new Map(
+  generateCardDeck().map(card => [Number(card.id.slice('card_'.length)), card])
+);
+
 export class GameEngine {
   private gameState: GameState;
   private smartAI: SmartAIController;
@@ -23,6 +28,10 @@ export class GameEngine {
   private onStateChange?: (state: GameState) => void;
   private onGameEnd?: (winner: 'human' | 'ai', finalState: GameState) => void;
   private isAIThinking: boolean = false; // 防止重复AI调用
+  // 服务端游戏会话：创建时上传一次完整状态，之后只发送增量事件
+  private sessionId: string | null = null;
+  private sessionVersion: number = 0;
+  private pendingEvents: any[] = [];
 
   constructor(config: Partial<GameConfig> = {}) {
     this.config = {
@@ -164,11 +173,8 @@ export class GameEngine {
     console.log('🤖 AI回合开始执行');
 
     try {
-      // 调用后端AI决策API
-      const response = await axios.post('/api/game/ai-decision', {
-        gameState: this.serializeGameState(),
-        difficulty: this.config.aiDifficulty
-      });
+      // 调用后端AI决策API（基于服务端会话，只发送增量事件）
+      const response = await this.requestSessionDecision();
 
       if (response.data.success && response.data.card) {
         // AI出牌
@@ -179,7 +185,8 @@ export class GameEngine {
         console.log('📊 出牌前 - 当前牌:', this.gameState.currentCard?.name || '无');
         console.log('📊 出牌前 - AI手牌数:', this.gameState.aiHand.length);
 
-        this.executeMove(aiCard, 'ai');
+        // AI的出牌服务端已记入会话，不再作为增量事件回传
+        this.executeMove(aiCard, 'ai', false);
 
         // 执行出牌后状态
         console.log('📊 出牌后 - 当前牌:', this.gameState.currentCard?.name || '无');
@@ -229,7 +236,7 @@ export class GameEngine {
   }
 
   // 执行移动
-  private executeMove(card: Card, player: 'human' | 'ai') {
+  private executeMove(card: Card, player: 'human' | 'ai', recordEvent: boolean = true) {
     // 从手牌中移除卡牌
     if (player === 'human') {
       this.gameState.playerHand = this.gameState.playerHand.filter(c => c.id !== card.id);
@@ -257,6 +264,71 @@ export class GameEngine {
     }
 
     this.gameState.roundCount++;
+
+    if (recordEvent) {
+      this.recordEvent({ type: 'play', player, card_id: this.serializeCard(card) });
+    }
+  }
+
+  // 记录增量事件，下次AI决策时随请求发送
+  private recordEvent(event: any) {
+    if (this.sessionId) {
+      this.pendingEvents.push(event);
+    }
+  }
+
+  // 创建服务端游戏会话（上传完整状态）
+  private async createSession() {
+    const response = await axios.post('/api/game/sessions', {
+      gameState: this.serializeGameState(),
+      difficulty: this.config.aiDifficulty
+    });
+    this.sessionId = response.data.session_id;
+    this.sessionVersion = response.data.version;
+    this.pendingEvents = [];
+  }
+
+  // 请求会话AI决策，会话失效或版本不一致时重新上传完整状态后重试一次
+  private async requestSessionDecision() {
+    for (let attempt = 0; attempt < 2; attempt++) {
+      if (!this.sessionId) {
+        await this.createSession();
+      }
+
+      const events = this.pendingEvents;
+      this.pendingEvents = [];
+      try {
+        const response = await axios.post(`/api/game/sessions/${this.sessionId}/ai-decision`, {
+          version: this.sessionVersion,
+          events,
+          compact: true
+        });
+        this.sessionVersion = response.data.version;
+        return response;
+      } catch (error: any) {
+        if (attempt === 0 && error?.response?.data?.resync) {
+          console.log('🔄 游戏会话需要重新同步');
+          this.sessionId = null;
+          continue;
+        }
+        // 其它错误时会话状态未知，下次重新上传完整状态
+        this.sessionId = null;
+        throw error;
+      }
+    }
+    throw new Error('游戏会话同步失败');
+  }
+
+  // 结束服务端游戏会话，未发送的增量事件随之提交，服务端据此记录完整对局
+  private closeSession() {
+    if (this.sessionId) {
+      axios.delete(`/api/game/sessions/${this.sessionId}`, {
+        data: { version: this.sessionVersion, events: this.pendingEvents }
+      }).catch(() => {});
+    }
+    this.sessionId = null;
+    this.sessionVersion = 0;
+    this.pendingEvents = [];
   }
 
   // 叫"闽派" - 简化机制
@@ -271,6 +343,7 @@ export class GameEngine {
 
     // 标记叫牌成功
     this.gameState.playerCalledMinpai = true;
+    this.recordEvent({ type: 'minpai', player: 'human' });
     console.log('🗣️ 玩家叫了闽派！');
 
     // 通知状态变化（UI更新）
@@ -378,6 +451,7 @@ export class GameEngine {
         this.gameState.penalties.ai++;
         console.log(`📊 [${timestamp}] AI罚牌次数更新: ${this.gameState.penalties.ai}`);
       }
+      this.recordEvent({ type: 'draw', player, card_ids: penaltyCards.map(card => this.serializeCard(card)) });
 
       // 通知状态变化
       console.log(`📢 [${timestamp}] 通知状态变化 (成功情况)`);
@@ -411,10 +485,13 @@ export class GameEngine {
 
     // 收集所有已出的牌（从游戏历史中）
     const discardPile: Card[] = [];
+    const currentCardId = this.gameState.currentCard?.id;
 
-    // 从游戏历史中收集已出的牌
+    // 从游戏历史中收集已出的牌；当前牌仍正面朝上留在桌面，不洗回牌堆
     for (const move of this.gameHistory) {
-      discardPile.push(move.card);
+      if (move.card.id !== currentCardId) {
+        discardPile.push(move.card);
+      }
     }
 
     console.log(`🃏 弃牌堆有 ${discardPile.length} 张牌`);
@@ -430,9 +507,10 @@ export class GameEngine {
 
     // 将洗好的牌加入牌堆
     this.gameState.deck = [...this.gameState.deck, ...shuffledDiscardPile];
+    this.recordEvent({ type: 'reshuffle', card_ids: shuffledDiscardPile.map(card => this.serializeCard(card)) });
 
-    // 清空游戏历史（因为这些牌又回到了牌堆）
-    this.gameHistory = [];
+    // 清空游戏历史（因为这些牌又回到了牌堆），只保留当前牌，下次洗牌时它已被压在下面
+    this.gameHistory = this.gameHistory.filter(move => move.card.id === currentCardId);
 
     console.log(`✅ 洗牌完成，牌堆现在有 ${this.gameState.deck.length} 张牌`);
     return true;
@@ -447,6 +525,8 @@ export class GameEngine {
       this.gameState.winner = getWinner(this.gameState.playerHand, this.gameState.aiHand);
     }
 
+    this.recordEvent({ type: 'finish', winner: this.gameState.winner });
+    this.closeSession();
     this.notifyStateChange();
 
     if (this.onGameEnd && this.gameState.winner) {
@@ -456,6 +536,7 @@ export class GameEngine {
 
   // 重新开始游戏
   restartGame(): GameState {
+    this.closeSession();
     this.gameState = this.initializeGame();
     this.gameHistory = [];
     this.notifyStateChange();
@@ -522,26 +603,18 @@ export class GameEngine {
     };
   }
 
-  // 序列化卡牌
-  private serializeCard(card: Card): any {
-    return {
-      id: card.id,
-      name: card.name,
-      culture: card.culture,
-      type: card.type,
-      image: card.image
-    };
+  // 序列化卡牌 - 紧凑格式，只发送整数ID
+  private serializeCard(card: Card): number {
+    return Number(card.id.slice('card_'.length));
   }
 
-  // 反序列化卡牌
-  private deserializeCard(data: any): Card {
-    return {
-      id: data.id,
-      name: data.name,
-      culture: data.culture,
-      type: data.type,
-      image: data.image
-    };
+  // 反序列化卡牌 - 由整数ID取回完整卡牌
+  private deserializeCard(data: number): Card {
+    const card = CARDS_BY_WIRE_ID.get(data);
+    if (!card) {
+      throw new Error(`未知的卡牌ID: ${data}`);
+    }
+    return card;
   }
 }
 